@@ -1,8 +1,9 @@
 from .csg_base import *
 from .glsl import to_glsl
+from .python import to_python
 
 class CombineBase(CsgBase):
-    def __init__(self, name, objects=[], transform=mat4()):
+    def __init__(self, name, objects=[], transform=None):
         super(CombineBase, self).__init__(name=name, transform=transform)
         for i in objects:
             self.add_node(i)
@@ -33,9 +34,35 @@ class CombineBase(CsgBase):
     def get_glsl_operation(self):
         return None
 
+    def get_python(self, code, pos):
+        pos = self.get_python_transform(code, pos)
+        if not self.nodes:
+            return to_python(INFINITY)
+        d = code.assign(self.nodes[0].get_python(code, pos))
+        for i in range(1, len(self.nodes)):
+            code.add(self.get_python_operation() % {"d": d, "e": self.nodes[i].get_python(code, pos)})
+        return d
+
+    def get_python_operation(self):
+        """Returns the statement that combines the distance d with e, formatted with %(d)s and %(e)s"""
+        return None
+
+    def get_distance_arrays(self, x, y, z):
+        x, y, z = self.pos_to_local_arrays(x, y, z)
+        if not self.nodes:
+            return numpy.full_like(x, INFINITY)
+        d = self.nodes[0].get_distance_arrays(x, y, z)
+        for i in range(1, len(self.nodes)):
+            d = self.combine_arrays(d, self.nodes[i].get_distance_arrays(x, y, z))
+        return d
+
+    def combine_arrays(self, d, e):
+        """Returns the numpy array of the distances d combined with e"""
+        raise NotImplementedError
+
 
 class Union(CombineBase):
-    def __init__(self, objects=[], transform=mat4()):
+    def __init__(self, objects=[], transform=None):
         super(Union, self).__init__(name="union", objects=objects, transform=transform)
 
     def copy(self):
@@ -51,9 +78,15 @@ class Union(CombineBase):
     def get_glsl_operation(self):
         return "min(%s, %s)"
 
+    def get_python_operation(self):
+        return "%(d)s = %(e)s if %(e)s < %(d)s else %(d)s"
+
+    def combine_arrays(self, d, e):
+        return numpy.minimum(d, e)
+
 
 class Difference(CombineBase):
-    def __init__(self, objects=[], transform=mat4()):
+    def __init__(self, objects=[], transform=None):
         super(Difference, self).__init__(name="difference", objects=objects, transform=transform)
 
     def copy(self):
@@ -71,9 +104,15 @@ class Difference(CombineBase):
     def get_glsl_operation(self):
         return "max(%s, -(%s))"
 
+    def get_python_operation(self):
+        return "%(d)s = -%(e)s if -%(e)s > %(d)s else %(d)s"
+
+    def combine_arrays(self, d, e):
+        return numpy.maximum(d, -e)
+
 
 class Intersection(CombineBase):
-    def __init__(self, objects=[], transform=mat4()):
+    def __init__(self, objects=[], transform=None):
         super(Intersection, self).__init__(name="intersection", objects=objects, transform=transform)
 
     def copy(self):
@@ -91,4 +130,10 @@ class Intersection(CombineBase):
     def get_glsl_operation(self):
         return "max(%s, %s)"
 
+    def get_python_operation(self):
+        return "%(d)s = %(e)s if %(e)s > %(d)s else %(d)s"
+
+    def combine_arrays(self, d, e):
+        return numpy.maximum(d, e)
+
 
@@ -1,10 +1,36 @@
-from pector import vec3, mat4, tools
+from array import array
+from pector import vec3, vec3_array, mat4, tools
 from .treenode import TreeNode
 from .glsl import to_glsl
+from .python import compile_python, linear_expression
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 INFINITY = 1.0e+20
 
 
+def linear_arrays(terms, offset, like):
+    """
+    Returns sum(factor * array) + offset as numpy array,
+    with zero factors left out and factors of one not multiplied
+    :param terms: sequence of (float, numpy array)
+    :param offset: float
+    :param like: numpy array that gives the shape if all factors are zero
+    """
+    r = None
+    for f, a in terms:
+        if f == 0.:
+            continue
+        a = a if f == 1. else f * a
+        r = a if r is None else r + a
+    if r is None:
+        return numpy.full_like(like, offset)
+    return r + offset if offset else r
+
+
 class GlslBase:
 
     def get_glsl_function_name(self):
@@ -35,14 +61,53 @@ class GlslBase:
 
 
 
-class CsgBase(TreeNode, GlslBase):
-    def __init__(self, name, transform=mat4()):
+class PythonBase:
+
+    def get_python(self, code, pos):
+        """
+        Writes the python statements that compute the distance at pos.
+        The default calls get_distance() of the node, override it to inline the node
+        :param code: python.PythonCode
+        :param pos: tuple of the three variable names of the position
+        :return: the python expression of the distance
+        """
+        node = code.constant(self, "node")
+        return code.assign("%s.get_distance(vec3(%s, %s, %s))" % ((node,) + tuple(pos)))
+
+    def get_python_transform(self, code, pos):
+        """Writes the inverse transformation of pos and returns the new position variable names"""
+        if not self.has_transform:
+            return pos
+        m = self.itransform.v
+        x, y, z = pos
+        pos = []
+        for i in range(3):
+            expr = linear_expression(((m[i], x), (m[i+4], y), (m[i+8], z)), m[i+12])
+            # components that are not changed keep their variable
+            pos.append(expr if expr.isidentifier() else code.assign(expr, "p"))
+        return tuple(pos)
+
+
+
+class CsgBase(TreeNode, GlslBase, PythonBase):
+    def __init__(self, name, transform=None):
         super(CsgBase, self).__init__(name)
-        self._has_transform = transform != mat4()
-        self._transform = mat4(transform)
-        self._itransform = self._transform.inversed_simple()
+        self._python_de = None
+        self.set_transform(transform)
         self._id = abs(self.__hash__())
 
+    def __getstate__(self):
+        # the compiled function can not be pickled
+        state = self.__dict__.copy()
+        state["_python_de"] = None
+        return state
+
+    def __setattr__(self, name, value):
+        super(CsgBase, self).__setattr__(name, value)
+        # public parameters change the distance function
+        if not name.startswith("_"):
+            self.invalidate()
+
     def __str__(self):
         p = self.param_string()
         if self.has_transform:
@@ -70,17 +135,48 @@ class CsgBase(TreeNode, GlslBase):
     def transform(self, mat):
         self.set_transform(mat)
     def set_transform(self, mat):
-        self._has_transform = mat != mat4()
-        self._transform = mat4(mat)
-        self._itransform = self._transform.inversed_simple()
+        """Sets the transformation matrix, None is the identity"""
+        self._transform = mat4() if mat is None else mat4(mat)
+        self._has_transform = not self._transform.is_identity()
+        self._itransform = self._transform.inversed()
+        self.invalidate()
         return self
     @property
     def has_transform(self):
         return self._has_transform
 
+    def add_node(self, node):
+        super(CsgBase, self).add_node(node)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drops the compiled distance functions of this node and its parents.
+        Call it after changing a parameter in place, e.g. node.transform.translate(...)"""
+        node = self
+        while node is not None:
+            node._python_de = None
+            node = node.node_parent
+
+    def get_distance_function(self):
+        """
+        Returns the distance function DE(x, y, z) of this node, compiled to python on first use.
+        The function is cached until the tree below this node changes, see invalidate()
+        :return: function of three floats, returning float
+        """
+        if self._python_de is None:
+            self._python_de = compile_python(self)
+        return self._python_de
+
     def pos_to_local(self, pos):
         return self._itransform * pos if self.has_transform else vec3(pos)
 
+    def pos_to_local_arrays(self, x, y, z):
+        """Returns the inverse transformation of the position arrays x, y, z as tuple of arrays"""
+        if not self.has_transform:
+            return x, y, z
+        m = self._itransform.v
+        return tuple(linear_arrays(((m[i], x), (m[i+4], y), (m[i+8], z)), m[i+12], x) for i in range(3))
+
     def get_glsl_static_functions(self):
         """Should return a list of helper functions, if needed."""
         return []
@@ -91,22 +187,70 @@ class CsgBase(TreeNode, GlslBase):
     def get_distance(self, pos):
         raise NotImplementedError
 
+    def get_distance_arrays(self, x, y, z):
+        """
+        Returns the distances at the positions x, y, z as numpy array.
+        The default calls get_distance() for each position, override it to vectorize the node
+        :param x: numpy array of the x components
+        :param y: numpy array of the y components, same shape as x
+        :param z: numpy array of the z components, same shape as x
+        :return: numpy array of the shape of x
+        """
+        return numpy.fromiter((self.get_distance(vec3.from_xyz(a, b, c)) for a, b, c in zip(x, y, z)),
+                              dtype=numpy.float64, count=len(x))
+
+    def get_distance_batch(self, points, chunk_size=65536):
+        """
+        Returns the distances at many points at once.
+        The points are evaluated with numpy in chunks of chunk_size, which keeps the
+        temporary arrays small. Without numpy each point is evaluated by get_distance_function()
+        :param points: numpy array of shape (N, 3) or of flat x,y,z values, vec3_array or sequence of vec3
+        :param chunk_size: the number of points per vectorized evaluation
+        :return: numpy array or array('d') of N floats
+        """
+        if not chunk_size > 0:
+            raise ValueError("Expected chunk_size > 0, got %s" % chunk_size)
+        if isinstance(points, vec3_array):
+            points = points.data
+        if numpy is None:
+            de = self.get_distance_function()
+            if isinstance(points, (array, memoryview)):
+                # the flat storage of a vec3_array or a slice of it
+                return array("d", map(de, points[0::3], points[1::3], points[2::3]))
+            return array("d", (de(*p) for p in points))
+        points = numpy.asarray(points, dtype=numpy.float64)
+        if points.ndim == 1 and points.size % 3 == 0:
+            points = points.reshape(-1, 3)
+        elif not (points.ndim == 2 and points.shape[1] == 3):
+            raise ValueError("Expected points of shape (N, 3) or flat x,y,z values, got shape %s"
+                             % (points.shape,))
+        r = numpy.empty(len(points))
+        for start in range(0, len(points), chunk_size):
+            # contiguous component arrays are faster than the column views
+            x, y, z = points[start:start + chunk_size].T.copy()
+            r[start:start + chunk_size] = self.get_distance_arrays(x, y, z)
+        return r
+
     def get_normal(self, pos, e = 0.001):
+        de = self.get_distance_function()
+        x, y, z = pos
         return vec3(
-            self.get_distance(pos + (e, 0, 0)) - self.get_distance(pos - (e, 0, 0)),
-            self.get_distance(pos + (0, e, 0)) - self.get_distance(pos - (0, e, 0)),
-            self.get_distance(pos + (0, 0, e)) - self.get_distance(pos - (0, 0, e))
+            de(x + e, y, z) - de(x - e, y, z),
+            de(x, y + e, z) - de(x, y - e, z),
+            de(x, y, z + e) - de(x, y, z - e)
         ).normalize_safe()
 
-    def sphere_trace(self, ro, rd):
-        t = 0.
-        for i in range(150):
-            p = ro + rd * t
-            d = self.get_distance(p)
-            if d < 0.001:
-                return t
-            t += d
-        return -1.
+    def sphere_trace(self, ro, rd, config=None, stats=None, **kwargs):
+        """
+        Returns the distance along the ray to the surface, or -1. for a miss
+        :param ro: vec3, the ray origin
+        :param rd: vec3, the unit direction
+        :param config: optional trace.TraceConfig, the default marches 150 steps to a distance of 0.001
+        :param stats: optional trace.TraceStats that receives the statistics of the ray
+        :param kwargs: TraceConfig settings, e.g. max_distance=100.
+        """
+        from .trace import trace_ray
+        return trace_ray(self, ro, rd, config, stats, **kwargs)
 
 
 
@@ -1,10 +1,11 @@
 import math
 from .csg_base import *
 from .glsl import to_glsl
+from .python import to_python
 from pector.const import DEG_TO_TWO_PI
 
 class DeformBase(CsgBase):
-    def __init__(self, name, object=None, transform=mat4()):
+    def __init__(self, name, object=None, transform=None):
         super(DeformBase, self).__init__(name, transform=transform)
         if object:
             self.add_node(object)
@@ -14,7 +15,7 @@ class DeformBase(CsgBase):
 
 
 class Repeat(DeformBase):
-    def __init__(self, object=None, repeat = vec3((1,0,0)), transform=mat4()):
+    def __init__(self, object=None, repeat = vec3((1,0,0)), transform=None):
         super(Repeat, self).__init__("repeat", object=object, transform=transform)
         self.repeat = vec3(repeat)
 
@@ -32,6 +33,23 @@ class Repeat(DeformBase):
                 p[i] = (p[i] + r*.5) % r - r*.5
         return self.contained_object().get_distance(p)
 
+    def get_python(self, code, pos):
+        pos = list(self.get_python_transform(code, pos))
+        for i in range(3):
+            r = self.repeat[i]
+            if r > 0.:
+                h = to_python(r*.5)
+                pos[i] = code.assign("(%s + %s) %% %s - %s" % (pos[i], h, to_python(r), h), "p")
+        return self.contained_object().get_python(code, tuple(pos))
+
+    def get_distance_arrays(self, x, y, z):
+        pos = list(self.pos_to_local_arrays(x, y, z))
+        for i in range(3):
+            r = self.repeat[i]
+            if r > 0.:
+                pos[i] = (pos[i] + r*.5) % r - r*.5
+        return self.contained_object().get_distance_arrays(*pos)
+
     def get_glsl_static_functions(self):
         return ["""
 vec3 repeat_transform(in vec3 pos, in vec3 repeat) {
@@ -51,7 +69,7 @@ vec3 repeat_transform(in vec3 pos, in vec3 repeat) {
         return None
 
 class Fan(DeformBase):
-    def __init__(self, object=None, angle = (0., 30.), axis=0, transform=mat4()):
+    def __init__(self, object=None, angle = (0., 30.), axis=0, transform=None):
         """
         :param object:
         :param angle: tuple with (center, range) in degrees
@@ -77,11 +95,7 @@ class Fan(DeformBase):
         end = DEG_TO_TWO_PI * (self.angle[0] + self.angle[1]/2.)
         len = end - start
 
-        swizz0, swizz1 = (0, 1)
-        if self.axis == 0:
-            swizz0, swizz1 = (1,2)
-        elif self.axis == 1:
-            swizz0, swizz1 = (0,2)
+        swizz0, swizz1 = self.get_swizzle_indices()
 
         ang = math.atan2(pos[swizz0], pos[swizz1])
         leng = math.sqrt(pos[swizz0]*pos[swizz0] + pos[swizz1]*pos[swizz1])
@@ -90,6 +104,45 @@ class Fan(DeformBase):
         pos[swizz1] = leng * math.cos(ang)
         return self.contained_object().get_distance(pos)
 
+    def get_python(self, code, pos):
+        pos = list(self.get_python_transform(code, pos))
+        start = DEG_TO_TWO_PI * (self.angle[0] - self.angle[1]/2.)
+        end = DEG_TO_TWO_PI * (self.angle[0] + self.angle[1]/2.)
+        len = end - start
+        swizz0, swizz1 = self.get_swizzle_indices()
+        a, b = pos[swizz0], pos[swizz1]
+        ang = code.assign("atan2(%s, %s)" % (a, b), "a")
+        leng = code.assign("sqrt(%s * %s + %s * %s)" % (a, a, b, b), "l")
+        expr = "%s = (%s - %s) %% %s - %s" % (ang, ang, to_python(start), to_python(len), to_python(len/2))
+        if self.angle[0]:
+            expr += " + %s" % to_python(self.angle[0] * DEG_TO_TWO_PI)
+        code.add(expr)
+        pos[swizz0] = code.assign("%s * sin(%s)" % (leng, ang), "p")
+        pos[swizz1] = code.assign("%s * cos(%s)" % (leng, ang), "p")
+        return self.contained_object().get_python(code, tuple(pos))
+
+    def get_distance_arrays(self, x, y, z):
+        pos = list(self.pos_to_local_arrays(x, y, z))
+        start = DEG_TO_TWO_PI * (self.angle[0] - self.angle[1]/2.)
+        end = DEG_TO_TWO_PI * (self.angle[0] + self.angle[1]/2.)
+        len = end - start
+        swizz0, swizz1 = self.get_swizzle_indices()
+        a, b = pos[swizz0], pos[swizz1]
+        ang = numpy.arctan2(a, b)
+        leng = numpy.sqrt(a * a + b * b)
+        ang = (ang - start) % len - len/2 + self.angle[0] * DEG_TO_TWO_PI
+        pos[swizz0] = leng * numpy.sin(ang)
+        pos[swizz1] = leng * numpy.cos(ang)
+        return self.contained_object().get_distance_arrays(*pos)
+
+    def get_swizzle_indices(self):
+        """Returns the indices of the two rotated components"""
+        if self.axis == 0:
+            return 1, 2
+        if self.axis == 1:
+            return 0, 2
+        return 0, 1
+
     def get_swizzle(self):
         swizz = "xy"
         if self.axis == 0:
@@ -131,23 +184,51 @@ vec3 fan_transform_%(swizz)s(in vec3 pos, in float center, in float range) {
 
 
 class DeformFunction(DeformBase):
-    def __init__(self, object=None, py_func=lambda pos: pos, glsl_func="pos = pos;", transform=mat4()):
+    def __init__(self, object=None, py_func=lambda pos: pos, glsl_func="pos = pos;", transform=None,
+                 numpy_func=None):
+        """
+        :param object:
+        :param py_func: function that returns the deformed vec3 position
+        :param glsl_func: glsl statements that change the vec3 pos
+        :param transform:
+        :param numpy_func: optional vectorized py_func for get_distance_batch(),
+        a function of the numpy arrays x, y, z that returns the deformed x, y, z.
+        Without it py_func is called for each position
+        """
         super(DeformFunction, self).__init__("fan", object=object, transform=transform)
         self.py_func = py_func
         self.glsl_func = glsl_func
+        self.numpy_func = numpy_func
 
     def param_string(self):
         return "glsl_func=%s, py_func=%s" % (self.glsl_func, self.py_func)
 
     def copy(self):
         return DeformFunction(object = self.nodes[0].copy(), py_func=self.py_func,
-                              glsl_func=self.glsl_func, transform=self.transform)
+                              glsl_func=self.glsl_func, transform=self.transform, numpy_func=self.numpy_func)
 
     def get_distance(self, pos):
         pos = self.pos_to_local(pos)
         pos = self.py_func(pos)
         return self.contained_object().get_distance(pos)
 
+    def get_python(self, code, pos):
+        pos = self.get_python_transform(code, pos)
+        func = code.constant(self.py_func, "func")
+        p = tuple(code.var("p") for i in range(3))
+        code.add("%s, %s, %s = %s(vec3(%s, %s, %s))" % (p + (func,) + tuple(pos)))
+        return self.contained_object().get_python(code, p)
+
+    def get_distance_arrays(self, x, y, z):
+        x, y, z = self.pos_to_local_arrays(x, y, z)
+        if self.numpy_func is not None:
+            x, y, z = self.numpy_func(x, y, z)
+        else:
+            p = numpy.array([tuple(self.py_func(vec3.from_xyz(a, b, c))) for a, b, c in zip(x, y, z)],
+                            dtype=numpy.float64).reshape(-1, 3)
+            x, y, z = p.T.copy()
+        return self.contained_object().get_distance_arrays(x, y, z)
+
     def get_glsl_inline(self, pos):
         return None
 
@@ -1,15 +1,16 @@
 from .csg_base import *
 from .glsl import to_glsl
+from .python import to_python, linear_expression
 
 class Primitive(CsgBase):
-    def __init__(self, name, transform=mat4()):
+    def __init__(self, name, transform=None):
         super(Primitive, self).__init__(name, transform=transform)
         self._can_have_nodes = False
 
 
 
 class Sphere(Primitive):
-    def __init__(self, radius = 1., transform = mat4()):
+    def __init__(self, radius = 1., transform=None):
         super(Sphere, self).__init__(name="sphere", transform=transform)
         self.radius = tools.check_float_number(radius)
 
@@ -26,9 +27,17 @@ class Sphere(Primitive):
         pos = self.get_glsl_transform(pos)
         return "length(%s) - %s" % (pos, to_glsl(self.radius))
 
+    def get_python(self, code, pos):
+        x, y, z = self.get_python_transform(code, pos)
+        return code.assign("sqrt(%s * %s + %s * %s + %s * %s) - %s" % (x, x, y, y, z, z, to_python(self.radius)))
+
+    def get_distance_arrays(self, x, y, z):
+        x, y, z = self.pos_to_local_arrays(x, y, z)
+        return numpy.sqrt(x * x + y * y + z * z) - self.radius
+
 
 class Tube(Primitive):
-    def __init__(self, radius = 1., axis=0, transform = mat4()):
+    def __init__(self, radius = 1., axis=0, transform=None):
         super(Tube, self).__init__(name="tube", transform=transform)
         self.radius = tools.check_float_number(radius)
         if axis < 0 or axis > 2:
@@ -55,9 +64,19 @@ class Tube(Primitive):
             swizz = "xy"
         return "length(%s.%s) - %s" % (pos, swizz, to_glsl(self.radius))
 
+    def get_python(self, code, pos):
+        pos = self.get_python_transform(code, pos)
+        a, b = [p for i, p in enumerate(pos) if not i == self.axis]
+        return code.assign("sqrt(%s * %s + %s * %s) - %s" % (a, a, b, b, to_python(self.radius)))
+
+    def get_distance_arrays(self, x, y, z):
+        pos = self.pos_to_local_arrays(x, y, z)
+        a, b = [p for i, p in enumerate(pos) if not i == self.axis]
+        return numpy.sqrt(a * a + b * b) - self.radius
+
 
 class Plane(Primitive):
-    def __init__(self, normal=vec3(0,1,0), transform = mat4()):
+    def __init__(self, normal=vec3(0,1,0), transform=None):
         super(Plane, self).__init__(name="plane", transform=transform)
         self.normal = vec3(normal)
 
@@ -75,3 +94,11 @@ class Plane(Primitive):
         pos = self.get_glsl_transform(pos)
         return "dot(%s, %s)" % (pos, to_glsl(self.normal))
 
+    def get_python(self, code, pos):
+        pos = self.get_python_transform(code, pos)
+        return code.assign(linear_expression(zip(self.normal, pos)))
+
+    def get_distance_arrays(self, x, y, z):
+        pos = self.pos_to_local_arrays(x, y, z)
+        return linear_arrays(zip(self.normal, pos), 0., x)
+
@@ -0,0 +1,106 @@
+import math
+from pector import vec3
+
+
+def to_python(arg):
+    """
+    Converts a number to a python literal that evaluates to the same float
+    :param arg: int, float
+    :return: string
+    """
+    if isinstance(arg, (int, float)):
+        arg = float(arg)
+        if math.isinf(arg):
+            return "inf" if arg > 0 else "-inf"
+        if math.isnan(arg):
+            return "nan"
+        return repr(arg)
+    raise NotImplementedError("Can't convert to python: '%s'" % type(arg))
+
+
+class PythonCode:
+    """
+    Collects the statements of a generated function.
+    Each node writes its statements and returns the expression of its distance,
+    positions are passed as tuples of three variable names
+    """
+    def __init__(self, indent="    "):
+        self.indent = indent
+        self.lines = []
+        self.namespace = {"sqrt": math.sqrt, "atan2": math.atan2, "sin": math.sin, "cos": math.cos,
+                          "vec3": vec3.from_xyz,
+                          "inf": float("inf"), "nan": float("nan")}
+        self._count = 0
+
+    def var(self, prefix="v"):
+        """Returns a new unique variable name"""
+        self._count += 1
+        return "%s%d" % (prefix, self._count)
+
+    def add(self, line):
+        self.lines.append(self.indent + line)
+
+    def assign(self, expr, prefix="d"):
+        """Assigns the expression to a new variable and returns the variable name"""
+        name = self.var(prefix)
+        self.add("%s = %s" % (name, expr))
+        return name
+
+    def constant(self, obj, prefix="c"):
+        """Makes a python object available to the generated code and returns its name"""
+        name = self.var(prefix)
+        self.namespace[name] = obj
+        return name
+
+
+def linear_expression(terms, offset=0.):
+    """
+    Returns the python expression of sum(factor * variable) + offset
+    with zero factors left out and factors of one not multiplied
+    :param terms: sequence of (float, variable name)
+    :param offset: float
+    """
+    expr = []
+    for f, name in terms:
+        if f == 0.:
+            continue
+        if f == 1.:
+            expr.append(name)
+        elif f == -1.:
+            expr.append("-%s" % name)
+        else:
+            expr.append("%s * %s" % (to_python(f), name))
+    if offset or not expr:
+        expr.append(to_python(offset))
+    return " + ".join(expr).replace("+ -", "- ")
+
+
+def render_python(csg, name="DE", indent="    "):
+    """
+    Render the python source of a function name(x, y, z) that returns the distance of the CSG object.
+    The transforms and parameters of the nodes are inlined as constants
+    :param csg: CsgBase
+    :param name: the name of the function
+    :param indent: The indentation string to use within the function body
+    :return: tuple of (source, namespace), the namespace contains the names used by the source
+    """
+    code = PythonCode(indent)
+    d = csg.get_python(code, ("x", "y", "z"))
+    src = "def %s(x, y, z):\n%s\n%sreturn %s\n" % (name, "\n".join(code.lines), indent, d)
+    src = src.replace("\n\n", "\n")
+    return src, code.namespace
+
+
+def compile_python(csg, name="DE"):
+    """
+    Compiles the CSG object to a python function name(x, y, z) that returns the distance as float.
+    It evaluates the same as csg.get_distance() but works on plain floats,
+    without temporary vectors and without walking the tree
+    :param csg: CsgBase
+    :return: function
+    """
+    src, namespace = render_python(csg, name)
+    exec(compile(src, "<csg %s>" % name, "exec"), namespace)
+    func = namespace[name]
+    func.source = src
+    return func
@@ -0,0 +1,210 @@
+"""
+Headless CPU renderer, the pipeline of the shader in csg_shader_window.py with numpy:
+camera rays as in get_ray(), sphere tracing, DE_norm() normals, sky and point lights.
+The image is split into tiles that are rendered by a multiprocessing pool.
+"""
+import multiprocessing
+import pickle
+import struct
+import zlib
+from pector import vec3
+from .trace import _csg_base, trace_rays, camera_rays, TraceConfig, TraceStats
+
+# (position, color) of the point lights
+DEFAULT_LIGHTS = ((vec3(10, 10, -3), vec3(.6, .7, 1.)),)
+
+# the csg object of the worker processes, set by the pool initializer
+_worker_csg = None
+
+
+def render_image(csg, transform, width, height, workers=None, tile_size=32, focal=1.2,
+                 lights=DEFAULT_LIGHTS, config=None, stats=None, **kwargs):
+    """
+    Renders the CSG object. Requires numpy
+    :param csg: CsgBase
+    :param transform: mat4, the camera, see trace.camera_rays()
+    :param width: int, the image width in pixels
+    :param height: int, the image height in pixels
+    :param workers: the number of processes, None for the number of CPUs, 0 to render in this process.
+    On systems without fork the csg object must be picklable, otherwise TypeError is raised
+    :param tile_size: the width and height of the tiles in pixels
+    :param focal: float, see trace.camera_rays()
+    :param lights: sequence of (position, color) of the point lights
+    :param config: optional trace.TraceConfig, the default traces to a maximum distance of 100
+    :param stats: optional trace.TraceStats that receives the statistics of the camera rays
+    :param kwargs: TraceConfig settings
+    :return: tuple of (color, depth), numpy arrays of shape (height, width, 3) and (height, width),
+    the colors are in the range [0, 1] and the depth is -1. where the ray missed
+    """
+    numpy = _csg_base.numpy
+    if not tile_size > 0:
+        raise ValueError("Expected tile_size > 0, got %s" % tile_size)
+    color = numpy.zeros((height, width, 3))
+    depth = numpy.zeros((height, width))
+    if config is None:
+        config = TraceConfig(max_distance=100.)
+    if kwargs:
+        config = config.updated(**kwargs)
+    settings = (transform, width, height, focal, tuple((vec3(p), vec3(c)) for p, c in lights),
+                config, stats is not None)
+    tiles = [(x, y, min(width, x + tile_size), min(height, y + tile_size), settings)
+             for y in range(0, height, tile_size) for x in range(0, width, tile_size)]
+    if workers == 0:
+        _init_worker(csg)
+        results = map(_render_tile, tiles)
+    else:
+        # forked workers inherit the csg object, e.g. with python functions of DeformFunction,
+        # otherwise it is pickled to each worker
+        fork = "fork" in multiprocessing.get_all_start_methods()
+        if not fork:
+            try:
+                pickle.dumps(csg)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                raise TypeError("The CSG object can not be sent to worker processes without fork, "
+                                "render it with workers=0: %s" % e)
+        context = multiprocessing.get_context("fork" if fork else None)
+        pool = context.Pool(workers, initializer=_init_worker, initargs=(csg,))
+        results = pool.imap_unordered(_render_tile, tiles)
+    try:
+        for x0, y0, tile_color, tile_depth, tile_stats in results:
+            color[y0:y0 + tile_color.shape[0], x0:x0 + tile_color.shape[1]] = tile_color
+            depth[y0:y0 + tile_depth.shape[0], x0:x0 + tile_depth.shape[1]] = tile_depth
+            if stats is not None:
+                stats._add(tile_stats.evaluations, tile_stats.fallbacks, tile_stats.reason)
+    finally:
+        if workers == 0:
+            # don't keep the scene alive in this process
+            _init_worker(None)
+        else:
+            pool.close()
+            pool.join()
+    return color, depth
+
+
+def _init_worker(csg):
+    global _worker_csg
+    _worker_csg = csg
+
+
+def _render_tile(tile):
+    """Renders one tile of the image, returns (x0, y0, color, depth, TraceStats or None)"""
+    x0, y0, x1, y1, (transform, width, height, focal, lights, config, with_stats) = tile
+    numpy = _csg_base.numpy
+    csg = _worker_csg
+    origin, rd = camera_rays(transform, width, height, focal, (x0, y0, x1, y1))
+    ro = numpy.array(origin)
+    stats = TraceStats() if with_stats else None
+    t, steps, hit = trace_rays(csg, origin, rd, config, stats)
+    color = _sky(numpy, rd)
+    if hit.any():
+        d = rd[hit]
+        th = t[hit][:, numpy.newaxis]
+        p = ro + d * th
+        n = normals(csg, p)
+        refl = d - 2. * (n * d).sum(axis=1)[:, numpy.newaxis] * n
+        col = _sky(numpy, refl) * .2
+        col += .1 * (_sky(numpy, d) * .2 + .4) * numpy.maximum(0., (d * refl).sum(axis=1))[:, numpy.newaxis] ** 7.
+        for position, light_color in lights:
+            col += _light(numpy, p, n, refl, numpy.array(position), numpy.array(light_color))
+        fog = _smoothstep(numpy, 3., 80., th)
+        color[hit] = col * (1. - fog) + color[hit] * fog
+    shape = (y1 - y0, x1 - x0)
+    return x0, y0, numpy.sqrt(numpy.maximum(color, 0.)).reshape(shape + (3,)), t.reshape(shape), stats
+
+
+def normals(csg, points, e=0.001):
+    """
+    Returns the surface normals at the points, by central differences like DE_norm() of the shader.
+    Requires numpy
+    :param csg: CsgBase
+    :param points: numpy array of shape (N, 3)
+    :param e: the distance of the samples
+    :return: numpy array of shape (N, 3) of unit vectors
+    """
+    numpy = _csg_base.numpy
+    x, y, z = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3).T.copy()
+    de = csg.get_distance_arrays
+    n = numpy.empty((len(x), 3))
+    n[:, 0] = de(x + e, y, z) - de(x - e, y, z)
+    n[:, 1] = de(x, y + e, z) - de(x, y - e, z)
+    n[:, 2] = de(x, y, z + e) - de(x, y, z - e)
+    n /= numpy.maximum(numpy.sqrt((n * n).sum(axis=1)), 1e-20)[:, numpy.newaxis]
+    return n
+
+
+def _sky(numpy, rd):
+    """sky_c() of the shader for the (N, 3) directions"""
+    a = numpy.array((.5, .3, .1)) * .2
+    b = numpy.array((.2, .5, .8)) * .3
+    f = (rd[:, 1] * .5 + .5)[:, numpy.newaxis]
+    return (a * (1. - f) + b * f) * .5 * (numpy.sin(rd * 3.) * .1 + .9)
+
+
+def _light(numpy, p, n, refl, position, color):
+    """light() of the shader for the (N, 3) positions, normals and reflections"""
+    ln = position - p
+    dist = numpy.sqrt((ln * ln).sum(axis=1))[:, numpy.newaxis]
+    ln /= numpy.maximum(dist, 1e-20)
+    ph = numpy.maximum(0., (n * ln).sum(axis=1))[:, numpy.newaxis]
+    sh = numpy.maximum(0., (refl * ln).sum(axis=1))[:, numpy.newaxis]
+    return (color * ph ** 2. + color * sh ** 9. * .5) / (1. + dist)
+
+
+def _smoothstep(numpy, edge0, edge1, x):
+    t = numpy.clip((x - edge0) / (edge1 - edge0), 0., 1.)
+    return t * t * (3. - 2. * t)
+
+
+# --- image files ---
+
+def write_image(filename, color):
+    """
+    Writes the colors as 8 bit RGB image, a PNG if the filename ends with .png, a binary PPM otherwise
+    :param filename: str
+    :param color: numpy array of shape (height, width, 3) in the range [0, 1]
+    """
+    numpy = _csg_base.numpy
+    pixels = (numpy.clip(color, 0., 1.) * 255. + .5).astype(numpy.uint8)
+    height, width = pixels.shape[:2]
+    with open(filename, "wb") as f:
+        if filename.lower().endswith(".png"):
+            f.write(_png(width, height, 2, 8, pixels.tobytes()))
+        else:
+            f.write(b"P6\n%d %d\n255\n" % (width, height))
+            f.write(pixels.tobytes())
+
+
+def write_depth(filename, depth, far=100.):
+    """
+    Writes the depth buffer. A .npy file keeps the float values,
+    a .png or other files get 16 bit grayscale PNG or PGM with 0 at the camera, 65535 at far and for misses
+    :param filename: str
+    :param depth: numpy array of shape (height, width), -1. where the ray missed
+    :param far: the depth of the brightest value
+    """
+    numpy = _csg_base.numpy
+    if filename.lower().endswith(".npy"):
+        numpy.save(filename, depth)
+        return
+    d = numpy.where(depth < 0., far, numpy.clip(depth, 0., far))
+    pixels = (d / far * 65535. + .5).astype(">u2")
+    height, width = pixels.shape
+    with open(filename, "wb") as f:
+        if filename.lower().endswith(".png"):
+            f.write(_png(width, height, 0, 16, pixels.tobytes()))
+        else:
+            f.write(b"P5\n%d %d\n65535\n" % (width, height))
+            f.write(pixels.tobytes())
+
+
+def _png(width, height, color_type, bit_depth, data):
+    """Returns the PNG file of the big-endian pixel rows in data"""
+    def chunk(name, body):
+        return struct.pack(">I", len(body)) + name + body + struct.pack(">I", zlib.crc32(name + body))
+    stride = len(data) // height
+    # filter type 0 for each row
+    raw = b"".join(b"\0" + data[y * stride:(y + 1) * stride] for y in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
@@ -1,5 +1,9 @@
+import importlib
+import random
 from unittest import TestCase
 from treenode import TreeNode, TreeNodeVisitor
+from pector import vec3, vec3_array, mat4
+from csg import Sphere, Tube, Plane, Union, Difference, Intersection, Repeat, Fan, DeformFunction
 
 class TestTreeNode(TestCase):
 
@@ -157,3 +161,255 @@ class TestTreeNode(TestCase):
         v = self.NameVisitor()
         v.traverse_reverse(self.create_tree_2())
         self.assertEqual("J, M, I, G, L, K, H, F, D, C, E, B, A, ", v.s)
+
+
+class TestCompiledDistance(TestCase):
+
+    @staticmethod
+    def create_scene():
+        return Union([
+            Sphere(radius=.5, transform=mat4().translate((1,2,3))),
+            Difference([
+                Tube(radius=1, axis=2, transform=mat4().rotate_x(30)),
+                Tube(radius=.6, axis=1),
+                Plane(normal=vec3(1,1,0).normalize(), transform=mat4().rotate_z(20).translate((0,1,0)))
+            ]),
+            Intersection([
+                Repeat(Sphere(radius=.3), repeat=(2,0,3)),
+                Fan(Tube(radius=.2, axis=1, transform=mat4().translate((0,0,2))), axis=1, angle=(10, 40))
+            ], transform=mat4().scale(2)),
+            DeformFunction(Sphere(radius=.7), py_func=lambda pos: pos.rotate_x(pos.x * 10.),
+                           transform=mat4().translate((-2,0,0))),
+            Union(),
+        ])
+
+    def assert_same_distance(self, c):
+        de = c.get_distance_function()
+        r = random.Random(5)
+        for i in range(200):
+            p = vec3(r.uniform(-5, 5), r.uniform(-5, 5), r.uniform(-5, 5))
+            self.assertAlmostEqual(c.get_distance(p), de(*p), places=12)
+
+    def test_distance(self):
+        c = self.create_scene()
+        self.assert_same_distance(c)
+        for node in c.nodes_as_set():
+            if node.nodes or not node.can_have_nodes:
+                self.assert_same_distance(node)
+        self.assertEqual(1.e+20, Union().get_distance_function()(0, 0, 0))
+
+    def test_cache(self):
+        c = self.create_scene()
+        de = c.get_distance_function()
+        self.assertIs(de, c.get_distance_function())
+        sphere = c.nodes[0]
+        sphere.radius = 1.
+        self.assertIsNot(de, c.get_distance_function())
+        self.assertAlmostEqual(-1., c.get_distance_function()(1, 2, 3))
+        de = c.get_distance_function()
+        c.nodes[1].set_transform(mat4().translate((0,0,1)))
+        self.assertIsNot(de, c.get_distance_function())
+        de = c.get_distance_function()
+        c.nodes[4].add_node(Sphere(radius=.1, transform=mat4().translate((3,3,3))))
+        self.assertIsNot(de, c.get_distance_function())
+        self.assertAlmostEqual(-.1, c.get_distance_function()(3, 3, 3))
+        self.assert_same_distance(c)
+
+    def test_trace(self):
+        c = Sphere(transform=mat4().translate((0,0,-5)))
+        self.assertAlmostEqual(4., c.sphere_trace(vec3(0), vec3(0,0,-1)), places=2)
+        self.assertEqual(-1., c.sphere_trace(vec3(0), vec3(0,0,1)))
+        self.assertEqual(vec3(0,1,0), c.get_normal(vec3(0,2,-5)).round(6))
+
+    def test_batch(self):
+        import numpy
+        c = self.create_scene()
+        c.nodes[3].numpy_func = lambda x, y, z: (
+            x, y * numpy.cos(x * 10.) - z * numpy.sin(x * 10.), y * numpy.sin(x * 10.) + z * numpy.cos(x * 10.))
+        points = numpy.random.RandomState(3).uniform(-5, 5, (1000, 3))
+        expected = [c.get_distance(vec3(p)) for p in points.tolist()]
+        numpy.testing.assert_allclose(expected, c.get_distance_batch(points), atol=1e-9)
+        numpy.testing.assert_allclose(expected, c.get_distance_batch(points, chunk_size=33), atol=1e-9)
+        c.nodes[3].numpy_func = None
+        numpy.testing.assert_allclose(expected, c.get_distance_batch(points.tolist()), atol=1e-9)
+        for node in c.nodes_as_set():
+            if node.nodes or not node.can_have_nodes:
+                numpy.testing.assert_allclose([node.get_distance(vec3(p)) for p in points.tolist()],
+                                              node.get_distance_batch(points), atol=1e-9)
+        self.assertEqual((0,), Sphere().get_distance_batch(numpy.zeros((0, 3))).shape)
+        self.assertAlmostEqual(expected[7], c.get_distance_batch(vec3_array(points.tolist()))[7])
+        numpy.testing.assert_allclose(expected, c.get_distance_batch(points.reshape(-1)), atol=1e-9)
+        for shape in ((4, 6), (3, 5), (2, 2, 3), (4,)):
+            with self.assertRaises(ValueError):
+                c.get_distance_batch(numpy.zeros(shape))
+        csg_base = importlib.import_module("csg.csg_base")
+        array_base = importlib.import_module("pector.array_base")
+        csg_base.numpy = None
+        array_base.numpy = None
+        try:
+            numpy.testing.assert_allclose(expected, c.get_distance_batch(points.tolist()), atol=1e-9)
+            # the slice is a view with memoryview storage
+            numpy.testing.assert_allclose(expected[2:10], c.get_distance_batch(vec3_array(points.tolist())[2:10]),
+                                          atol=1e-9)
+        finally:
+            csg_base.numpy = numpy
+            array_base.numpy = numpy
+
+
+class TestTrace(TestCase):
+
+    def test_trace_rays(self):
+        import numpy
+        from csg import trace
+        c = TestCompiledDistance.create_scene()
+        origin, directions = trace.camera_rays(mat4().rotate_y(20).translate((0,0,8)), 16, 12)
+        t, steps, hit = trace.trace_rays(c, origin, directions, packet_size=50)
+        self.assertTrue(hit.any() and not hit.all())
+        expected = [c.sphere_trace(origin, vec3(d)) for d in directions.tolist()]
+        numpy.testing.assert_allclose(expected, t, atol=1e-9)
+        self.assertEqual(list(hit), [e >= 0. for e in expected])
+        self.assertTrue((steps[hit] < 150).all())
+        # misses leave early with a maximum distance
+        t2, steps2, hit2 = trace.trace_rays(c, origin, directions, max_distance=20.)
+        self.assertEqual(list(hit), list(hit2))
+        self.assertLess(steps2.sum(), steps.sum())
+        csg_base = importlib.import_module("csg.csg_base")
+        csg_base.numpy = None
+        try:
+            t3, steps3, hit3 = trace.trace_rays(c, origin, directions.tolist(), max_distance=20.)
+        finally:
+            csg_base.numpy = numpy
+        numpy.testing.assert_allclose(t2, t3)
+        self.assertEqual(list(steps2), list(steps3))
+        self.assertEqual(list(hit2), list(hit3))
+
+    def test_camera_shadow_depth(self):
+        import numpy
+        from csg import trace
+        origin, directions = trace.camera_rays(mat4().translate((1,2,3)), 3, 3)
+        self.assertEqual((1,2,3), origin)
+        self.assertEqual([0,0,-1], directions[4].tolist())
+        origin, directions = trace.camera_rays(mat4().rotate_y(90), 3, 3)
+        self.assertEqual([-1,0,0], directions[4].round(8).tolist())
+        c = Sphere(transform=mat4().translate((0,0,-5)))
+        depth = trace.depth_map(c, mat4(), 9, 9)
+        self.assertEqual((9, 9), depth.shape)
+        self.assertAlmostEqual(4., depth[4, 4], places=2)
+        self.assertEqual(-1., depth[0, 0])
+        points = [(0,0,-2), (0,0,-8), (3,0,-5)]
+        self.assertEqual([True, False, False], trace.shadow_rays(c, points, (0,0,-10)).tolist())
+        self.assertEqual([False, True, False], trace.shadow_rays(c, points, (0,0,-3)).tolist())
+        self.assertEqual([False, True, False], trace.shadow_rays(c, points, (0,0,1), is_direction=True).tolist())
+
+    def test_config_and_stats(self):
+        import numpy
+        from csg import trace
+        c = TestCompiledDistance.create_scene()
+        cam = mat4().rotate_y(20).translate((0,0,8))
+        origin, directions = trace.camera_rays(cam, 16, 12)
+        stats = trace.TraceStats()
+        t, steps, hit = trace.trace_rays(c, origin, directions, stats=stats)
+        self.assertEqual(steps.sum(), stats.total_evaluations())
+        self.assertEqual(stats.total_evaluations(), stats.total_steps())
+        counts = stats.reason_counts()
+        self.assertEqual(hit.sum(), counts["hit"])
+        self.assertEqual(len(hit), sum(counts.values()))
+        # misses stop at max_distance instead of max_steps
+        stats = trace.TraceStats()
+        config = trace.TraceConfig(max_distance=30.)
+        t2, steps2, hit2 = trace.trace_rays(c, origin, directions, config, stats)
+        self.assertEqual(list(hit), list(hit2))
+        self.assertEqual(0, stats.reason_counts()["max_steps"])
+        # the hit distance grows with the pixel cone
+        cone = trace.TraceConfig.for_camera(12, max_distance=30.)
+        t3, steps3, hit3 = trace.trace_rays(c, origin, directions, cone)
+        self.assertTrue((steps3 <= steps2).all())
+        # the same steps, up to the earlier hit
+        self.assertTrue(hit3[hit2].all())
+        self.assertTrue((t3[hit2] <= t2[hit2]).all())
+        # over-relaxed, with the same hits
+        plane = Plane(transform=mat4().translate((0,-1,0)))
+        origin, directions = trace.camera_rays(mat4().rotate_x(-10), 16, 12)
+        stats, relaxed_stats = trace.TraceStats(), trace.TraceStats()
+        t4, steps4, hit4 = trace.trace_rays(plane, origin, directions, stats=stats, max_distance=100.)
+        t5, steps5, hit5 = trace.trace_rays(plane, origin, directions, stats=relaxed_stats, max_distance=100.,
+                                            relaxation=1.6)
+        self.assertEqual(list(hit4), list(hit5))
+        numpy.testing.assert_allclose(t4[hit4], t5[hit5], atol=.01)
+        self.assertLess(relaxed_stats.total_evaluations(), stats.total_evaluations())
+        self.assertGreater(sum(relaxed_stats.fallbacks), 0)
+        # the same in python, ray by ray
+        config = trace.TraceConfig(max_distance=100., relaxation=1.6, pixel_cone=.01, fudge=.9)
+        t6, steps6, hit6 = trace.trace_rays(c, origin, directions, config)
+        csg_base = importlib.import_module("csg.csg_base")
+        csg_base.numpy = None
+        try:
+            python_stats = trace.TraceStats()
+            t7, steps7, hit7 = trace.trace_rays(c, origin, directions.tolist(), config, python_stats)
+        finally:
+            csg_base.numpy = numpy
+        numpy.testing.assert_allclose(t6, t7)
+        self.assertEqual(list(steps6), list(steps7))
+        self.assertEqual(len(hit6), len(python_stats))
+        stats = trace.TraceStats()
+        self.assertAlmostEqual(t6[40], c.sphere_trace(vec3(origin), vec3(directions[40]), config, stats))
+        self.assertEqual(steps6[40], stats.evaluations[0])
+        # python rays, numpy rays and rendered tiles into the same statistics
+        from csg import render
+        c.sphere_trace(vec3(origin), vec3(directions[40]), config, stats)
+        trace.trace_rays(c, origin, directions, config, stats)
+        c.sphere_trace(vec3(origin), vec3(directions[40]), config, stats)
+        render.render_image(c, cam, 8, 6, workers=0, stats=stats)
+        c.sphere_trace(vec3(origin), vec3(directions[40]), config, stats)
+        self.assertEqual(1 + 1 + len(hit6) + 1 + 48 + 1, len(stats))
+        self.assertEqual(steps6[40], stats.evaluations[-1])
+        self.assertEqual(len(stats), sum(stats.reason_counts().values()))
+        with self.assertRaises(ValueError):
+            trace.TraceConfig(relaxation=2.)
+        with self.assertRaises(TypeError):
+            config.updated(epsilom=1.)
+
+
+class TestRender(TestCase):
+
+    def test_render_image(self):
+        import os, tempfile, zlib
+        import numpy
+        from csg import render
+        c = TestCompiledDistance.create_scene()
+        cam = mat4().rotate_y(20).translate((0,0,8))
+        color, depth = render.render_image(c, cam, 24, 18, workers=0, tile_size=10)
+        self.assertEqual((18, 24, 3), color.shape)
+        self.assertEqual((18, 24), depth.shape)
+        self.assertTrue(numpy.isfinite(color).all())
+        self.assertTrue((color >= 0.).all() and (color <= 1.).all())
+        from csg import trace
+        numpy.testing.assert_allclose(trace.depth_map(c, cam, 24, 18, max_distance=100.), depth)
+        color2, depth2 = render.render_image(c, cam, 24, 18, workers=2, tile_size=7)
+        numpy.testing.assert_allclose(color, color2)
+        numpy.testing.assert_allclose(depth, depth2)
+        # the scene is not kept by this process
+        self.assertIsNone(render._worker_csg)
+        # without fork, python functions of DeformFunction can not be sent to the workers
+        from unittest import mock
+        with mock.patch.object(render.multiprocessing, "get_all_start_methods", lambda: ["spawn"]):
+            with self.assertRaises(TypeError):
+                render.render_image(c, cam, 4, 3, workers=2)
+        with tempfile.TemporaryDirectory() as path:
+            render.write_image(os.path.join(path, "a.ppm"), color)
+            with open(os.path.join(path, "a.ppm"), "rb") as f:
+                self.assertEqual(b"P6\n24 18\n255\n", f.read(13))
+                self.assertEqual(24 * 18 * 3, len(f.read()))
+            render.write_image(os.path.join(path, "a.png"), color)
+            with open(os.path.join(path, "a.png"), "rb") as f:
+                data = f.read()
+            self.assertEqual(b"\x89PNG\r\n\x1a\n", data[:8])
+            idat = data.index(b"IDAT")
+            size = int.from_bytes(data[idat-4:idat], "big")
+            self.assertEqual(18 * (1 + 24 * 3), len(zlib.decompress(data[idat+4:idat+4+size])))
+            render.write_depth(os.path.join(path, "d.pgm"), depth)
+            with open(os.path.join(path, "d.pgm"), "rb") as f:
+                self.assertEqual(b"P5\n24 18\n65535\n", f.read(15))
+                self.assertEqual(24 * 18 * 2, len(f.read()))
+            render.write_depth(os.path.join(path, "d.npy"), depth)
+            numpy.testing.assert_equal(depth, numpy.load(os.path.join(path, "d.npy")))
@@ -0,0 +1,365 @@
+import importlib
+from array import array
+from pector import vec3, mat4
+from .csg_base import INFINITY
+
+# the module, to see numpy = None in tests
+_csg_base = importlib.import_module(".csg_base", __package__)
+
+# termination reasons of a ray
+HIT = 0
+MAX_DISTANCE = 1
+MAX_STEPS = 2
+
+
+class TraceConfig:
+    """
+    The settings of the sphere tracer.
+    The defaults give the classic sphere tracing of CsgBase.sphere_trace()
+    """
+    def __init__(self, max_steps=150, epsilon=0.001, max_distance=INFINITY, pixel_cone=0.,
+                 relaxation=1., fudge=1., start=0.):
+        """
+        :param max_steps: the maximum number of distance evaluations per ray
+        :param epsilon: the distance that counts as hit at the ray origin
+        :param max_distance: rays are retired as miss when t gets larger,
+        trace_rays() also takes an array with one value per ray
+        :param pixel_cone: the growth of the hit distance per unit of t, e.g. the size of a pixel
+        at distance 1, the hit distance is epsilon + pixel_cone * t. See for_camera()
+        :param relaxation: over-relaxation factor of the steps in [1, 2). When the sphere of a step
+        does not overlap the sphere of the step before, the step went too far: the ray goes back
+        and continues without over-relaxation
+        :param fudge: factor of all steps, values < 1 like DE_FUDGE of the shader
+        make the tracing safe for distance functions that over-estimate, e.g. with Fan
+        :param start: the t to start marching at, e.g. to leave a surface
+        """
+        if not max_steps >= 0:
+            raise ValueError("Expected max_steps >= 0, got %s" % max_steps)
+        if not 1. <= relaxation < 2.:
+            raise ValueError("Expected relaxation in [1, 2), got %s" % relaxation)
+        if not 0. < fudge <= 1.:
+            raise ValueError("Expected fudge in (0, 1], got %s" % fudge)
+        self.max_steps = int(max_steps)
+        self.epsilon = float(epsilon)
+        self.max_distance = max_distance
+        self.pixel_cone = float(pixel_cone)
+        self.relaxation = float(relaxation)
+        self.fudge = float(fudge)
+        self.start = float(start)
+
+    def __repr__(self):
+        return "TraceConfig(%s)" % ", ".join("%s=%r" % (k, getattr(self, k)) for k in (
+            "max_steps", "epsilon", "max_distance", "pixel_cone", "relaxation", "fudge", "start"))
+
+    @classmethod
+    def for_camera(cls, height, focal=1.2, pixels=1., **kwargs):
+        """
+        Returns a config whose hit distance grows with the size of the pixels of trace.camera_rays()
+        :param height: int, the image height in pixels
+        :param focal: float, see camera_rays()
+        :param pixels: the hit distance in pixels
+        :param kwargs: the further settings
+        """
+        return cls(pixel_cone=pixels * 2. / (height * focal), **kwargs)
+
+    def updated(self, **kwargs):
+        """Returns a copy with the given settings changed"""
+        return TraceConfig(**dict(self.__dict__, **kwargs))
+
+
+class TraceStats:
+    """
+    The statistics of traced rays, pass an instance to trace_rays() or CsgBase.sphere_trace().
+    The attributes are array('l') or array('b') with one value per ray, also for numpy rays:
+        evaluations: the number of distance evaluations
+        fallbacks:   the number of over-relaxed steps that were taken back
+        reason:      the termination reason, HIT, MAX_DISTANCE or MAX_STEPS
+    """
+    REASONS = ("hit", "max_distance", "max_steps")
+
+    def __init__(self):
+        self.evaluations = array("l")
+        self.fallbacks = array("l")
+        self.reason = array("b")
+
+    def __len__(self):
+        return len(self.reason)
+
+    def __str__(self):
+        n = max(1, len(self))
+        counts = self.reason_counts()
+        return "TraceStats(%d rays, %.2f evaluations/ray, %.2f steps/ray, %s)" % (
+            len(self), self.total_evaluations() / n, self.total_steps() / n,
+            ", ".join("%s %d" % (name, counts[name]) for name in self.REASONS))
+
+    def total_evaluations(self):
+        return int(sum(self.evaluations))
+
+    def total_steps(self):
+        """The number of steps taken, e.g. evaluations without the taken back steps"""
+        return self.total_evaluations() - int(sum(self.fallbacks))
+
+    def reason_counts(self):
+        """Returns a dict of the number of rays for each name in REASONS"""
+        counts = [0] * len(self.REASONS)
+        for r in self.reason:
+            counts[r] += 1
+        return {name: counts[i] for i, name in enumerate(self.REASONS)}
+
+    def _add(self, evaluations, fallbacks, reason):
+        """Appends the values of more rays, sequences or numpy arrays, the attributes stay arrays"""
+        numpy = _csg_base.numpy
+        for values, a in ((evaluations, self.evaluations), (fallbacks, self.fallbacks), (reason, self.reason)):
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                a.frombytes(numpy.ascontiguousarray(values, dtype="i%d" % a.itemsize).tobytes())
+            else:
+                a.extend(values)
+
+
+def _config(config, kwargs):
+    if config is None:
+        return TraceConfig(**kwargs)
+    return config.updated(**kwargs) if kwargs else config
+
+
+def trace_ray(csg, ro, rd, config=None, stats=None, **kwargs):
+    """
+    Sphere traces one ray with the compiled python distance function of the csg object
+    :param csg: CsgBase
+    :param ro: vec3, the ray origin
+    :param rd: vec3, the unit direction
+    :param config: optional TraceConfig
+    :param stats: optional TraceStats that receives the statistics of the ray
+    :param kwargs: TraceConfig settings
+    :return: the distance along the ray to the surface or -1. for misses
+    """
+    config = _config(config, kwargs)
+    t, evaluations, fallbacks, reason = _trace_ray_python(csg.get_distance_function(), ro, rd, config,
+                                                          float(config.max_distance))
+    if stats is not None:
+        stats._add((evaluations,), (fallbacks,), (reason,))
+    return t
+
+
+def _trace_ray_python(de, ro, rd, config, max_distance):
+    """Returns (t, evaluations, fallbacks, reason) of one ray"""
+    ox, oy, oz = ro
+    dx, dy, dz = rd
+    epsilon, cone, fudge = config.epsilon, config.pixel_cone, config.fudge
+    omega = config.relaxation
+    t = config.start
+    prev_d, last_step = INFINITY, 0.
+    fallbacks = 0
+    for step in range(config.max_steps):
+        d = de(ox + dx * t, oy + dy * t, oz + dz * t)
+        if omega > 1. and d + prev_d < last_step:
+            # the spheres do not overlap, step back and continue without over-relaxation
+            fallbacks += 1
+            omega = 1.
+            t -= last_step
+            last_step = fudge * prev_d
+        else:
+            if d < epsilon + cone * t:
+                return t, step + 1, fallbacks, HIT
+            prev_d = d
+            last_step = fudge * omega * d
+        t += last_step
+        if t > max_distance:
+            return -1., step + 1, fallbacks, MAX_DISTANCE
+    return -1., config.max_steps, fallbacks, MAX_STEPS
+
+
+def trace_rays(csg, origins, directions, config=None, stats=None, packet_size=65536, **kwargs):
+    """
+    Sphere traces many rays together.
+    All active rays of a packet are marched with one vectorized distance evaluation per step,
+    rays that hit or leave max_distance are retired from the packet.
+    With the default config, a ray hits if the distance gets below epsilon within max_steps evaluations,
+    it's t is the same as csg.sphere_trace() returns for the ray.
+    Without numpy each ray is traced with the compiled python distance function
+    :param csg: CsgBase
+    :param origins: numpy array of shape (N, 3), or one origin for all rays
+    :param directions: numpy array of shape (N, 3) of unit vectors, or one direction for all rays
+    :param config: optional TraceConfig
+    :param stats: optional TraceStats that receives the statistics of the rays
+    :param packet_size: the number of rays traced together
+    :param kwargs: TraceConfig settings, e.g. max_distance=100.
+    :return: tuple of (t, steps, hit), the arrays of the distance along the ray (-1. for misses),
+    the number of distance evaluations and the hit mask
+    """
+    config = _config(config, kwargs)
+    numpy = _csg_base.numpy
+    if numpy is None:
+        return _trace_rays_python(csg, origins, directions, config, stats)
+    origins = numpy.asarray(origins, dtype=numpy.float64).reshape(-1, 3)
+    directions = numpy.asarray(directions, dtype=numpy.float64).reshape(-1, 3)
+    n = max(len(origins), len(directions))
+    origins = numpy.broadcast_to(origins, (n, 3))
+    directions = numpy.broadcast_to(directions, (n, 3))
+    max_distance = numpy.broadcast_to(numpy.asarray(config.max_distance, dtype=numpy.float64), (n,))
+    t = numpy.full(n, -1.)
+    steps = numpy.full(n, config.max_steps, dtype=numpy.int64)
+    hit = numpy.zeros(n, dtype=bool)
+    fallbacks = numpy.zeros(n, dtype=numpy.int64)
+    reason = numpy.full(n, MAX_STEPS, dtype=numpy.int8)
+    for first in range(0, n, packet_size):
+        last = min(n, first + packet_size)
+        _trace_packet(csg, numpy, config, origins[first:last].T.copy(), directions[first:last].T.copy(),
+                      max_distance[first:last].copy(),
+                      t[first:last], steps[first:last], hit[first:last], fallbacks[first:last], reason[first:last])
+    if stats is not None:
+        stats._add(steps, fallbacks, reason)
+    return t, steps, hit
+
+
+def _trace_packet(csg, numpy, config, o, d, max_distance, t_out, steps_out, hit_out, fallbacks_out, reason_out):
+    """Traces one packet, o and d are the (3, n) component arrays, the results are written to the views"""
+    ox, oy, oz = o
+    dx, dy, dz = d
+    epsilon, cone, fudge = config.epsilon, config.pixel_cone, config.fudge
+    relaxed = config.relaxation > 1.
+    n = len(ox)
+    # the indices of the active rays into the packet
+    index = numpy.arange(n)
+    t = numpy.full(n, config.start)
+    if relaxed:
+        omega = numpy.full(n, config.relaxation)
+        prev_d = numpy.full(n, INFINITY)
+        last_step = numpy.zeros(n)
+    for step in range(config.max_steps):
+        if not len(index):
+            break
+        dist = csg.get_distance_arrays(ox + dx * t, oy + dy * t, oz + dz * t)
+        is_hit = dist < (epsilon + cone * t if cone else epsilon)
+        if relaxed:
+            # where the spheres do not overlap, step back and continue without over-relaxation
+            fail = (omega > 1.) & (dist + prev_d < last_step)
+            is_hit &= ~fail
+            step_length = numpy.where(fail, fudge * prev_d, fudge * omega * dist)
+            t_next = numpy.where(fail, t - last_step, t) + step_length
+            if fail.any():
+                fallbacks_out[index[fail]] += 1
+                omega[fail] = 1.
+            prev_d = numpy.where(fail, prev_d, dist)
+            last_step = step_length
+        else:
+            t_next = t + fudge * dist if fudge < 1. else t + dist
+        escaped = ~is_hit & (t_next > max_distance)
+        done = is_hit | escaped
+        if done.any():
+            retired = index[done]
+            hits = retired[is_hit[done]]
+            t_out[hits] = t[is_hit]
+            hit_out[hits] = True
+            reason_out[hits] = HIT
+            reason_out[index[escaped]] = MAX_DISTANCE
+            steps_out[retired] = step + 1
+            keep = ~done
+            index = index[keep]
+            ox, oy, oz, dx, dy, dz = ox[keep], oy[keep], oz[keep], dx[keep], dy[keep], dz[keep]
+            t_next, max_distance = t_next[keep], max_distance[keep]
+            if relaxed:
+                omega, prev_d, last_step = omega[keep], prev_d[keep], last_step[keep]
+        t = t_next
+
+
+def _trace_rays_python(csg, origins, directions, config, stats):
+    """trace_rays() without numpy, ray by ray with the compiled distance function"""
+    de = csg.get_distance_function()
+    origins = _vec3_list(origins)
+    directions = _vec3_list(directions)
+    n = max(len(origins), len(directions))
+    max_distance = config.max_distance
+    if not hasattr(max_distance, "__len__"):
+        max_distance = [float(max_distance)] * n
+    t_out, steps_out, hit_out = array("d", [-1.] * n), array("l", [0] * n), array("b", bytes(n))
+    fallbacks, reason = array("l", [0] * n), array("b", bytes(n))
+    for i in range(n):
+        t_out[i], steps_out[i], fallbacks[i], reason[i] = _trace_ray_python(
+            de, origins[i if len(origins) > 1 else 0], directions[i if len(directions) > 1 else 0],
+            config, float(max_distance[i]))
+        hit_out[i] = reason[i] == HIT
+    if stats is not None:
+        stats._add(steps_out, fallbacks, reason)
+    return t_out, steps_out, hit_out
+
+
+def _vec3_list(arg):
+    """Returns a list of float 3-tuples from one vec3, a vec3_array or a sequence of vec3"""
+    if len(arg) == 3 and not hasattr(arg[0], "__len__"):
+        return [tuple(float(x) for x in arg)]
+    if hasattr(arg, "data") and isinstance(arg.data, array):
+        v = arg.data
+        return list(zip(v[0::3], v[1::3], v[2::3]))
+    return [tuple(float(x) for x in a) for a in arg]
+
+
+def camera_rays(transform, width, height, focal=1.2, rect=None):
+    """
+    Returns the rays through the pixel centers of an image, like get_ray() of the shader window:
+    the camera looks along -z of the transform, x is right and y is up. Requires numpy.
+    The first ray is the top-left pixel, the rays are in row-major order
+    :param transform: mat4, the camera position and orientation
+    :param width: int, the image width in pixels
+    :param height: int, the image height in pixels
+    :param focal: float, the z distance of the image plane, whose height is 2
+    :param rect: optional (x0, y0, x1, y1) pixel rectangle, to return only the rays of a tile
+    :return: tuple of (origin vec3, numpy array of shape (width * height, 3) of unit directions)
+    """
+    numpy = _csg_base.numpy
+    transform = mat4(transform)
+    x0, y0, x1, y1 = rect or (0, 0, width, height)
+    u = ((numpy.arange(x0, x1) + .5) / width * 2. - 1.) * width / height
+    v = 1. - (numpy.arange(y0, y1) + .5) / height * 2.
+    d = numpy.empty((y1 - y0, x1 - x0, 3))
+    d[:, :, 0] = u[numpy.newaxis, :]
+    d[:, :, 1] = v[:, numpy.newaxis]
+    d[:, :, 2] = -focal
+    d = d.reshape(-1, 3)
+    d /= numpy.sqrt((d * d).sum(axis=1))[:, numpy.newaxis]
+    # the column-major storage is the transposed matrix, for the row vectors
+    m = numpy.array(transform.v).reshape(4, 4)[:3, :3]
+    return transform.position(), d.dot(m)
+
+
+def depth_map(csg, transform, width, height, focal=1.2, **kwargs):
+    """
+    Renders the distance from the camera to the surface for each pixel. Requires numpy
+    :param csg: CsgBase
+    :param transform: mat4, the camera, see camera_rays()
+    :param width: int, the image width in pixels
+    :param height: int, the image height in pixels
+    :param focal: float, see camera_rays()
+    :param kwargs: further arguments to trace_rays()
+    :return: numpy array of shape (height, width), -1. where the ray missed
+    """
+    origin, directions = camera_rays(transform, width, height, focal)
+    t, steps, hit = trace_rays(csg, origin, directions, **kwargs)
+    return t.reshape(height, width)
+
+
+def shadow_rays(csg, points, light, is_direction=False, start=0.01, **kwargs):
+    """
+    Returns which points are in shadow, e.g. which rays from the points to the light hit a surface.
+    Requires numpy
+    :param csg: CsgBase
+    :param points: numpy array of shape (N, 3), e.g. the hit positions of camera rays
+    :param light: the light position, or the direction towards the light if is_direction is True
+    :param is_direction: True for a directional light, the rays are not limited in length
+    :param start: the distance along the rays to start at, to leave the surface of the points
+    :param kwargs: further arguments to trace_rays()
+    :return: numpy array of bool, True for points in shadow
+    """
+    numpy = _csg_base.numpy
+    points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+    if is_direction:
+        directions = numpy.array(vec3(light).normalized())[numpy.newaxis, :]
+        distance = None
+    else:
+        directions = numpy.array(vec3(light))[numpy.newaxis, :] - points
+        distance = numpy.sqrt((directions * directions).sum(axis=1))
+        directions = directions / numpy.maximum(distance, 1e-20)[:, numpy.newaxis]
+    if distance is not None:
+        kwargs["max_distance"] = distance
+    t, steps, hit = trace_rays(csg, points, directions, start=start, **kwargs)
+    return hit
@@ -1,3 +1,4 @@
+import ctypes
 import pyglet, pyshaders, math
 from csg.glsl import render_glsl
 from pector import vec3, mat4, quat
@@ -338,13 +339,13 @@ class Spaceship:
         d.normalize_safe()
         q = vec3(0,0,-1).get_rotation_to(d)
         adjust = max(0.,min(1., (di-2.)/40.)) * 10.
-        q = quat().lerp(q, self.delta*adjust).normalize()
+        q = quat().nlerp(q, self.delta*adjust)
         self.transform *= q.as_mat4()
         self.velocity.z -= self.delta * max(1., -d.z * 10. -self.velocity.z * .5)
 
     def collide(self):
         p = self.transform.copy().translate(self.velocity * self.delta).position()
-        d = self.dist_field.get_distance(p)
+        d = self.dist_field.get_distance_function()(*p)
         if d < 0.0:
             n = self.dist_field.get_normal(p)
             self.transform = mat4().translate(-d*1.1 * n) * self.transform
@@ -383,6 +384,8 @@ class RenderWindow(pyglet.window.Window):
         super(RenderWindow, self).__init__(width=480, height=320, resizable=True,
                                            vsync=True)
         self.shader = None
+        # uniform locations of the current shader program by name
+        self.uniform_locations = {}
         self.dist_field = dist_field
         self.uv = (0,0)
         self.is_hit = False
@@ -406,6 +409,7 @@ class RenderWindow(pyglet.window.Window):
             self.shader = pyshaders.from_string(
                                 vert_src,
                                 frag )
+            self.uniform_locations = {}
             self.shader.use()
         except pyshaders.ShaderCompilationError as e:
             print(e.logs)
@@ -414,6 +418,24 @@ class RenderWindow(pyglet.window.Window):
     def on_close(self):
         self.shader.clear()
 
+    def set_uniform_mat4(self, name, mat):
+        """Uploads the matrix as column-major float32 buffer,
+        instead of the nested lists the pyshaders setter expects.
+        The location is queried from the program id and the program is bound if it's not current"""
+        pid = self.shader.pid
+        current = pyglet.gl.GLint(0)
+        pyglet.gl.glGetIntegerv(pyglet.gl.GL_CURRENT_PROGRAM, ctypes.byref(current))
+        if not current.value == pid:
+            self.shader.use()
+        loc = self.uniform_locations.get(name)
+        if loc is None:
+            loc = pyglet.gl.glGetUniformLocation(pid, ctypes.create_string_buffer(name.encode("ascii")))
+            self.uniform_locations[name] = loc
+        if loc < 0:
+            raise ValueError("No active uniform '%s' in the shader program" % name)
+        data = (pyglet.gl.GLfloat * 16).from_buffer(mat.as_buffer("f"))
+        pyglet.gl.glUniformMatrix4fv(loc, 1, pyglet.gl.GL_FALSE, data)
+
     def update(self, dt):
         self.spaceship.delta = dt
         self.spaceship.check_keys(self.keys)
@@ -433,12 +455,12 @@ class RenderWindow(pyglet.window.Window):
         if "u_hit_pos" in self.shader.uniforms:
             self.shader.uniforms.u_hit_pos = tuple(self.hit_pos)
         if "u_transform" in self.shader.uniforms:
-            self.shader.uniforms.u_transform = self.transform.as_list_list(row_major=True)
+            self.set_uniform_mat4("u_transform", self.transform)
         if self.spaceship.follower:
             if "u_ship1" in self.shader.uniforms and self.spaceship.follower:
-                self.shader.uniforms.u_ship1 = self.spaceship.follower[0].transform.as_list_list(row_major=True)
+                self.set_uniform_mat4("u_ship1", self.spaceship.follower[0].transform)
             if "u_ship1_i" in self.shader.uniforms and self.spaceship.follower:
-                self.shader.uniforms.u_ship1_i = self.spaceship.follower[0].transform.inversed_simple().as_list_list(row_major=True)
+                self.set_uniform_mat4("u_ship1_i", self.spaceship.follower[0].transform.inversed_simple())
 
         pyglet.graphics.draw(6, pyglet.gl.GL_TRIANGLES,
                              ('v2f', (-1,-1, 1,-1, -1,1
@@ -1,7 +1,19 @@
+from .tools import set_checks, checks_enabled
 from .vec_base import vec_base
 from .mat_base import mat_base
+from .array_base import array_base
 from .vec2 import vec2
 from .vec3 import vec3
+from .vec4 import vec4
 from .mat3 import mat3
 from .mat4 import mat4
 from .quat import quat
+from .vec2_array import vec2_array
+from .vec3_array import vec3_array
+from .vec4_array import vec4_array
+from .quat_array import quat_array
+from .mat4_array import mat4_array
+from .lazy import lazy, fuse
+from .track import track, sample_tracks
+from . import functions
+from . import binary
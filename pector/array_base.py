@@ -0,0 +1,511 @@
+import math
+import operator
+import sys
+from array import array
+from itertools import cycle, repeat
+from . import tools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+Abstract base class for arrays of vectors
+"""
+
+
+def _is_ndarray(data):
+    return numpy is not None and isinstance(data, numpy.ndarray)
+
+
+class array_base:
+    """
+    Base class for contiguous arrays of vectors.
+    The components are stored interleaved, e.g. x0,y0,z0, x1,y1,z1, ... in self.data,
+    which is a numpy.ndarray of shape (len, size) when numpy is installed,
+    or a flat float64 buffer (array('d') or memoryview) otherwise.
+    Indexing returns elements that are views into the storage.
+    Arguments to member functions can be numbers, float sequences of the element size,
+    or arrays of the same type and length.
+    Functions returning one float per element return a numpy.ndarray or an array('d')
+    """
+
+    __slots__ = ("data",)
+
+    # the vec_base type of the elements, set by derived classes
+    element = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "element" in cls.__dict__:
+            cls._default = tuple(cls.element())
+            cls._size = len(cls._default)
+
+    def __init__(self, arg=0):
+        """
+        :param arg: either the number of elements, initialized like element(),
+        or a sequence of float sequences of the element size
+        """
+        if type(arg) is int:
+            values = array("d", self._default) * arg
+        else:
+            values = array("d")
+            for e in arg:
+                if not type(e) is self.element:
+                    tools.check_float_sequence(e, self._size)
+                values.extend([float(x) for x in e])
+        self.data = self._wrap(values)
+
+    @classmethod
+    def _new(cls, data):
+        """
+        Creates an instance that uses data as storage, without checks or copying
+        :return: new instance
+        """
+        self = object.__new__(cls)
+        self.data = data
+        return self
+
+    @classmethod
+    def _wrap(cls, values):
+        """Returns the storage for the flat array('d') values"""
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype=numpy.float64).reshape(-1, cls._size)
+        return values
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        """
+        Creates an array that uses the flat float64 buffer as storage, without copying.
+        :param buffer: array('d'), numpy.ndarray, bytearray, memoryview or any writable
+        object supporting the buffer protocol, length must be a multiple of the element size
+        :return: new array
+        """
+        if _is_ndarray(buffer):
+            if not buffer.dtype == numpy.float64 or not buffer.flags.c_contiguous:
+                raise TypeError("Expected contiguous float64 ndarray, got %s" % buffer.dtype)
+            data = buffer.reshape(-1, cls._size)
+        else:
+            data = memoryview(buffer)
+            if not data.format == "d":
+                data = data.cast("B").cast("d")
+            if not len(data) % cls._size == 0:
+                raise ValueError("Buffer length %d is not a multiple of %d" % (len(data), cls._size))
+            if numpy is not None:
+                data = numpy.frombuffer(data, dtype=numpy.float64).reshape(-1, cls._size)
+        return cls._new(data)
+
+    def __str__(self):
+        r = ", ".join(str(e) for e in self[:8])
+        if len(self) > 8:
+            r += ", ..."
+        return "%s([%s])" % (self.__class__.__name__, r)
+
+    def __repr__(self):
+        return self.__str__()
+
+    # --- list-like ---
+
+    def __len__(self):
+        if _is_ndarray(self.data):
+            return len(self.data)
+        return len(self.data) // self._size
+
+    def __iter__(self):
+        flat = self._flat()
+        s = self._size
+        for i in range(0, len(flat), s):
+            yield self.element._new(flat[i:i+s])
+
+    def __getitem__(self, item):
+        """
+        Returns the element at index item as a view into the array,
+        or for contiguous slices, an array that is a view into this array
+        """
+        s = self._size
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if not step == 1:
+                raise IndexError("%s only supports contiguous slices" % self.__class__.__name__)
+            stop = max(start, stop)
+            if _is_ndarray(self.data):
+                return self._new(self.data[start:stop])
+            return self._new(memoryview(self.data)[start*s:stop*s])
+        n = len(self)
+        if item < 0:
+            item += n
+        if not 0 <= item < n:
+            raise IndexError("%s index out of range" % self.__class__.__name__)
+        return self.element._new(self._flat()[item*s:item*s+s])
+
+    def chunks(self, chunk_size):
+        """
+        Yields contiguous slices of up to chunk_size elements, which are views into this array.
+        Processing a large, e.g. memory-mapped, array chunk by chunk keeps the temporary memory bounded
+        :param chunk_size: int > 0, the maximum number of elements per chunk
+        :return: generator of arrays
+        """
+        if not chunk_size > 0:
+            raise ValueError("Expected chunk_size > 0, got %s" % chunk_size)
+        for i in range(0, len(self), chunk_size):
+            yield self[i:i + chunk_size]
+
+    def __setitem__(self, key, value):
+        s = self._size
+        if isinstance(key, slice):
+            target = self[key]
+            if type(value) is self.__class__:
+                if not len(value) == len(target):
+                    raise ValueError("Can not assign %d elements to slice of length %d" % (
+                                        len(value), len(target)))
+                target._flat()[:] = array("d", value._flat())
+            else:
+                target._flat()[:] = array("d", self.__class__(value)._flat())
+            return
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("%s index out of range" % self.__class__.__name__)
+        if not type(value) is self.element:
+            tools.check_float_sequence(value, s)
+        self._flat()[key*s:key*s+s] = array("d", [float(x) for x in value])
+
+    def __eq__(self, other):
+        if isinstance(other, array_base):
+            return other._size == self._size and self._flat() == other._flat()
+        try:
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return False
+
+    # --- buffer protocol ---
+
+    def __buffer__(self, flags):
+        """Python 3.12+ buffer protocol, e.g. memoryview(a) or numpy.asarray(a) without copying"""
+        return self._flat()
+
+    def as_buffer(self, format="d"):
+        """
+        Returns the flat buffer of all components (x0,y0,z0, x1,y1,z1, ...).
+        For float64 the memoryview shares the memory with this array,
+        for float32 the values are copied once
+        :param format: "d" for float64 or "f" for float32
+        :return: memoryview
+        """
+        if format == "d":
+            return self._flat()
+        if format == "f":
+            if _is_ndarray(self.data):
+                return memoryview(self.data.astype(numpy.float32)).cast("B").cast("f")
+            return memoryview(array("f", self.data))
+        raise ValueError("Expected format 'd' or 'f', got '%s'" % format)
+
+    # --- serialization ---
+
+    def to_bytes(self):
+        """
+        Returns all components as packed little-endian float64 (x0,y0,z0, x1,y1,z1, ...)
+        :return: bytes
+        """
+        if _is_ndarray(self.data):
+            return self.data.astype("<f8", copy=False).tobytes()
+        if sys.byteorder == "big":
+            v = array("d", self.data)
+            v.byteswap()
+            return v.tobytes()
+        return bytes(self._flat())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates an array from packed little-endian float64, e.g. the result of to_bytes()
+        :param data: bytes-like object, length must be a multiple of 8 * element size
+        :return: new array
+        """
+        values = array("d")
+        if not len(data) % (8 * cls._size) == 0:
+            raise ValueError("Byte length %d is not a multiple of %d" % (len(data), 8 * cls._size))
+        values.frombytes(data)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return cls._new(cls._wrap(values))
+
+    def __reduce__(self):
+        """Pickles the packed components, independent of the storage backend"""
+        return self.from_bytes, (self.to_bytes(),)
+
+    # --- storage helper ---
+
+    def _flat(self):
+        """Returns the storage as flat memoryview of float64"""
+        if _is_ndarray(self.data):
+            if not self.data.size:
+                # memoryview can not cast a shape with zeros
+                return memoryview(array("d"))
+            return memoryview(self.data).cast("B").cast("d")
+        if type(self.data) is memoryview:
+            return self.data
+        return memoryview(self.data)
+
+    def _components(self):
+        """Returns a list with a copy of each component as array('d')"""
+        flat = self._flat()
+        s = self._size
+        return [array("d", flat[k::s]) for k in range(s)]
+
+    def _set_components(self, comps):
+        """Writes per-component sequences back into the storage"""
+        flat = self._flat()
+        s = self._size
+        for k, c in enumerate(comps):
+            flat[k::s] = c if type(c) is array else array("d", c)
+
+    @classmethod
+    def _from_components(cls, comps, count):
+        data = array("d", bytes(8 * count * cls._size))
+        r = cls._new(data)
+        r._set_components(comps)
+        return r
+
+    def _check_length(self, other):
+        if not len(other) == len(self):
+            raise TypeError("Expected %s of length %d, got length %d" % (
+                                self.__class__.__name__, len(self), len(other)))
+
+    def _numpy_operand(self, arg):
+        """Returns arg in a form that numpy broadcasts to the shape of self.data"""
+        t = type(arg)
+        if t is float or t is int:
+            return arg
+        if t is self.__class__:
+            self._check_length(arg)
+            return arg.data
+        if _is_ndarray(arg):
+            return arg
+        if tools.is_number(arg):
+            return float(arg)
+        tools.check_float_sequence(arg, self._size)
+        return numpy.array([float(x) for x in arg])
+
+    def _flat_operand(self, arg):
+        """Returns arg as an iterable matching the flat array('d') storage"""
+        t = type(arg)
+        if t is float or t is int:
+            return repeat(arg)
+        if t is self.__class__:
+            self._check_length(arg)
+            return arg._flat()
+        if tools.is_number(arg):
+            return repeat(float(arg))
+        tools.check_float_sequence(arg, self._size)
+        return cycle([float(x) for x in arg])
+
+    def _operand_components(self, arg):
+        """Returns arg as list of per-component iterables, for the array('d') storage"""
+        if type(arg) is self.__class__:
+            self._check_length(arg)
+            return arg._components()
+        tools.check_float_sequence(arg, self._size)
+        return [repeat(float(x)) for x in arg]
+
+    # ------- arithmetic ops --------
+
+    def __add__(self, arg):
+        return self._binary_operator(arg, operator.add)
+
+    def __radd__(self, arg):
+        return self._binary_operator_reverse(arg, operator.add)
+
+    def __iadd__(self, arg):
+        return self._binary_operator_inplace(arg, operator.add)
+
+    def __sub__(self, arg):
+        return self._binary_operator(arg, operator.sub)
+
+    def __rsub__(self, arg):
+        return self._binary_operator_reverse(arg, operator.sub)
+
+    def __isub__(self, arg):
+        return self._binary_operator_inplace(arg, operator.sub)
+
+    def __mul__(self, arg):
+        return self._binary_operator(arg, operator.mul)
+
+    def __rmul__(self, arg):
+        return self._binary_operator_reverse(arg, operator.mul)
+
+    def __imul__(self, arg):
+        return self._binary_operator_inplace(arg, operator.mul)
+
+    def __truediv__(self, arg):
+        return self._binary_operator(arg, operator.truediv)
+
+    def __rtruediv__(self, arg):
+        return self._binary_operator_reverse(arg, operator.truediv)
+
+    def __itruediv__(self, arg):
+        return self._binary_operator_inplace(arg, operator.truediv)
+
+    def __mod__(self, arg):
+        return self._binary_operator(arg, operator.mod)
+
+    def __rmod__(self, arg):
+        return self._binary_operator_reverse(arg, operator.mod)
+
+    def __imod__(self, arg):
+        return self._binary_operator_inplace(arg, operator.mod)
+
+    def __neg__(self):
+        if _is_ndarray(self.data):
+            return self._new(-self.data)
+        return self._new(array("d", map(operator.neg, self.data)))
+
+    def __abs__(self):
+        if _is_ndarray(self.data):
+            return self._new(abs(self.data))
+        return self._new(array("d", map(abs, self.data)))
+
+    # --- op helper ---
+
+    def _binary_operator(self, arg, op):
+        if _is_ndarray(self.data):
+            return self._new(op(self.data, self._numpy_operand(arg)))
+        return self._new(array("d", map(op, self.data, self._flat_operand(arg))))
+
+    def _binary_operator_reverse(self, arg, op):
+        if _is_ndarray(self.data):
+            return self._new(op(self._numpy_operand(arg), self.data))
+        return self._new(array("d", map(op, self._flat_operand(arg), self.data)))
+
+    def _binary_operator_inplace(self, arg, op):
+        if _is_ndarray(self.data):
+            self.data[...] = op(self.data, self._numpy_operand(arg))
+        else:
+            self.data[:] = array("d", map(op, self.data, self._flat_operand(arg)))
+        return self
+
+    # --- public API ---
+
+    def copy(self):
+        """
+        Returns a new array with a copy of the data
+        """
+        if _is_ndarray(self.data):
+            return self._new(self.data.copy())
+        return self._new(array("d", self.data))
+
+    def tolist(self):
+        """
+        Returns the array as list of lists
+        """
+        if _is_ndarray(self.data):
+            return self.data.tolist()
+        s = self._size
+        return [self.data[i:i+s].tolist() for i in range(0, len(self.data), s)]
+
+    # ----- getter -----
+
+    def dot(self, arg):
+        """
+        Returns the dot product of each element and arg
+        :param arg: float sequence of element size or array of same type and length
+        :return: float array of length len(self)
+        """
+        if _is_ndarray(self.data):
+            return (self.data * self._numpy_operand(arg)).sum(axis=1)
+        acc = None
+        for a, b in zip(self._components(), self._operand_components(arg)):
+            p = map(operator.mul, a, b)
+            acc = p if acc is None else map(operator.add, acc, p)
+        return array("d", acc)
+
+    def length_squared(self):
+        """
+        Returns the square of the cartesian length of each element
+        :return: float array of length len(self)
+        """
+        return self.dot(self)
+
+    def length(self):
+        """
+        Returns the cartesian length of each element
+        :return: float array of length len(self)
+        """
+        if _is_ndarray(self.data):
+            return numpy.sqrt(self.dot(self))
+        return array("d", map(math.sqrt, self.dot(self)))
+
+    def distance(self, arg):
+        """
+        Returns the cartesian distance between each element and arg
+        :param arg: float sequence of element size or array of same type and length
+        :return: float array of length len(self)
+        """
+        return (self - arg).length()
+
+    # ------ inplace methods -------
+
+    def normalize(self):
+        """
+        Normalizes each element, e.g. makes it length 1, INPLACE
+        :return: self
+        """
+        l = self.length()
+        if _is_ndarray(self.data):
+            self.data /= l[:, None]
+        else:
+            self._set_components([map(operator.truediv, c, l) for c in self._components()])
+        return self
+
+    def normalize_safe(self):
+        """
+        Normalizes each element, e.g. makes it length 1, INPLACE
+        Elements of length zero are left unchanged
+        :return: self
+        """
+        l = self.length()
+        if _is_ndarray(self.data):
+            l[l == 0.] = 1.
+            self.data /= l[:, None]
+        else:
+            l = array("d", [x if x else 1. for x in l])
+            self._set_components([map(operator.truediv, c, l) for c in self._components()])
+        return self
+
+    def round(self, digits=0):
+        """
+        Rounds each component to the given number of digits, INPLACE
+        :param digits: number of digits after the decimal point
+        :return: self
+        """
+        if _is_ndarray(self.data):
+            numpy.round(self.data, digits, out=self.data)
+        else:
+            self.data[:] = array("d", [round(x, digits) for x in self.data])
+        return self
+
+    # --- value-copying methods ---
+
+    def normalized(self):
+        """
+        Returns an array with each element normalized
+        :return: new array
+        """
+        return self.copy().normalize()
+
+    def normalized_safe(self):
+        """
+        Returns an array with each element normalized,
+        elements of length zero are left unchanged
+        :return: new array
+        """
+        return self.copy().normalize_safe()
+
+    def rounded(self, digits=0):
+        """
+        Returns an array with each component rounded to the given number of digits
+        :param digits: number of digits after the decimal point
+        :return: new array
+        """
+        return self.copy().round(digits)
@@ -0,0 +1,192 @@
+"""
+Bulk binary files of pector vectors, quaternions and matrices
+
+The file starts with a 32 byte header, all little-endian:
+    4 bytes   magic b"PCTR"
+    uint16    format version, currently 1
+    uint16    number of floats per element
+    16 bytes  element type name, ASCII, zero-padded, e.g. b"vec3"
+    uint64    number of elements
+followed by the packed float64 components of all elements (x0,y0,z0, x1,y1,z1, ...)
+
+The files can also be memory-mapped with open_file() and create_file(), the data is
+then paged in and out by the operating system instead of being loaded into memory.
+"""
+import importlib
+import mmap
+import os
+import struct
+import sys
+from .array_base import array_base, _is_ndarray, numpy
+from .vec2_array import vec2_array
+from .vec3_array import vec3_array
+from .vec4_array import vec4_array
+from .quat_array import quat_array
+from .mat4_array import mat4_array
+
+MAGIC = b"PCTR"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHH16sQ")
+
+# the module, pector.array_base is shadowed by the class
+_array_base_module = importlib.import_module(".array_base", __package__)
+
+# the array class by element type name
+_ARRAY_CLASSES = {cls.element.__name__: cls
+                  for cls in (vec2_array, vec3_array, vec4_array, quat_array, mat4_array)}
+
+
+def write_file(file, data):
+    """
+    Writes the elements to a binary file
+    :param file: filename or binary file object opened for writing
+    :param data: a pector array, or a sequence of vec2, vec3, vec4, quat or mat4 of one type
+    :return: the number of elements written
+    """
+    if not isinstance(data, array_base):
+        if not len(data):
+            raise ValueError("Can not determine the element type of an empty sequence")
+        cls = _ARRAY_CLASSES.get(type(data[0]).__name__)
+        if cls is None or not cls.element is type(data[0]):
+            raise TypeError("Expected pector array or sequence of %s, got %s" % (
+                                ", ".join(sorted(_ARRAY_CLASSES)), type(data[0]).__name__))
+        data = cls(data)
+    elif type(data) not in _ARRAY_CLASSES.values():
+        raise TypeError("Unsupported array type %s" % type(data).__name__)
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, "wb") as f:
+            return write_file(f, data)
+    file.write(_HEADER.pack(MAGIC, VERSION, data._size, data.element.__name__.encode("ascii"), len(data)))
+    file.write(data.to_bytes())
+    return len(data)
+
+
+def read_header(file):
+    """
+    Reads the header of a binary file, the file object is left at the start of the data
+    :param file: binary file object opened for reading
+    :return: tuple of (array class, number of elements)
+    """
+    header = file.read(_HEADER.size)
+    if not len(header) == _HEADER.size:
+        raise ValueError("File is too short for a pector header")
+    magic, version, size, name, count = _HEADER.unpack(header)
+    if not magic == MAGIC:
+        raise ValueError("Not a pector file, magic is %r" % magic)
+    if not version == VERSION:
+        raise ValueError("Unsupported pector file version %d" % version)
+    name = name.rstrip(b"\0").decode("ascii")
+    cls = _ARRAY_CLASSES.get(name)
+    if cls is None or not cls._size == size:
+        raise ValueError("Unsupported element type '%s' of size %d" % (name, size))
+    return cls, count
+
+
+def read_file(file):
+    """
+    Reads all elements of a binary file
+    :param file: filename or binary file object opened for reading
+    :return: pector array of the stored element type
+    """
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, "rb") as f:
+            return read_file(f)
+    cls, count = read_header(file)
+    return _read_elements(file, cls, count)
+
+
+def iter_file(file, chunk_size=65536):
+    """
+    Reads a binary file in chunks, only one chunk is in memory at a time
+    :param file: filename or binary file object opened for reading
+    :param chunk_size: the maximum number of elements per chunk
+    :return: generator of pector arrays of the stored element type
+    """
+    if not chunk_size > 0:
+        raise ValueError("Expected chunk_size > 0, got %s" % chunk_size)
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, "rb") as f:
+            yield from iter_file(f, chunk_size)
+        return
+    cls, count = read_header(file)
+    while count > 0:
+        n = min(count, chunk_size)
+        yield _read_elements(file, cls, n)
+        count -= n
+
+
+def _read_elements(file, cls, count):
+    """Reads count elements of cls from the file, raises ValueError if the file ends before"""
+    data = file.read(8 * cls._size * count)
+    if not len(data) == 8 * cls._size * count:
+        raise ValueError("File ends after %d of %d elements" % (len(data) // (8 * cls._size), count))
+    return cls.from_bytes(data)
+
+
+# --- memory-mapping ---
+
+def open_file(filename, mode="r"):
+    """
+    Memory-maps the data of a binary file without reading it.
+    The returned array uses the mapping as storage, a numpy.memmap if numpy is installed.
+    Slices are views into the mapping, use array.chunks() to process a large file in bounded memory
+    :param filename: the name of a file written by write_file() or create_file()
+    :param mode: "r" for read-only or "r+" for read-write, writes go to the file
+    :return: pector array of the stored element type
+    """
+    if mode not in ("r", "r+"):
+        raise ValueError("Expected mode 'r' or 'r+', got '%s'" % mode)
+    if sys.byteorder == "big":
+        raise ValueError("Memory-mapping the little-endian files requires a little-endian system")
+    with open(filename, "rb") as f:
+        cls, count = read_header(f)
+        f.seek(0, os.SEEK_END)
+        if f.tell() < _HEADER.size + 8 * cls._size * count:
+            raise ValueError("File ends before the %d elements" % count)
+    if not count:
+        return cls(0)
+    if _array_base_module.numpy is not None:
+        return cls._new(numpy.memmap(filename, dtype=numpy.float64, mode=mode,
+                                     offset=_HEADER.size, shape=(count, cls._size)))
+    with open(filename, "r+b" if mode == "r+" else "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if mode == "r+" else mmap.ACCESS_READ)
+    data = memoryview(m)[_HEADER.size:_HEADER.size + 8 * cls._size * count].cast("d")
+    return cls._new(data)
+
+
+def create_file(filename, array_class, count):
+    """
+    Creates a binary file for count elements and memory-maps it read-write,
+    e.g. as output for transforming a large file in chunks.
+    The elements are initialized to zero
+    :param filename: the name of the file, it is overwritten
+    :param array_class: the pector array class, e.g. vec3_array
+    :param count: the number of elements
+    :return: pector array of array_class
+    """
+    if array_class not in _ARRAY_CLASSES.values():
+        raise TypeError("Unsupported array type %s" % getattr(array_class, "__name__", array_class))
+    with open(filename, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, array_class._size,
+                             array_class.element.__name__.encode("ascii"), count))
+        f.truncate(_HEADER.size + 8 * array_class._size * count)
+    return open_file(filename, "r+")
+
+
+def flush(data):
+    """
+    Writes the changes to a memory-mapped array to the file.
+    The changes are written when the mapping is closed anyways, this is for writing them earlier
+    :param data: a pector array returned by open_file() or create_file(), or a slice of it
+    """
+    if _is_ndarray(data.data):
+        if not isinstance(data.data, numpy.memmap):
+            raise TypeError("Expected memory-mapped array")
+        data.data.flush()
+        return
+    obj = data.data.obj if type(data.data) is memoryview else None
+    if not isinstance(obj, mmap.mmap):
+        raise TypeError("Expected memory-mapped array")
+    obj.flush()
+
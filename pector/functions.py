@@ -1,20 +1,523 @@
+import math
+import operator
+from array import array
+from itertools import repeat
 from . import tools
+from .vec_base import vec_base
+from .mat_base import mat_base, GENERAL
+from .array_base import array_base, _is_ndarray, numpy
+from .vec2 import vec2
+from .vec3 import vec3
+from .vec4 import vec4
+from .quat import quat
+from .vec2_array import vec2_array
+from .vec3_array import vec3_array
+
+# The functions with an out parameter write the result into the given
+# vector or matrix instead of creating a new object, e.g. for per-frame loops
+
+# The GLSL-style functions accept numbers, pector vectors, float sequences
+# and pector arrays. The type of the arguments is looked at once per call,
+# arrays are processed as a whole by numpy or by one map() over the storage.
 
 
 def dot(v1, v2):
     """
-    Dot product of self and other vec3
-    :param arg: float sequence of length 3
-    :return: float
-
+    Dot product of two vectors, or of each element of a pector array and the other argument
+    :param v1: number, float sequence, pector vector or array
+    :param v2: number, float sequence, pector vector or array
+    :return: float, or one float per element for arrays
     >>> dot((1,2,3), (4,5,6)) # (1*4)+(2*5)+(3*6)
     32.0
+    >>> dot(vec3_array([(1,0,0), (0,1,0)]), (1,2,3)).tolist()
+    [1.0, 2.0]
     """
+    if isinstance(v1, array_base):
+        return v1.dot(v2)
+    if isinstance(v2, array_base):
+        return v2.dot(v1)
+    t1, t2 = type(v1), type(v2)
+    if (t1 is float or t1 is int) and (t2 is float or t2 is int):
+        return float(v1) * v2
+    if t1 is t2 and isinstance(v1, vec_base):
+        return sum(map(operator.mul, v1.v, v2.v))
+    _check_not_mixed("dot", v1, v2)
     tools.check_float_sequence(v1)
     tools.check_float_sequence(v2, len(v1))
     return sum([x * float(v2[i]) for i, x in enumerate(v1)])
 
 
+def cross(v1, v2, out=None):
+    """
+    Cross product of two 3d vectors, or of each element of a vec3_array and the other argument
+    :param v1: float sequence of length 3 or vec3_array
+    :param v2: float sequence of length 3 or vec3_array
+    :param out: optional vec3, or vec3_array for arrays, that receives the result
+    :return: vec3, vec3_array or out
+    >>> cross([1,2,3], [3,4,5])
+    vec3(-2, 4, -2)
+    >>> cross(vec3_array([(1,0,0), (0,1,0)]), (0,0,1))
+    vec3_array([vec3(0, -1, 0), vec3(1, 0, 0)])
+    """
+    if isinstance(v1, array_base):
+        return _array_into(v1.crossed(v2), out)
+    if isinstance(v2, array_base):
+        r = v2.crossed(v1)
+        r *= -1.
+        return _array_into(r, out)
+    x, y, z = _operand(v1, 3)
+    ox, oy, oz = _operand(v2, 3)
+    return vec3._new_into((y * oz - z * oy, z * ox - x * oz, x * oy - y * ox), out)
+
+
+def length(v):
+    """
+    Cartesian length of a vector, the absolute of a number,
+    or the length of each element of a pector array
+    :param v: number, float sequence, pector vector or array
+    :return: float, or one float per element for arrays
+    >>> length([1,1,1])
+    1.7320508075688772
+    >>> length(vec3_array([(3,4,0), (0,0,2)])).tolist()
+    [5.0, 2.0]
+    """
+    if isinstance(v, array_base):
+        return v.length()
+    t = type(v)
+    if t is float or t is int or tools.is_number(v):
+        return abs(float(v))
+    if isinstance(v, vec_base):
+        c = v.v
+    else:
+        tools.check_float_sequence(v)
+        c = [float(x) for x in v]
+    return math.sqrt(sum(map(operator.mul, c, c)))
+
+
+def distance(v1, v2):
+    """
+    Cartesian distance between two vectors or numbers,
+    or between each element of a pector array and the other argument
+    :param v1: number, float sequence, pector vector or array
+    :param v2: number, float sequence, pector vector or array
+    :return: float, or one float per element for arrays
+    >>> distance((1,2,3), vec3(1,2,5))
+    2.0
+    """
+    if isinstance(v1, array_base):
+        return v1.distance(v2)
+    if isinstance(v2, array_base):
+        return v2.distance(v1)
+    cls = _vector_class((v1, v2))
+    if cls is None:
+        return abs(float(v1) - float(v2))
+    _check_not_mixed("distance", v1, v2)
+    size = cls.__len__(None)
+    d = list(map(operator.sub, _operand(v1, size), _operand(v2, size)))
+    return math.sqrt(sum(map(operator.mul, d, d)))
+
+
+def normalize(v, out=None):
+    """
+    Returns the vector scaled to length 1, the sign of a number,
+    or each element of a pector array normalized.
+    Raises ZeroDivisionError for length 0
+    :param v: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> normalize((0,3,4))
+    vec3(0, 0.6, 0.8)
+    >>> normalize(-2.)
+    -1.0
+    """
+    if isinstance(v, array_base):
+        return _array_into(v.normalized(), out)
+    cls = _vector_class((v,))
+    if cls is None:
+        v = float(v)
+        return v / abs(v)
+    c = _operand(v, cls.__len__(None))
+    l = math.sqrt(sum([float(x) * x for x in c]))
+    return cls._new_into([x / l for x in c], out)
+
+
+def reflect(i, n, out=None):
+    """
+    Returns the incident vector i reflected on a plane with normal n, e.g. i - 2 * dot(n, i) * n,
+    or each element reflected for pector arrays.
+    n should be normalized
+    :param i: number, float sequence, pector vector or array
+    :param n: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> reflect((2,-1,0), (0,1,0))
+    vec3(2, 1, 0)
+    >>> reflect(vec2_array([(1,-1), (0,-3)]), (0,1))
+    vec2_array([vec2(1, 1), vec2(0, 3)])
+    """
+    if isinstance(i, array_base) or isinstance(n, array_base):
+        arr = i if isinstance(i, array_base) else n
+        d = dot(i, n)
+        if _is_ndarray(arr.data):
+            r = arr._new(arr._numpy_operand(i) - (d * 2.)[:, None] * arr._numpy_operand(n))
+        else:
+            d = array("d", [x * 2. for x in d])
+            r = arr._from_components([map(operator.sub, ci, map(operator.mul, cn, d))
+                                      for ci, cn in zip(arr._operand_components(i), arr._operand_components(n))],
+                                     len(arr))
+        return _array_into(r, out)
+    cls = _vector_class((i, n))
+    if cls is None:
+        i, n = float(i), float(n)
+        return i - 2. * n * n * i
+    _check_not_mixed("reflect", i, n)
+    size = cls.__len__(None)
+    ci, cn = _operand(i, size), _operand(n, size)
+    d = 2. * sum([float(x) * y for x, y in zip(ci, cn)])
+    return cls._new_into([x - d * y for x, y in zip(ci, cn)], out)
+
+
+def mix(x, y, a, out=None):
+    """
+    Linear interpolation x + (y - x) * a, per component
+    :param x: number, float sequence, pector vector or array
+    :param y: number, float sequence, pector vector or array
+    :param a: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> mix(vec3(0), (2,4,8), .5)
+    vec3(1, 2, 4)
+    >>> mix(vec2_array([(0,0), (1,1)]), (2,4), (0,1))
+    vec2_array([vec2(0, 4), vec2(1, 4)])
+    """
+    return _apply(_mix, _mix, (x, y, a), out)
+
+
+def clamp(x, min_val, max_val, out=None):
+    """
+    Limits each component of x to the range [min_val, max_val]
+    :param x: number, float sequence, pector vector or array
+    :param min_val: number, float sequence, pector vector or array
+    :param max_val: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> clamp(vec3(-1, .5, 2), 0, 1)
+    vec3(0, 0.5, 1)
+    >>> clamp(1.5, 0, 1)
+    1.0
+    """
+    return _apply(_clamp, _numpy_clamp, (x, min_val, max_val), out)
+
+
+def smoothstep(edge0, edge1, x, out=None):
+    """
+    Hermite interpolation between 0 and 1 when x is between edge0 and edge1, per component
+    :param edge0: number, float sequence, pector vector or array
+    :param edge1: number, float sequence, pector vector or array
+    :param x: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> smoothstep(0, 2, vec3(-1, .5, 1))
+    vec3(0, 0.15625, 0.5)
+    """
+    return _apply(_smoothstep, _numpy_smoothstep, (edge0, edge1, x), out)
+
+
+def min(x, y, out=None):
+    """
+    The smaller value of each component
+    :param x: number, float sequence, pector vector or array
+    :param y: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> min(vec3(1, 5, 3), (4, 2, 6))
+    vec3(1, 2, 3)
+    """
+    return _apply(_min, _numpy_min, (x, y), out)
+
+
+def max(x, y, out=None):
+    """
+    The larger value of each component
+    :param x: number, float sequence, pector vector or array
+    :param y: number, float sequence, pector vector or array
+    :param out: optional vector, or array for arrays, that receives the result
+    :return: float, new vector, new array or out
+    >>> max(vec3(1, 5, 3), 2)
+    vec3(2, 5, 3)
+    """
+    return _apply(_max, _numpy_max, (x, y), out)
+
+
+# --- arithmetic ---
+
+def add(a, b, out=None):
+    """
+    Returns a + b
+    :param a: pector vector, float sequence or number
+    :param b: pector vector, float sequence or number
+    :param out: optional vector that receives the result
+    :return: new vector or out
+    >>> add(vec3(1,2,3), 1)
+    vec3(2, 3, 4)
+    >>> c = vec3()
+    >>> add(vec3(1,2,3), (4,5,6), out=c) is c
+    True
+    >>> c
+    vec3(5, 7, 9)
+    """
+    if out is None:
+        return a + b
+    return _elementwise(a, b, out, operator.add)
+
+
+def sub(a, b, out=None):
+    """
+    Returns a - b
+    :param a: pector vector, float sequence or number
+    :param b: pector vector, float sequence or number
+    :param out: optional vector that receives the result
+    :return: new vector or out
+    >>> sub(vec3(1,2,3), vec3(1))
+    vec3(0, 1, 2)
+    """
+    if out is None:
+        return a - b
+    return _elementwise(a, b, out, operator.sub)
+
+
+def mul(a, b, out=None):
+    """
+    Returns a * b, which is the matrix or quaternion product for matrices and quaternions
+    :param a: pector vector or matrix, float sequence or number
+    :param b: pector vector or matrix, float sequence or number
+    :param out: optional vector or matrix that receives the result
+    :return: new vector or out
+    >>> mul(vec3(1,2,3), 2)
+    vec3(2, 4, 6)
+    >>> mul(vec3(1,2,3), (2,3,4), out=vec3())
+    vec3(2, 6, 12)
+    """
+    if out is None:
+        return a * b
+    ta, tb = type(a), type(b)
+    if ta is float or ta is int or tb is float or tb is int:
+        return _elementwise(a, b, out, operator.mul)
+    if isinstance(a, mat_base):
+        if tb is vec3:
+            return a._multiply_vec3(b, out)
+        if tb is vec4:
+            return a._multiply_vec4(b, out)
+        if tb is ta and out is not b:
+            return a._copy_into(out)._multiply_inplace(b)
+    elif not isinstance(b, mat_base) and ta is not quat and tb is not quat:
+        return _elementwise(a, b, out, operator.mul)
+    r = a * b
+    return r if out is None else r._copy_into(out)
+
+
+def div(a, b, out=None):
+    """
+    Returns a / b
+    :param a: pector vector, float sequence or number
+    :param b: pector vector, float sequence or number
+    :param out: optional vector that receives the result
+    :return: new vector or out
+    >>> div(vec3(1,2,3), 2)
+    vec3(0.5, 1, 1.5)
+    """
+    if out is None:
+        return a / b
+    return _elementwise(a, b, out, operator.truediv)
+
+
+def mod(a, b, out=None):
+    """
+    Returns a % b
+    :param a: pector vector, float sequence or number
+    :param b: pector vector, float sequence or number
+    :param out: optional vector that receives the result
+    :return: new vector or out
+    >>> mod(vec3(1,2,3), 2)
+    vec3(1, 0, 1)
+    """
+    if out is None:
+        return a % b
+    return _elementwise(a, b, out, operator.mod)
+
+
+def neg(a, out=None):
+    """
+    Returns -a
+    :param a: pector vector
+    :param out: optional vector that receives the result
+    :return: new vector or out
+    >>> neg(vec3(1,2,3))
+    vec3(-1, -2, -3)
+    """
+    if out is None:
+        return -a
+    return _elementwise(0., a, out, operator.sub)
+
+
+# --- helper ---
+
+def _elementwise(a, b, out, op):
+    """Writes op(a[i], b[i]) to each component of out and returns out"""
+    if not isinstance(out, vec_base):
+        raise TypeError("Expected pector vector as output, got %s" % type(out).__name__)
+    v = out.v
+    a = _operand(a, len(v))
+    b = _operand(b, len(v))
+    if type(a) is float:
+        if type(b) is float:
+            r = op(a, b)
+            for i in range(len(v)):
+                v[i] = r
+        else:
+            for i in range(len(v)):
+                v[i] = op(a, b[i])
+    elif type(b) is float:
+        for i in range(len(v)):
+            v[i] = op(a[i], b)
+    else:
+        for i in range(len(v)):
+            v[i] = op(a[i], b[i])
+    if isinstance(out, mat_base):
+        out._kind = GENERAL
+    return out
+
+
+def _operand(arg, size):
+    """Returns the storage of a pector vector, a float for numbers or the checked float sequence"""
+    t = type(arg)
+    if t is float:
+        return arg
+    if t is int:
+        return float(arg)
+    if isinstance(arg, vec_base):
+        if not len(arg.v) == size:
+            raise TypeError("Expected sequence of length %d, got %d" % (size, len(arg.v)))
+        return arg.v
+    if tools.is_number(arg):
+        return float(arg)
+    tools.check_float_sequence(arg, size)
+    return arg
+
+
+# the vector class of plain float sequences by length
+_VECTOR_CLASSES = {2: vec2, 3: vec3, 4: vec4}
+
+
+def _check_not_mixed(name, a, b):
+    """Raises TypeError if one argument is a number and the other one is not"""
+    if not tools.is_number(a) == tools.is_number(b):
+        raise TypeError("%s() expects two numbers or two vectors, got %s and %s" % (
+                            name, type(a).__name__, type(b).__name__))
+
+
+def _vector_class(args):
+    """Returns the class of the first pector vector in args, the vector class of the
+    first float sequence, or None if all args are numbers"""
+    seq = None
+    for a in args:
+        t = type(a)
+        if t is float or t is int:
+            continue
+        if isinstance(a, vec_base):
+            return t
+        if seq is None and not tools.is_number(a):
+            seq = a
+    if seq is None:
+        return None
+    tools.check_float_sequence(seq)
+    cls = _VECTOR_CLASSES.get(len(seq))
+    if cls is None:
+        raise TypeError("Expected sequence of length 2, 3 or 4, got %d" % len(seq))
+    return cls
+
+
+def _apply(func, numpy_func, args, out):
+    """
+    Returns func applied to the components of args, numbers are broadcast.
+    For arrays with numpy storage, numpy_func is called once with the numpy operands instead
+    :return: float, new vector, new array or out
+    """
+    for a in args:
+        if isinstance(a, array_base):
+            if _is_ndarray(a.data):
+                r = numpy_func(*[a._numpy_operand(x) for x in args])
+                r = a._new(numpy.array(numpy.broadcast_to(r, a.data.shape), dtype=numpy.float64))
+            else:
+                r = a._new(array("d", map(func, *[a._flat_operand(x) for x in args])))
+            return _array_into(r, out)
+    cls = _vector_class(args)
+    if cls is None:
+        return func(*[float(x) for x in args])
+    size = cls.__len__(None)
+    ops = []
+    for a in args:
+        t = type(a)
+        if t is float or t is int or tools.is_number(a):
+            ops.append(repeat(float(a)))
+        elif isinstance(a, vec_base):
+            ops.append(_operand(a, size))
+        else:
+            tools.check_float_sequence(a, size)
+            ops.append([float(x) for x in a])
+    return cls._new_into(map(func, *ops), out)
+
+
+def _array_into(r, out):
+    """Returns the array r, or out with the values of r"""
+    if out is None:
+        return r
+    if not type(out) is type(r):
+        raise TypeError("Expected %s as output, got %s" % (type(r).__name__, type(out).__name__))
+    r._check_length(out)
+    out._flat()[:] = r._flat()
+    return out
+
+
+def _mix(x, y, a):
+    return x + (y - x) * a
+
+
+def _clamp(x, lo, hi):
+    # min(max(x, lo), hi) like GLSL, also when lo > hi
+    x = lo if x < lo else x
+    return hi if x > hi else x
+
+
+def _numpy_clamp(x, lo, hi):
+    return numpy.minimum(numpy.maximum(x, lo), hi)
+
+
+def _smoothstep(e0, e1, x):
+    t = (x - e0) / (e1 - e0)
+    t = 0. if t < 0. else 1. if t > 1. else t
+    return t * t * (3. - 2. * t)
+
+
+def _numpy_smoothstep(e0, e1, x):
+    t = numpy.clip((x - e0) / (e1 - e0), 0., 1.)
+    return t * t * (3. - 2. * t)
+
+
+def _min(x, y):
+    return x if x < y else y
+
+
+def _numpy_min(x, y):
+    return numpy.minimum(x, y)
+
+
+def _max(x, y):
+    return x if x > y else y
+
+
+def _numpy_max(x, y):
+    return numpy.maximum(x, y)
 
 
 if __name__ == "__main__":
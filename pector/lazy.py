@@ -0,0 +1,327 @@
+"""
+Lazy evaluation of vector arithmetic
+"""
+import functools
+from array import array
+from . import tools
+from .vec_base import vec_base
+
+# compiled evaluation functions by expression shape and vector size
+_compiled = {}
+
+
+class lazy:
+    """
+    A lazy arithmetic expression of pector vectors, float sequences and numbers.
+    Operators on a lazy expression return a new expression instead of a vector,
+    so only one vector is created when the expression is evaluated.
+    The expression is compiled into one unrolled function per shape and vector size,
+    which is cached, and evaluated by eval() or when the expression is read like a sequence.
+    The operands are referenced, not copied, until evaluation.
+    >>> ro, rd = vec3(1, 2, 3), vec3(0, 0, 1)
+    >>> e = ro + lazy(rd) * 2.
+    >>> e.eval()
+    vec3(1, 2, 5)
+    >>> rd.z = 2
+    >>> list(e)
+    [1.0, 2.0, 7.0]
+    """
+
+    __slots__ = ("op", "args", "key", "leaves", "cls", "size")
+
+    def __init__(self, arg):
+        """
+        :param arg: a pector vector, float sequence, number or lazy expression
+        """
+        if type(arg) is lazy:
+            self.op, self.args, self.key = arg.op, arg.args, arg.key
+            self.leaves, self.cls, self.size = arg.leaves, arg.cls, arg.size
+            return
+        self.op = None
+        self.args = (None,)
+        t = type(arg)
+        if isinstance(arg, vec_base):
+            self.key = "v"
+            self.leaves = (arg.v,)
+            self.cls = t
+            self.size = len(arg.v)
+        elif t is float or t is int or tools.is_number(arg):
+            self.key = "s"
+            self.leaves = (float(arg),)
+            self.cls = None
+            self.size = None
+        else:
+            tools.check_float_sequence(arg)
+            self.key = "v"
+            self.leaves = (tuple(float(x) for x in arg),)
+            self.cls = None
+            self.size = len(self.leaves[0])
+
+    @classmethod
+    def _node(cls, op, a, b=None):
+        """Returns the expression 'a op b', or 'op a' for unary op"""
+        self = object.__new__(cls)
+        self.op = op
+        if b is None:
+            self.args = (a,)
+            self.key = "(%s%s)" % (op, a.key)
+            self.leaves = a.leaves
+            self.cls, self.size = a.cls, a.size
+            return self
+        if a.size is not None and b.size is not None and not a.size == b.size:
+            raise TypeError("Expected sequences of same length, got %d and %d" % (a.size, b.size))
+        self.args = (a, b)
+        self.key = "(%s%s%s)" % (a.key, op, b.key)
+        self.leaves = a.leaves + b.leaves
+        self.cls = a.cls or b.cls
+        self.size = a.size or b.size
+        return self
+
+    def __str__(self):
+        return "lazy(%s)" % self.key
+
+    def __repr__(self):
+        return self.__str__()
+
+    # --- reading evaluates ---
+
+    def __len__(self):
+        return self.size or 1
+
+    def __iter__(self):
+        return iter(self.eval())
+
+    def __getitem__(self, item):
+        return self.eval()[item]
+
+    def __bool__(self):
+        raise TypeError("The truth value of a lazy expression is ambiguous, use eval()")
+
+    def __eq__(self, other):
+        self._check_untraced()
+        return self.eval() == other
+
+    def __ne__(self, other):
+        self._check_untraced()
+        return not self.eval() == other
+
+    def __lt__(self, other):
+        self._check_untraced()
+        return self.eval() < other
+
+    def __le__(self, other):
+        self._check_untraced()
+        return self.eval() <= other
+
+    def __gt__(self, other):
+        self._check_untraced()
+        return self.eval() > other
+
+    def __ge__(self, other):
+        self._check_untraced()
+        return self.eval() >= other
+
+    def _check_untraced(self):
+        """Raises TypeError if the expression contains an argument of a function traced by fuse()"""
+        if self.op is None:
+            if self.args[0] is not None:
+                raise TypeError("fuse() functions must not compare their arguments")
+            return
+        for a in self.args:
+            a._check_untraced()
+
+    # ------- arithmetic ops --------
+
+    def __add__(self, arg):
+        return self._node("+", self, arg if type(arg) is lazy else lazy(arg))
+
+    def __radd__(self, arg):
+        return self._node("+", lazy(arg), self)
+
+    def __sub__(self, arg):
+        return self._node("-", self, arg if type(arg) is lazy else lazy(arg))
+
+    def __rsub__(self, arg):
+        return self._node("-", lazy(arg), self)
+
+    def __mul__(self, arg):
+        return self._node("*", self, arg if type(arg) is lazy else lazy(arg))
+
+    def __rmul__(self, arg):
+        return self._node("*", lazy(arg), self)
+
+    def __truediv__(self, arg):
+        return self._node("/", self, arg if type(arg) is lazy else lazy(arg))
+
+    def __rtruediv__(self, arg):
+        return self._node("/", lazy(arg), self)
+
+    def __mod__(self, arg):
+        return self._node("%", self, arg if type(arg) is lazy else lazy(arg))
+
+    def __rmod__(self, arg):
+        return self._node("%", lazy(arg), self)
+
+    def __neg__(self):
+        return self._node("-", self)
+
+    # --- public API ---
+
+    def eval(self, out=None):
+        """
+        Evaluates the expression in one pass
+        :param out: optional vector of the result type, that receives the result
+        :return: out, or a new vector of the type of the first pector vector operand,
+        a tuple if there is none, or a float for expressions without vectors
+        """
+        key = (self.key, self.size)
+        func = _compiled.get(key)
+        if func is None:
+            func = _compiled[key] = _compile(self, ["l%d" % i for i in range(len(self.leaves))])
+        r = func(*self.leaves)
+        if self.size is None:
+            return r
+        if out is not None:
+            # _new_into also resets the structure of matrices
+            return type(out)._new_into(r, out)
+        if self.cls is None:
+            return r
+        return self.cls._new(array("d", r))
+
+
+def _compile(node, params, unpack=None, result="return (%s,)", namespace=None):
+    """
+    Compiles the expression tree into a function that returns
+    the tuple of components, or a float for scalar expressions
+    :param node: the root lazy expression
+    :param params: the names of the function parameters, one per leaf
+    :param unpack: optional list of the source that unpacks each vector parameter,
+    defaults to the parameter itself
+    :param result: the statement that returns the comma-separated components
+    :param namespace: optional globals of the function
+    :return: function
+    """
+    leaves = []
+
+    def _collect(n):
+        if n.op is None:
+            leaves.append(n)
+        else:
+            for a in n.args:
+                _collect(a)
+    _collect(node)
+
+    # the variable of each leaf, in the order of the leaves. Leaf i is parameter i,
+    # also if an expression contains the same leaf twice, because the function is cached by shape.
+    # Leaf nodes from fuse() carry their parameter index, the other leaves
+    # are constants of the traced function
+    names = []
+    lines = ["def _func(%s):" % ", ".join(params)]
+    unpacked = set()
+    for i, n in enumerate(leaves):
+        if unpack is not None:
+            i = n.args[0]
+        names.append(i)
+        if n.key == "v" and i is not None and i not in unpacked:
+            unpacked.add(i)
+            lines.append("    %s = %s" % (", ".join("%s_%d" % (params[i], c) for c in range(node.size)),
+                                          unpack[i] if unpack else params[i]))
+
+    def _source(n, c, names):
+        if n.op is None:
+            i = next(names)
+            if i is None:
+                return repr(n.leaves[0] if n.key == "s" else n.leaves[0][c])
+            return params[i] if n.key == "s" else "%s_%d" % (params[i], c)
+        if len(n.args) == 1:
+            return "(%s%s)" % (n.op, _source(n.args[0], c, names))
+        a = _source(n.args[0], c, names)
+        return "(%s %s %s)" % (a, n.op, _source(n.args[1], c, names))
+
+    if node.size is None:
+        lines.append("    return %s" % _source(node, 0, iter(names)))
+    else:
+        lines.append("    " + result % ", ".join(_source(node, c, iter(names)) for c in range(node.size)))
+    namespace = dict(namespace or {})
+    exec(compile("\n".join(lines), "<lazy %s>" % node.key, "exec"), namespace)
+    return namespace["_func"]
+
+
+def fuse(func):
+    """
+    Decorator that compiles a function of pector vectors and numbers into one fused expression.
+    The function is traced with lazy arguments once per combination of argument types,
+    it may only use +, -, *, /, % and unary - on its arguments and must not branch on their values.
+    Functions that test or compare their arguments are not fused, they are called as they are.
+    The fused function unpacks all arguments once and creates only the resulting vector.
+    Numbers and float sequences that the function uses from globals or closures are inlined
+    as constants of the first call. A function that uses pector vectors other than its arguments
+    is not fused, because the vectors, and values computed from them, can change between calls
+    >>> @fuse
+    ... def march(ro, rd, t):
+    ...     return ro + rd * t
+    >>> march(vec3(1, 2, 3), vec3(0, 0, 1), 2.)
+    vec3(1, 2, 5)
+    """
+    cache = {}
+
+    @functools.wraps(func)
+    def fused(*args):
+        sig = tuple(map(type, args))
+        f = cache.get(sig)
+        if f is None:
+            f = cache[sig] = _trace(func, args)
+        return f(*args)
+
+    return fused
+
+
+def _trace(func, args):
+    """Returns the fused version of func for the types of args"""
+    placeholders = []
+    params = []
+    unpack = []
+    try:
+        for i, a in enumerate(args):
+            leaf = lazy(a)
+            leaf.args = (i,)
+            placeholders.append(leaf)
+            params.append("a%d" % i)
+            if isinstance(a, vec_base):
+                unpack.append("a%d.v" % i)
+            else:
+                unpack.append("check(a%d, %d)" % (i, leaf.size or 0))
+        node = func(*placeholders)
+    except (TypeError, AttributeError):
+        # arguments or operations that can not be traced
+        return func
+    if not type(node) is lazy or node.size is None or node.cls is None:
+        # nothing to fuse
+        return func
+    if _has_vector_constant(node):
+        return func
+    # the object creation is cls._new(), inlined
+    return _compile(node, params, unpack,
+                    result="r = new(cls)\n    r.v = array(\"d\", (%s,))\n    return r",
+                    namespace={"new": object.__new__, "cls": node.cls, "array": array, "check": _check})
+
+
+def _has_vector_constant(node):
+    """Returns True if the traced expression contains a pector vector that is not an argument"""
+    if node.op is None:
+        return node.args[0] is None and node.cls is not None
+    return any(_has_vector_constant(a) for a in node.args)
+
+
+def _check(arg, size):
+    """Returns the float sequence arg, raises TypeError if it's not of length size"""
+    tools.check_float_sequence(arg, size)
+    return arg
+
+
+if __name__ == "__main__":
+    import doctest
+    import importlib
+    from pector import vec3
+    # the module as imported by pector, vec3 knows that lazy class, not the one of __main__
+    doctest.testmod(importlib.import_module("pector.lazy"), extraglobs={"vec3": vec3})
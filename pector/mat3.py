@@ -1,6 +1,8 @@
 import math
+from array import array
 from . import tools, const
-from .mat_base import mat_base
+from .mat_base import mat_base, _combine, _axis_structure, IDENTITY, ROTATION, AFFINE
+from .vec_base import _store
 
 
 class mat3(mat_base):
@@ -8,12 +10,40 @@ class mat3(mat_base):
     3x3 transformation matrix - column-major order
     """
 
+    __slots__ = ()
+
     def __len__(self):
         return 9
 
     def num_rows(self):
         return 3
 
+    # --- helper ---
+
+    def _multiply_inplace(self, m):
+        """self = self * m, unrolled, skips identities"""
+        ka, kb = self._structure(), m._structure()
+        if kb == IDENTITY:
+            return self
+        if ka == IDENTITY:
+            self.v[:] = m.v
+            self._kind = kb
+            return self
+        a0, a1, a2, a3, a4, a5, a6, a7, a8 = self.v
+        b0, b1, b2, b3, b4, b5, b6, b7, b8 = m.v
+        _store(self.v, (
+            a0 * b0 + a3 * b1 + a6 * b2,
+            a1 * b0 + a4 * b1 + a7 * b2,
+            a2 * b0 + a5 * b1 + a8 * b2,
+            a0 * b3 + a3 * b4 + a6 * b5,
+            a1 * b3 + a4 * b4 + a7 * b5,
+            a2 * b3 + a5 * b4 + a8 * b5,
+            a0 * b6 + a3 * b7 + a6 * b8,
+            a1 * b6 + a4 * b7 + a7 * b8,
+            a2 * b6 + a5 * b7 + a8 * b8))
+        self._kind = _combine(ka, kb)
+        return self
+
     @property
     def xx(self): return self.v[0]
     @property
@@ -94,6 +124,27 @@ class mat3(mat_base):
                         .25 * r,
                         (self.yx - self.xy) * s)
 
+    def transform_vectors(self, vectors, out=None):
+        """
+        Multiplies many vectors with this matrix at once
+        :param vectors: vec3_array or flat float64 buffer (x,y,z, x,y,z, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec3_array or buffer of same length, if None vectors are transformed INPLACE
+        :return: out, or vectors if out is None
+        >>> mat3().set_rotate_z(90).round().transform_vectors(array("d", (1,2,3)))
+        array('d', [-2.0, 1.0, 3.0])
+        """
+        return self._transform_vec3(vectors, out, False)
+
+    def determinant(self):
+        """
+        Returns the determinant of the matrix
+        :return: float
+        >>> mat3(2).determinant()
+        8.0
+        """
+        return self._determinant3(*self.v)
+
     # ---- public API setter -----
 
     def inverse_simple(self):
@@ -101,7 +152,9 @@ class mat3(mat_base):
         Inverts a uniformly-scaled, non-skewed matrix, INPLACE
         :return: self
         """
-        self.v = self.inversed_simple().v
+        kind = self._structure()
+        self.v[:] = self.inversed_simple().v
+        self._kind = kind
         return self
 
     def set_rotate_x(self, degree):
@@ -120,6 +173,7 @@ class mat3(mat_base):
         self.v[5] = sa
         self.v[7] = -sa
         self.v[8] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_y(self, degree):
@@ -138,6 +192,7 @@ class mat3(mat_base):
         self.v[2] = -sa
         self.v[6] = sa
         self.v[8] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_z(self, degree):
@@ -156,6 +211,7 @@ class mat3(mat_base):
         self.v[1] = sa
         self.v[3] = -sa
         self.v[4] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_axis(self, axis, degree):
@@ -167,31 +223,13 @@ class mat3(mat_base):
         >>> mat3().set_rotate_axis((1,0,0), 90).round()
         mat3(1,0,0, 0,0,1, 0,-1,0)
         """
-        tools.check_float_sequence(axis, 3)
-        degree *= const.DEG_TO_TWO_PI
-        si = math.sin(degree)
-        co = math.cos(degree)
-        m = 1. - co
-
+        r = self._rotation_axis(axis, degree)
         self.set_identity()
-        self.v[0] =  co + axis[0] * axis[0] * m
-        self.v[4] =  co + axis[1] * axis[1] * m
-        self.v[8] = co + axis[2] * axis[2] * m
-
-        t1 = axis[0] * axis[1] * m
-        t2 = axis[2] * si
-        self.v[1] = t1 + t2
-        self.v[3] = t1 - t2
-
-        t1 = axis[0] * axis[2] * m
-        t2 = axis[1] * si
-        self.v[2] = t1 - t2
-        self.v[6] = t1 + t2
-
-        t1 = axis[1] * axis[2] * m
-        t2 = axis[0] * si
-        self.v[5] = t1 + t2
-        self.v[7] = t1 - t2
+        v = self.v
+        v[0:3] = array("d", r[0:3])
+        v[3:6] = array("d", r[3:6])
+        v[6:9] = array("d", r[6:9])
+        self._kind = _axis_structure(axis)
         return self
 
 
@@ -203,9 +241,7 @@ class mat3(mat_base):
         >>> mat3().rotate_x(90).round()
         mat3(1,0,0, 0,0,1, 0,-1,0)
         """
-        m = mat3().set_rotate_x(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(1, 2, degree)
 
     def rotate_y(self, degree):
         """
@@ -215,9 +251,7 @@ class mat3(mat_base):
         >>> mat3().rotate_y(90).round()
         mat3(0,0,-1, 0,1,0, 1,0,0)
         """
-        m = mat3().set_rotate_y(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(2, 0, degree)
 
     def rotate_z(self, degree):
         """
@@ -227,9 +261,7 @@ class mat3(mat_base):
         >>> mat3().rotate_z(90).round()
         mat3(0,1,0, -1,0,0, 0,0,1)
         """
-        m = mat3().set_rotate_z(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(0, 1, degree)
 
     def rotate_axis(self, axis, degree):
         """
@@ -240,90 +272,93 @@ class mat3(mat_base):
         >>> mat3().rotate_axis((1,0,0), 90).round()
         mat3(1,0,0, 0,0,1, 0,-1,0)
         """
-        m = mat3().set_rotate_axis(axis, degree)
-        self._multiply_inplace(m)
+        self._multiply_columns(mat_base._rotation_axis(axis, degree))
+        self._kind = _combine(self._structure(), _axis_structure(axis))
         return self
 
     # ------ value-copying methods -------
 
-    def transposed(self):
+    def transposed(self, out=None):
         """
         Returns a mat3 with columns and rows interchanged
-        :return: mat3
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         >>> mat3((1,2,3, 4,5,6, 7,8,9)).transposed()
         mat3(1,4,7, 2,5,8, 3,6,9)
         """
-        return self.copy().transpose()
+        return self._copy_into(out).transpose()
 
-    def inversed_simple(self):
+    def inversed_simple(self, out=None):
         """
-        Returns inverse of a uniformly-scaled, non-skewed matrix.
-        :return: mat3
+        Returns inverse of a rotation matrix, which is the transpose
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         """
-        raise NotImplementedError
-        # TODO:
-        m = mat3()
-        m.v[0] = self.v[0]
-        m.v[1] = self.v[4]
-        m.v[2] = self.v[8]
-        m.v[3] = self.v[3]
+        return self.transposed(out)
 
-        m.v[4] = self.v[1]
-        m.v[5] = self.v[5]
-        m.v[6] = self.v[9]
-        m.v[7] = self.v[7]
-
-        m.v[8] = self.v[2]
-        m.v[9] = self.v[6]
-        m.v[10] = self.v[10]
-        m.v[11] = self.v[11]
-
-        m.v[12] = -(self.v[12] * self.v[0]) - (self.v[13] * self.v[1]) - (self.v[14] * self.v[2])
-        m.v[13] = -(self.v[12] * self.v[4]) - (self.v[13] * self.v[5]) - (self.v[14] * self.v[6])
-        m.v[14] = -(self.v[12] * self.v[8]) - (self.v[13] * self.v[9]) - (self.v[14] * self.v[10])
-        m.v[15] = self.v[15]
-        return m
+    def inversed(self, out=None):
+        """
+        Returns the inverse of the matrix.
+        The identity is copied and a rotation is transposed
+        Raises ValueError if the matrix is not invertible
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
+        >>> mat3().init_scale((2,4,8)).inversed()
+        mat3(0.5,0,0, 0,0.25,0, 0,0,0.125)
+        """
+        kind = self._structure()
+        v = self.v
+        if kind == IDENTITY:
+            return mat3._new_into(v, out, IDENTITY)
+        if kind == ROTATION:
+            return mat3._new_into((v[0], v[3], v[6], v[1], v[4], v[7], v[2], v[5], v[8]),
+                                  out, ROTATION)
+        return mat3._new_into(self._inverse3(*v), out, kind)
 
-    def rotated_x(self, degree):
+    def rotated_x(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat3
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         >>> mat3().rotated_x(90).rounded()
         mat3(1,0,0, 0,0,1, 0,-1,0)
         """
-        return self.copy().rotate_x(degree)
+        return self._copy_into(out).rotate_x(degree)
 
-    def rotated_y(self, degree):
+    def rotated_y(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat3
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         >>> mat3().rotated_y(90).rounded()
         mat3(0,0,-1, 0,1,0, 1,0,0)
         """
-        return self.copy().rotate_y(degree)
+        return self._copy_into(out).rotate_y(degree)
 
-    def rotated_z(self, degree):
+    def rotated_z(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat3
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         >>> mat3().rotated_z(90).rounded()
         mat3(0,1,0, -1,0,0, 0,0,1)
         """
-        return self.copy().rotate_z(degree)
+        return self._copy_into(out).rotate_z(degree)
 
-    def rotated_axis(self, axis, degree):
+    def rotated_axis(self, axis, degree, out=None):
         """
         Returns a rotated matrix
         :param axis: axis of rotation, must be normalized
         :param degree: angle of rotation in degree
-        :return: mat3
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
         >>> mat3().rotated_axis((1,0,0), 90).rounded()
         mat3(1,0,0, 0,0,1, 0,-1,0)
         """
-        return self.copy().rotate_axis(axis, degree)
+        return self._copy_into(out).rotate_axis(axis, degree)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
 import math
+from array import array
 from . import tools, const
-from .mat_base import mat_base
+from .mat_base import mat_base, _combine, _axis_structure, IDENTITY, TRANSLATION, ROTATION, AFFINE, GENERAL
+from .vec_base import _store
+from .array_base import _is_ndarray, numpy
 from .vec3 import vec3
+from .vec3_array import vec3_array
 
 
 class mat4(mat_base):
@@ -9,12 +13,77 @@ class mat4(mat_base):
     4x4 anisotropic matrix - column-major order
     """
 
+    __slots__ = ()
+
     def __len__(self):
         return 16
 
     def num_rows(self):
         return 4
 
+    # --- helper ---
+
+    def _multiply_inplace(self, m):
+        """self = self * m, unrolled, skips identities,
+        adds translations and skips the last row if both matrices are affine"""
+        v = self.v
+        ka = self._kind if type(v) is array else GENERAL
+        kb = m._kind if type(m.v) is array else GENERAL
+        if kb == IDENTITY:
+            return self
+        if ka == IDENTITY:
+            v[:] = m.v
+            self._kind = kb
+            return self
+        if ka == TRANSLATION and kb == TRANSLATION:
+            o = m.v
+            v[12], v[13], v[14] = v[12] + o[12], v[13] + o[13], v[14] + o[14]
+            return self
+        (a0, a1, a2, a3, a4, a5, a6, a7,
+         a8, a9, a10, a11, a12, a13, a14, a15) = v
+        (b0, b1, b2, b3, b4, b5, b6, b7,
+         b8, b9, b10, b11, b12, b13, b14, b15) = m.v
+        if (ka <= AFFINE and kb <= AFFINE) or (a3 == 0. and a7 == 0. and a11 == 0. and a15 == 1.
+                                               and b3 == 0. and b7 == 0. and b11 == 0. and b15 == 1.):
+            self._kind = min(_combine(ka, kb), AFFINE)
+            _store(self.v, (
+                a0 * b0 + a4 * b1 + a8 * b2,
+                a1 * b0 + a5 * b1 + a9 * b2,
+                a2 * b0 + a6 * b1 + a10 * b2,
+                0.,
+                a0 * b4 + a4 * b5 + a8 * b6,
+                a1 * b4 + a5 * b5 + a9 * b6,
+                a2 * b4 + a6 * b5 + a10 * b6,
+                0.,
+                a0 * b8 + a4 * b9 + a8 * b10,
+                a1 * b8 + a5 * b9 + a9 * b10,
+                a2 * b8 + a6 * b9 + a10 * b10,
+                0.,
+                a0 * b12 + a4 * b13 + a8 * b14 + a12,
+                a1 * b12 + a5 * b13 + a9 * b14 + a13,
+                a2 * b12 + a6 * b13 + a10 * b14 + a14,
+                1.))
+            return self
+        _store(self.v, (
+            a0 * b0 + a4 * b1 + a8 * b2 + a12 * b3,
+            a1 * b0 + a5 * b1 + a9 * b2 + a13 * b3,
+            a2 * b0 + a6 * b1 + a10 * b2 + a14 * b3,
+            a3 * b0 + a7 * b1 + a11 * b2 + a15 * b3,
+            a0 * b4 + a4 * b5 + a8 * b6 + a12 * b7,
+            a1 * b4 + a5 * b5 + a9 * b6 + a13 * b7,
+            a2 * b4 + a6 * b5 + a10 * b6 + a14 * b7,
+            a3 * b4 + a7 * b5 + a11 * b6 + a15 * b7,
+            a0 * b8 + a4 * b9 + a8 * b10 + a12 * b11,
+            a1 * b8 + a5 * b9 + a9 * b10 + a13 * b11,
+            a2 * b8 + a6 * b9 + a10 * b10 + a14 * b11,
+            a3 * b8 + a7 * b9 + a11 * b10 + a15 * b11,
+            a0 * b12 + a4 * b13 + a8 * b14 + a12 * b15,
+            a1 * b12 + a5 * b13 + a9 * b14 + a13 * b15,
+            a2 * b12 + a6 * b13 + a10 * b14 + a14 * b15,
+            a3 * b12 + a7 * b13 + a11 * b14 + a15 * b15))
+        self._kind = GENERAL
+        return self
+
     # ----- public API getter ------
 
     def position(self):
@@ -24,7 +93,112 @@ class mat4(mat_base):
         >>> mat4().translated((2,3,4)).position()
         vec3(2, 3, 4)
         """
-        return vec3(self.v[12:15])
+        return vec3.from_xyz(self.v[12], self.v[13], self.v[14])
+
+    def transform_points(self, points, out=None):
+        """
+        Transforms many points at once, including the translation
+        :param points: vec3_array or flat float64 buffer (x,y,z, x,y,z, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec3_array or buffer of same length, if None points are transformed INPLACE
+        :return: out, or points if out is None
+        >>> mat4().translate((1,2,3)).transform_points(array("d", (1,1,1, 2,2,2)))
+        array('d', [2.0, 3.0, 4.0, 3.0, 4.0, 5.0])
+        """
+        return self._transform_vec3(points, out, True)
+
+    def transform_directions(self, directions, out=None):
+        """
+        Transforms many direction vectors at once, ignoring the translation
+        :param directions: vec3_array or flat float64 buffer (x,y,z, x,y,z, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec3_array or buffer of same length, if None directions are transformed INPLACE
+        :return: out, or directions if out is None
+        >>> mat4().translate((1,2,3)).scale(2).transform_directions(array("d", (1,1,1)))
+        array('d', [2.0, 2.0, 2.0])
+        """
+        return self._transform_vec3(directions, out, False)
+
+    def transform_homogeneous(self, vectors, out=None):
+        """
+        Transforms many homogeneous vectors at once, including the w component
+        :param vectors: vec4_array or flat float64 buffer (x,y,z,w, x,y,z,w, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec4_array or buffer of same length, if None vectors are transformed INPLACE
+        :return: out, or vectors if out is None
+        >>> mat4().translate((1,2,3)).transform_homogeneous(array("d", (1,1,1,1, 1,1,1,0)))
+        array('d', [2.0, 3.0, 4.0, 1.0, 1.0, 1.0, 1.0, 0.0])
+        """
+        return self._transform_vec4(vectors, out)
+
+    def project_point(self, point, out=None):
+        """
+        Transforms the point with w = 1 and applies the perspective divide
+        Raises ZeroDivisionError if the resulting w is 0
+        :param point: float sequence of length 3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
+        >>> mat4((1,0,0,0, 0,1,0,0, 0,0,1,1, 0,0,0,0)).project_point((2,4,2))
+        vec3(1, 2, 1)
+        """
+        if type(point) is not vec3:
+            tools.check_float_sequence(point, 3)
+        m = self.v
+        x, y, z = float(point[0]), float(point[1]), float(point[2])
+        w = 1. / (m[3] * x + m[7] * y + m[11] * z + m[15])
+        return vec3._new_into(((m[0] * x + m[4] * y + m[8 ] * z + m[12]) * w,
+                               (m[1] * x + m[5] * y + m[9 ] * z + m[13]) * w,
+                               (m[2] * x + m[6] * y + m[10] * z + m[14]) * w), out)
+
+    def project_points(self, points, out=None):
+        """
+        Transforms many points at once with w = 1 and applies the perspective divide
+        Raises ZeroDivisionError if a resulting w is 0
+        :param points: vec3_array or flat float64 buffer (x,y,z, x,y,z, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec3_array or buffer of same length, if None points are transformed INPLACE
+        :return: out, or points if out is None
+        >>> mat4((1,0,0,0, 0,1,0,0, 0,0,1,1, 0,0,0,0)).project_points(array("d", (2,4,2, 3,3,3)))
+        array('d', [1.0, 2.0, 1.0, 1.0, 1.0, 1.0])
+        """
+        src = points if type(points) is vec3_array else vec3_array.from_buffer(points)
+        dst = src if out is None else out if type(out) is vec3_array else vec3_array.from_buffer(out)
+        if not len(dst) == len(src):
+            raise ValueError("Expected output of length %d, got %d" % (len(src), len(dst)))
+        m = self.v
+        if _is_ndarray(src.data) and _is_ndarray(dst.data):
+            # the rows of the column-major storage are the columns of the matrix
+            cols = numpy.array(m).reshape(4, 4)
+            h = numpy.matmul(src.data, cols[:3])
+            h += cols[3]
+            if not h[:, 3].all():
+                raise ZeroDivisionError("float division by zero")
+            numpy.divide(h[:, :3], h[:, 3:4], out=dst.data)
+        else:
+            x, y, z = src._components()
+            w = [1. / (m[3] * vx + m[7] * vy + m[11] * vz + m[15]) for vx, vy, vz in zip(x, y, z)]
+            dst._set_components([[(m[r] * vx + m[r+4] * vy + m[r+8] * vz + m[r+12]) * vw
+                                  for vx, vy, vz, vw in zip(x, y, z, w)] for r in range(3)])
+        return points if out is None else out
+
+    def determinant(self):
+        """
+        Returns the determinant of the matrix
+        :return: float
+        >>> mat4().init_scale((2,3,4)).translate((1,2,3)).determinant()
+        24.0
+        """
+        v = self.v
+        if self.is_affine():
+            return self._determinant3(v[0], v[1], v[2], v[4], v[5], v[6], v[8], v[9], v[10])
+        (a0, a1, a2, a3, a4, a5, a6, a7,
+         a8, a9, a10, a11, a12, a13, a14, a15) = v
+        return ((a0 * a5 - a4 * a1) * (a10 * a15 - a14 * a11)
+                - (a0 * a6 - a4 * a2) * (a9 * a15 - a13 * a11)
+                + (a0 * a7 - a4 * a3) * (a9 * a14 - a13 * a10)
+                + (a1 * a6 - a5 * a2) * (a8 * a15 - a12 * a11)
+                - (a1 * a7 - a5 * a3) * (a8 * a14 - a12 * a10)
+                + (a2 * a7 - a6 * a3) * (a8 * a13 - a12 * a9))
 
     # ---- public API setter -----
 
@@ -33,7 +207,9 @@ class mat4(mat_base):
         Inverts a uniformly-scaled, non-skewed matrix, INPLACE
         :return: self
         """
-        self.v = self.inversed_simple().v
+        kind = self._structure()
+        self.v[:] = self.inversed_simple().v
+        self._kind = kind
         return self
 
     def set_position(self, arg3):
@@ -48,6 +224,14 @@ class mat4(mat_base):
         self.v[12] = float(arg3[0])
         self.v[13] = float(arg3[1])
         self.v[14] = float(arg3[2])
+        kind = self._structure()
+        if self.v[12] == 0. and self.v[13] == 0. and self.v[14] == 0.:
+            if kind == TRANSLATION:
+                self._kind = IDENTITY
+        elif kind == IDENTITY:
+            self._kind = TRANSLATION
+        elif kind == ROTATION:
+            self._kind = AFFINE
         return self
 
     def set_translate(self, arg3):
@@ -63,6 +247,7 @@ class mat4(mat_base):
         self.v[12] = float(arg3[0])
         self.v[13] = float(arg3[1])
         self.v[14] = float(arg3[2])
+        self._kind = TRANSLATION
         return self
 
     def set_rotate_x(self, degree):
@@ -81,6 +266,7 @@ class mat4(mat_base):
         self.v[6] = sa
         self.v[9] = -sa
         self.v[10] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_y(self, degree):
@@ -99,6 +285,7 @@ class mat4(mat_base):
         self.v[2] = -sa
         self.v[8] = sa
         self.v[10] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_z(self, degree):
@@ -117,6 +304,7 @@ class mat4(mat_base):
         self.v[1] = sa
         self.v[4] = -sa
         self.v[5] = ca
+        self._kind = ROTATION
         return self
 
     def set_rotate_axis(self, axis, degree):
@@ -128,31 +316,13 @@ class mat4(mat_base):
         >>> mat4().set_rotate_axis((1,0,0), 90).round()
         mat4(1,0,0,0, 0,0,1,0, 0,-1,0,0, 0,0,0,1)
         """
-        tools.check_float_sequence(axis, 3)
-        degree *= const.DEG_TO_TWO_PI
-        si = math.sin(degree)
-        co = math.cos(degree)
-        m = 1. - co
-
+        r = self._rotation_axis(axis, degree)
         self.set_identity()
-        self.v[0] =  co + axis[0] * axis[0] * m
-        self.v[5] =  co + axis[1] * axis[1] * m
-        self.v[10] = co + axis[2] * axis[2] * m
-
-        t1 = axis[0] * axis[1] * m
-        t2 = axis[2] * si
-        self.v[1] = t1 + t2
-        self.v[4] = t1 - t2
-
-        t1 = axis[0] * axis[2] * m
-        t2 = axis[1] * si
-        self.v[2] = t1 - t2
-        self.v[8] = t1 + t2
-
-        t1 = axis[1] * axis[2] * m
-        t2 = axis[0] * si
-        self.v[6] = t1 + t2
-        self.v[9] = t1 - t2
+        v = self.v
+        v[0:3] = array("d", r[0:3])
+        v[4:7] = array("d", r[3:6])
+        v[8:11] = array("d", r[6:9])
+        self._kind = _axis_structure(axis)
         return self
 
 
@@ -164,8 +334,20 @@ class mat4(mat_base):
         >>> mat4().translate((1,2,3))
         mat4(1,0,0,0, 0,1,0,0, 0,0,1,0, 1,2,3,1)
         """
-        m = mat4().set_translate(arg3)
-        self._multiply_inplace(m)
+        tools.check_float_sequence(arg3, 3)
+        x, y, z = float(arg3[0]), float(arg3[1]), float(arg3[2])
+        v = self.v
+        kind = self._structure()
+        if kind == IDENTITY or kind == TRANSLATION:
+            v[12], v[13], v[14] = v[12] + x, v[13] + y, v[14] + z
+            self._kind = TRANSLATION
+            return self
+        self._kind = _combine(kind, TRANSLATION)
+        # only the last column changes
+        v[12], v[13], v[14], v[15] = (v[0] * x + v[4] * y + v[8 ] * z + v[12],
+                                      v[1] * x + v[5] * y + v[9 ] * z + v[13],
+                                      v[2] * x + v[6] * y + v[10] * z + v[14],
+                                      v[3] * x + v[7] * y + v[11] * z + v[15])
         return self
 
     def rotate_x(self, degree):
@@ -176,9 +358,7 @@ class mat4(mat_base):
         >>> mat4().rotate_x(90).round()
         mat4(1,0,0,0, 0,0,1,0, 0,-1,0,0, 0,0,0,1)
         """
-        m = mat4().set_rotate_x(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(1, 2, degree)
 
     def rotate_y(self, degree):
         """
@@ -188,9 +368,7 @@ class mat4(mat_base):
         >>> mat4().rotate_y(90).round()
         mat4(0,0,-1,0, 0,1,0,0, 1,0,0,0, 0,0,0,1)
         """
-        m = mat4().set_rotate_y(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(2, 0, degree)
 
     def rotate_z(self, degree):
         """
@@ -200,9 +378,7 @@ class mat4(mat_base):
         >>> mat4().rotate_z(90).round()
         mat4(0,1,0,0, -1,0,0,0, 0,0,1,0, 0,0,0,1)
         """
-        m = mat4().set_rotate_z(degree)
-        self._multiply_inplace(m)
-        return self
+        return self._rotate_columns(0, 1, degree)
 
     def rotate_axis(self, axis, degree):
         """
@@ -213,111 +389,182 @@ class mat4(mat_base):
         >>> mat4().rotate_axis((1,0,0), 90).round()
         mat4(1,0,0,0, 0,0,1,0, 0,-1,0,0, 0,0,0,1)
         """
-        m = mat4().set_rotate_axis(axis, degree)
-        self._multiply_inplace(m)
+        self._multiply_columns(mat_base._rotation_axis(axis, degree))
+        self._kind = _combine(self._structure(), _axis_structure(axis))
         return self
 
     def reflect(self, normal):
-        self.v[0:3] = vec3(self.v[0:3]).reflect(normal)
-        self.v[4:7] = vec3(self.v[4:7]).reflect(normal)
-        self.v[8:11] = vec3(self.v[8:11]).reflect(normal)
+        self._kind = _combine(self._structure(), AFFINE)
+        self.v[0:3] = vec3(self.v[0:3]).reflect(normal).v
+        self.v[4:7] = vec3(self.v[4:7]).reflect(normal).v
+        self.v[8:11] = vec3(self.v[8:11]).reflect(normal).v
         return self
 
     # ------ value-copying methods -------
 
-    def transposed(self):
+    def transposed(self, out=None):
         """
         Returns a mat4 with columns and rows interchanged
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4((1,2,3,4, 5,6,7,8, 9,10,11,12, 13,14,15,16)).transposed()
         mat4(1,5,9,13, 2,6,10,14, 3,7,11,15, 4,8,12,16)
         """
-        return self.copy().transpose()
+        return self._copy_into(out).transpose()
 
-    def inversed_simple(self):
+    def inversed_simple(self, out=None):
         """
         Returns inverse of a uniformly-scaled, non-skewed matrix.
-        :return: mat4
-        """
-        m = mat4()
-        m.v[0] = self.v[0]
-        m.v[1] = self.v[4]
-        m.v[2] = self.v[8]
-        m.v[3] = self.v[3]
-
-        m.v[4] = self.v[1]
-        m.v[5] = self.v[5]
-        m.v[6] = self.v[9]
-        m.v[7] = self.v[7]
-
-        m.v[8] = self.v[2]
-        m.v[9] = self.v[6]
-        m.v[10] = self.v[10]
-        m.v[11] = self.v[11]
-
-        m.v[12] = -(self.v[12] * self.v[0]) - (self.v[13] * self.v[1]) - (self.v[14] * self.v[2])
-        m.v[13] = -(self.v[12] * self.v[4]) - (self.v[13] * self.v[5]) - (self.v[14] * self.v[6])
-        m.v[14] = -(self.v[12] * self.v[8]) - (self.v[13] * self.v[9]) - (self.v[14] * self.v[10])
-        m.v[15] = self.v[15]
-        return m
-
-    def position_cleared(self):
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
+        """
+        v = self.v
+        return mat4._new_into((
+            v[0], v[4], v[8], v[3],
+            v[1], v[5], v[9], v[7],
+            v[2], v[6], v[10], v[11],
+            -(v[12] * v[0]) - (v[13] * v[1]) - (v[14] * v[2]),
+            -(v[12] * v[4]) - (v[13] * v[5]) - (v[14] * v[6]),
+            -(v[12] * v[8]) - (v[13] * v[9]) - (v[14] * v[10]),
+            v[15]), out, self._structure())
+
+    def inversed(self, out=None):
+        """
+        Returns the inverse of the matrix.
+        The identity is copied, a translation is inverted by negation, a rotation by transposing,
+        an affine matrix by inverting the 3x3 part and the translation,
+        anything else by the general 4x4 inverse
+        Raises ValueError if the matrix is not invertible
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
+        >>> mat4().translate((1,2,3)).scale((2,4,8)).inversed()
+        mat4(0.5,0,0,0, 0,0.25,0,0, 0,0,0.125,0, -0.5,-0.5,-0.375,1)
+        """
+        v = self.v
+        kind = self._kind if type(v) is array else GENERAL
+        if kind == IDENTITY:
+            return mat4._new_into(v, out, IDENTITY)
+        if kind == ROTATION:
+            return mat4._new_into((v[0], v[4], v[8], 0., v[1], v[5], v[9], 0.,
+                                   v[2], v[6], v[10], 0., 0., 0., 0., 1.), out, ROTATION)
+        if kind > AFFINE and not self.is_affine():
+            return mat4._new_into(self._inverse4(*v), out)
+        tx, ty, tz = v[12], v[13], v[14]
+        if kind == TRANSLATION or (v[0] == 1. and v[5] == 1. and v[10] == 1.
+                and v[1] == 0. and v[2] == 0. and v[4] == 0. and v[6] == 0. and v[8] == 0. and v[9] == 0.):
+            return mat4._new_into((1., 0., 0., 0., 0., 1., 0., 0., 0., 0., 1., 0., -tx, -ty, -tz, 1.),
+                                  out, TRANSLATION)
+        i0, i1, i2, i3, i4, i5, i6, i7, i8 = self._inverse3(
+            v[0], v[1], v[2], v[4], v[5], v[6], v[8], v[9], v[10])
+        return mat4._new_into((
+            i0, i1, i2, 0.,
+            i3, i4, i5, 0.,
+            i6, i7, i8, 0.,
+            -(i0 * tx + i3 * ty + i6 * tz),
+            -(i1 * tx + i4 * ty + i7 * tz),
+            -(i2 * tx + i5 * ty + i8 * tz),
+            1.), out, AFFINE)
+
+    @staticmethod
+    def _inverse4(a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12, a13, a14, a15):
+        """Returns the inverse of the 4x4 matrix as tuple in the same order,
+        via the 2x2 sub-determinants. Raises ValueError if the matrix is not invertible"""
+        s0 = a0 * a5 - a4 * a1
+        s1 = a0 * a6 - a4 * a2
+        s2 = a0 * a7 - a4 * a3
+        s3 = a1 * a6 - a5 * a2
+        s4 = a1 * a7 - a5 * a3
+        s5 = a2 * a7 - a6 * a3
+        c5 = a10 * a15 - a14 * a11
+        c4 = a9 * a15 - a13 * a11
+        c3 = a9 * a14 - a13 * a10
+        c2 = a8 * a15 - a12 * a11
+        c1 = a8 * a14 - a12 * a10
+        c0 = a8 * a13 - a12 * a9
+        det = s0 * c5 - s1 * c4 + s2 * c3 + s3 * c2 - s4 * c1 + s5 * c0
+        if det == 0.:
+            raise ValueError("Matrix is not invertible")
+        det = 1. / det
+        return (( a5 * c5 - a6 * c4 + a7 * c3) * det,
+                (-a1 * c5 + a2 * c4 - a3 * c3) * det,
+                ( a13 * s5 - a14 * s4 + a15 * s3) * det,
+                (-a9 * s5 + a10 * s4 - a11 * s3) * det,
+                (-a4 * c5 + a6 * c2 - a7 * c1) * det,
+                ( a0 * c5 - a2 * c2 + a3 * c1) * det,
+                (-a12 * s5 + a14 * s2 - a15 * s1) * det,
+                ( a8 * s5 - a10 * s2 + a11 * s1) * det,
+                ( a4 * c4 - a5 * c2 + a7 * c0) * det,
+                (-a0 * c4 + a1 * c2 - a3 * c0) * det,
+                ( a12 * s4 - a13 * s2 + a15 * s0) * det,
+                (-a8 * s4 + a9 * s2 - a11 * s0) * det,
+                (-a4 * c3 + a5 * c1 - a6 * c0) * det,
+                ( a0 * c3 - a1 * c1 + a2 * c0) * det,
+                (-a12 * s3 + a13 * s1 - a14 * s0) * det,
+                ( a8 * s3 - a9 * s1 + a10 * s0) * det)
+
+    def position_cleared(self, out=None):
         """
         Returns a copy of the matrix with translation set to zero
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         """
-        return self.copy().set_position((0, 0, 0))
+        return self._copy_into(out).set_position((0, 0, 0))
 
-    def translated(self, arg3):
+    def translated(self, arg3, out=None):
         """
         Returns a translated matrix
         :param arg3: float sequence of length 3
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4().translated((1,2,3))
         mat4(1,0,0,0, 0,1,0,0, 0,0,1,0, 1,2,3,1)
         """
-        return self.copy().translate(arg3)
+        return self._copy_into(out).translate(arg3)
 
-    def rotated_x(self, degree):
+    def rotated_x(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4().rotated_x(90).rounded()
         mat4(1,0,0,0, 0,0,1,0, 0,-1,0,0, 0,0,0,1)
         """
-        return self.copy().rotate_x(degree)
+        return self._copy_into(out).rotate_x(degree)
 
-    def rotated_y(self, degree):
+    def rotated_y(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4().rotated_y(90).rounded()
         mat4(0,0,-1,0, 0,1,0,0, 1,0,0,0, 0,0,0,1)
         """
-        return self.copy().rotate_y(degree)
+        return self._copy_into(out).rotate_y(degree)
 
-    def rotated_z(self, degree):
+    def rotated_z(self, degree, out=None):
         """
         Returns a rotated matrix
         :param degree: angle of rotation in degree
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4().rotated_z(90).rounded()
         mat4(0,1,0,0, -1,0,0,0, 0,0,1,0, 0,0,0,1)
         """
-        return self.copy().rotate_z(degree)
+        return self._copy_into(out).rotate_z(degree)
 
-    def rotated_axis(self, axis, degree):
+    def rotated_axis(self, axis, degree, out=None):
         """
         Returns a rotated matrix
         :param axis: axis of rotation, must be normalized
         :param degree: angle of rotation in degree
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
         >>> mat4().rotated_axis((1,0,0), 90).rounded()
         mat4(1,0,0,0, 0,0,1,0, 0,-1,0,0, 0,0,0,1)
         """
-        return self.copy().rotate_axis(axis, degree)
+        return self._copy_into(out).rotate_axis(axis, degree)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+from array import array
+from . import tools
+from .array_base import array_base, _is_ndarray, numpy
+from .mat4 import mat4
+
+
+class mat4_array(array_base):
+    """
+    Contiguous array of mat4, each in column-major order.
+    It behaves like a list of mat4, where the elements are views into the array.
+    Multiplication with a mat4 or mat4_array is the matrix product,
+    multiplication with a number is component-wise
+    >>> mat4_array([mat4().translate((1,2,3)), mat4().init_scale(2)]).inversed()[0].position()
+    vec3(-1, -2, -3)
+    """
+
+    __slots__ = ()
+
+    element = mat4
+
+    # ------- arithmetic ops --------
+
+    def __mul__(self, other):
+        if tools.is_number(other):
+            return super().__mul__(other)
+        return self._new(self._multiply(self, other))
+
+    def __rmul__(self, other):
+        if tools.is_number(other):
+            return super().__rmul__(other)
+        return self._new(self._multiply(other, self))
+
+    def __imul__(self, other):
+        if tools.is_number(other):
+            return super().__imul__(other)
+        r = self._multiply(self, other)
+        if _is_ndarray(self.data):
+            self.data[...] = r
+        else:
+            self.data[:] = r
+        return self
+
+    # --- helper ---
+
+    def _multiply(self, l, r):
+        """Returns the storage of the matrix product l * r,
+        where one of them is self and the other a mat4 or mat4_array"""
+        for m in (l, r):
+            if type(m) is self.__class__:
+                self._check_length(m)
+            elif not type(m) is mat4:
+                raise TypeError("Can not matrix-multiply %s with %s" % (type(self), type(m)))
+        if _is_ndarray(self.data):
+            # reshaping column-major data gives the transposed matrices,
+            # and (l * r)^T = r^T * l^T
+            lt = self._numpy_operand(l).reshape(-1, 4, 4)
+            rt = self._numpy_operand(r).reshape(-1, 4, 4)
+            return numpy.matmul(rt, lt).reshape(-1, 16)
+        ret = array("d")
+        for a, b in zip(l if type(l) is self.__class__ else (l,) * len(self),
+                        r if type(r) is self.__class__ else (r,) * len(self)):
+            ret.extend(mat4._new(array("d", a.v))._multiply_inplace(b).v)
+        return ret
+
+    # ----- getter -----
+
+    def as_buffer(self, format="d", row_major=False):
+        """
+        Returns the flat buffer of all matrices.
+        For float64 in column-major order the memoryview shares the memory with this array,
+        otherwise the values are copied once
+        :param format: "d" for float64 or "f" for float32
+        :param row_major: If true, ordering will be row-major, otherwise native column-major
+        :return: memoryview
+        """
+        if not row_major:
+            return super().as_buffer(format)
+        if not format in ("d", "f"):
+            raise ValueError("Expected format 'd' or 'f', got '%s'" % format)
+        if _is_ndarray(self.data):
+            t = numpy.ascontiguousarray(self.data.reshape(-1, 4, 4).transpose(0, 2, 1), dtype=format)
+            return memoryview(t).cast("B").cast(format)
+        ret = array(format)
+        for m in self:
+            ret.extend(m.as_buffer(format, row_major=True))
+        return memoryview(ret)
+
+    def determinant(self):
+        """
+        Returns the determinant of each matrix
+        :return: float array of length len(self)
+        """
+        if _is_ndarray(self.data):
+            return numpy.linalg.det(self.data.reshape(-1, 4, 4))
+        return array("d", [m.determinant() for m in self])
+
+    # ------ inplace methods -------
+
+    def inverse(self):
+        """
+        Inverts each matrix, INPLACE
+        Raises ValueError if one of the matrices is not invertible
+        :return: self
+        """
+        if _is_ndarray(self.data):
+            # the inverse of the transposed is the transposed inverse
+            try:
+                self.data[...] = numpy.linalg.inv(self.data.reshape(-1, 4, 4)).reshape(-1, 16)
+            except numpy.linalg.LinAlgError:
+                raise ValueError("Matrix is not invertible")
+        else:
+            for m in self:
+                m.inverse()
+        return self
+
+    # --- value-copying methods ---
+
+    def inversed(self):
+        """
+        Returns an array with each matrix inverted
+        Raises ValueError if one of the matrices is not invertible
+        :return: mat4_array
+        """
+        return self.copy().inverse()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
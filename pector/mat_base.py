@@ -1,16 +1,160 @@
-# import math
-from . import tools
-from .vec_base import vec_base
+import math
+from array import array
+from . import tools, const
+from .vec_base import vec_base, _store
 from .vec3 import vec3
+from .vec4 import vec4
+from .array_base import array_base, _is_ndarray, numpy
+from .vec3_array import vec3_array
+from .vec4_array import vec4_array
+
+# The structure flags of a matrix. Each flag guarantees a property of the values,
+# IDENTITY implies all others and TRANSLATION and ROTATION both imply AFFINE.
+# The setters and INPLACE methods update the flag, any other change resets it to GENERAL,
+# and multiply, inverse and the vector transforms choose their kernel by it.
+# Writing to the storage .v directly bypasses the flags, use set() or __setitem__ instead.
+IDENTITY = 0
+# identity 3x3 part and a translation (mat4)
+TRANSLATION = 1
+# orthonormal 3x3 part and no translation
+ROTATION = 2
+# the last row of a mat4 is (0,0,0,1), true for every mat3
+AFFINE = 3
+# nothing known
+GENERAL = 4
+
+_STRUCTURE_NAMES = ("identity", "translation", "rotation", "affine", "general")
+
+
+def _combine(a, b):
+    """Returns the structure flag of the product of matrices with flags a and b"""
+    if a == b or b == IDENTITY:
+        return a
+    if a == IDENTITY:
+        return b
+    return max(a, b, AFFINE)
+
+
+def _axis_structure(axis):
+    """Returns ROTATION for a normalized axis, AFFINE otherwise"""
+    x, y, z = float(axis[0]), float(axis[1]), float(axis[2])
+    return ROTATION if abs(x * x + y * y + z * z - 1.) < 1e-12 else AFFINE
 
 
 class mat_base(vec_base):
     """
     Base class for common matrix operations
     """
+
+    __slots__ = ("_kind",)
+
     def __init__(self, *arg):
+        self.v = array("d", (0.,)) * len(self)
         self.set(*arg)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # the unrolled INPLACE operators do not know about the structure
+        for name in ("__iadd__", "__isub__", "__itruediv__", "__imod__"):
+            if name in cls.__dict__:
+                setattr(cls, name, _resetting(cls.__dict__[name]))
+
+    def __getattr__(self, name):
+        # instances created without __init__, e.g. by _new(), start with no known structure
+        if name == "_kind":
+            return GENERAL
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+    @classmethod
+    def _new(cls, v):
+        """
+        Creates an instance that uses v as storage, bypassing __init__ and set().
+        No checks and no copying, v must be an array('d') of the correct length
+        :return: new instance
+        """
+        self = object.__new__(cls)
+        self.v = v
+        self._kind = GENERAL
+        return self
+
+    @classmethod
+    def _new_into(cls, v, out, kind=GENERAL):
+        """
+        Returns a new instance with the values v, or out with the values v, for the out= parameters.
+        The values are written into out directly, without a temporary array
+        :param v: tuple or other sequence of the values, of the correct length
+        :param kind: the structure flag of the values
+        :return: new instance or out
+        """
+        if out is None:
+            self = object.__new__(cls)
+            self.v = array("d", v)
+        else:
+            if not isinstance(out, cls):
+                raise TypeError("Expected %s as output, got %s" % (cls.__name__, type(out).__name__))
+            _store(out.v, v)
+            self = out
+        self._kind = kind
+        return self
+
+    def _copy_into(self, out):
+        """
+        Returns a copy of self, or out with the values of self, for the out= parameters.
+        :return: new instance or out
+        """
+        if out is None:
+            out = self._new(array("d", self.v))
+        elif out is not self:
+            if not isinstance(out, self.__class__):
+                raise TypeError("Expected %s as output, got %s" % (self.__class__.__name__, type(out).__name__))
+            out.v[:] = self.v
+        out._kind = self._structure()
+        return out
+
+    @classmethod
+    def _from_bytes_kind(cls, data, kind):
+        """Creates an instance from packed values with the structure flag, for unpickling"""
+        self = cls.from_bytes(data)
+        self._kind = kind
+        return self
+
+    def __reduce__(self):
+        """Pickles the packed values and the structure flag, also for views into pector arrays"""
+        return self._from_bytes_kind, (self.to_bytes(), self._structure())
+
+    def _structure(self):
+        """Returns the structure flag. Views into a mat4_array are GENERAL,
+        because the array can change them without the flag noticing"""
+        return self._kind if type(self.v) is array else GENERAL
+
+    @classmethod
+    def from_column_major(cls, seq):
+        """
+        Creates a matrix from a sequence of numbers in column-major order,
+        without the argument parsing of the constructor
+        :param seq: sequence of numbers of length 9 or 16 respectively
+        :return: new matrix
+        >>> mat3.from_column_major(range(9))
+        mat3(0,1,2, 3,4,5, 6,7,8)
+        """
+        v = array("d", seq)
+        if not len(v) == cls.__len__(None):
+            raise ValueError("Expected sequence of length %d for %s, got %d" % (
+                                cls.__len__(None), cls.__name__, len(v)))
+        return cls._new(v)
+
+    @classmethod
+    def from_row_major(cls, seq):
+        """
+        Creates a matrix from a sequence of numbers in row-major order,
+        without the argument parsing of the constructor
+        :param seq: sequence of numbers of length 9 or 16 respectively
+        :return: new matrix
+        >>> mat3.from_row_major(range(9))
+        mat3(0,3,6, 1,4,7, 2,5,8)
+        """
+        return cls.from_column_major(seq).transpose()
+
     def __str__(self):
         r = "%s(" % self.__class__.__name__
         for i, x in enumerate(self.v):
@@ -37,31 +181,79 @@ class mat_base(vec_base):
         ret = []
         if not row_major:
             for c in range(self.num_rows()):
-                ret.append(self.v[c*self.num_rows():(c+1)*self.num_rows()])
+                ret.append(self.v[c*self.num_rows():(c+1)*self.num_rows()].tolist())
         else:
             for c in range(self.num_rows()):
                 ret.append([self.v[c+r*self.num_rows()] for r in range(self.num_rows())])
 
         return ret
 
+    def as_buffer(self, format="d", row_major=False):
+        """
+        Returns the matrix as flat buffer without building intermediate lists.
+        For float64 in column-major order the memoryview shares the memory with this instance,
+        otherwise the values are copied once
+        :param format: "d" for float64 or "f" for float32
+        :param row_major: If true, ordering will be row-major, otherwise native column-major
+        :return: memoryview
+        >>> mat3(1,2,3,4,5,6,7,8,9).as_buffer("f", row_major=True).tolist()
+        [1.0, 4.0, 7.0, 2.0, 5.0, 8.0, 3.0, 6.0, 9.0]
+        """
+        if not row_major:
+            return super(mat_base, self).as_buffer(format)
+        if not format in ("d", "f"):
+            raise ValueError("Expected format 'd' or 'f', got '%s'" % format)
+        n = self.num_rows()
+        v = self.v
+        return memoryview(array(format, [v[c * n + r] for r in range(n) for c in range(n)]))
+
     # ------- arithmetic ops --------
 
+    # pector instances are known float sequences and skip the validation
+
     def __mul__(self, arg):
-        if tools.is_number(arg):
+        t = type(arg)
+        if t is float or t is int:
             return self._binary_operator(arg, lambda l, r: l * r)
-        tools.check_float_sequence(arg)
+        if t is vec3:
+            return self._multiply_vec3(arg)
+        if t is vec4:
+            return self._multiply_vec4(arg)
+        if t is vec3_array:
+            return self._transform_vec3(arg, vec3_array(len(arg)), len(self) == 16)
+        if t is vec4_array:
+            return self._transform_vec4(arg, vec4_array(len(arg)))
+        if isinstance(arg, array_base):
+            return NotImplemented
+        if not isinstance(arg, vec_base):
+            if tools.is_number(arg):
+                return self._binary_operator(arg, lambda l, r: l * r)
+            tools.check_float_sequence(arg)
         return self._multiply(self, arg)
 
     def __rmul__(self, arg):
-        if tools.is_number(arg):
+        t = type(arg)
+        if t is float or t is int:
             return self._binary_operator(arg, lambda r, l: l * r)
-        tools.check_float_sequence(arg)
+        if isinstance(arg, array_base):
+            return NotImplemented
+        if not isinstance(arg, vec_base):
+            if tools.is_number(arg):
+                return self._binary_operator(arg, lambda r, l: l * r)
+            tools.check_float_sequence(arg)
         return self._multiply(arg, self)
 
     def __imul__(self, arg):
-        if tools.is_number(arg):
+        t = type(arg)
+        if t is float or t is int:
+            self._kind = GENERAL
             return self._binary_operator_inplace(arg, lambda l, r: l * r)
-        tools.check_float_sequence(arg, len(self))
+        if t is not self.__class__:
+            if tools.is_number(arg):
+                self._kind = GENERAL
+                return self._binary_operator_inplace(arg, lambda l, r: l * r)
+            tools.check_float_sequence(arg, len(self))
+            arg = self.__class__(arg)
         return self._multiply_inplace(arg)
 
     # --- helper ---
@@ -70,10 +262,12 @@ class mat_base(vec_base):
         """One big multiply implementation for all derived types
         The code should be spread to the derived classes
         but it was convenient to write it all in one place"""
-        from .quat import quat
         # mat * mat
         if len(l) == len(self) == len(r):
-            m = self.__class__(l)
+            if type(l) is type(self):
+                m = l._copy_into(None)
+            else:
+                m = self._new(array("d", l)) if isinstance(l, vec_base) else self.__class__(l)
             m._multiply_inplace(r)
             return m
         elif isinstance(r, quat):
@@ -85,15 +279,22 @@ class mat_base(vec_base):
                 return l * r.as_mat4()
             else:
                 raise TypeError("Can not multiply %s and quat" % (type(l)))
+        # mat4 * vec4
+        elif len(l) == 16 and len(r) == 4:
+            return vec4.from_xyzw(
+                l[0] * r[0] + l[4] * r[1] + l[8 ] * r[2] + l[12] * r[3],
+                l[1] * r[0] + l[5] * r[1] + l[9 ] * r[2] + l[13] * r[3],
+                l[2] * r[0] + l[6] * r[1] + l[10] * r[2] + l[14] * r[3],
+                l[3] * r[0] + l[7] * r[1] + l[11] * r[2] + l[15] * r[3])
         # mat4 * vec3
         elif len(l) == 16 and len(r) == 3:
-            return vec3(
+            return vec3.from_xyz(
                 l[0] * r[0] + l[4] * r[1] + l[8 ] * r[2] + l[12],
                 l[1] * r[0] + l[5] * r[1] + l[9 ] * r[2] + l[13],
                 l[2] * r[0] + l[6] * r[1] + l[10] * r[2] + l[14] )
         # mat3 * vec3
         elif len(l) == 9 and len(r) == 3:
-            return vec3(
+            return vec3.from_xyz(
                 l[0] * r[0] + l[3] * r[1] + l[6] * r[2] ,
                 l[1] * r[0] + l[4] * r[1] + l[7] * r[2] ,
                 l[2] * r[0] + l[5] * r[1] + l[8] * r[2] )
@@ -101,16 +302,167 @@ class mat_base(vec_base):
             raise TypeError("Can not matrix-multiply %s (%d) with %s (%d)" % (
                                 type(l), len(l), type(r), len(r) ))
 
+    def _multiply_vec3(self, v, out=None):
+        """Returns self * v for a vec3, written to out if given"""
+        n = self.num_rows()
+        m = self.v
+        x, y, z = v.v
+        kind = self._kind if type(m) is array else GENERAL
+        if kind == IDENTITY:
+            return vec3._new_into((x, y, z), out)
+        if kind == TRANSLATION:
+            return vec3._new_into((x + m[12], y + m[13], z + m[14]), out)
+        if n == 4:
+            return vec3._new_into((m[0] * x + m[4] * y + m[8 ] * z + m[12],
+                                   m[1] * x + m[5] * y + m[9 ] * z + m[13],
+                                   m[2] * x + m[6] * y + m[10] * z + m[14]), out)
+        return vec3._new_into((m[0] * x + m[3] * y + m[6] * z,
+                               m[1] * x + m[4] * y + m[7] * z,
+                               m[2] * x + m[5] * y + m[8] * z), out)
+
+    def _multiply_vec4(self, v, out=None):
+        """Returns self * v for a vec4 and a mat4, written to out if given"""
+        if not self.num_rows() == 4:
+            raise TypeError("Can not matrix-multiply %s with vec4" % type(self).__name__)
+        m = self.v
+        if self._structure() == IDENTITY:
+            return vec4._new_into(v.v, out)
+        x, y, z, w = v.v
+        return vec4._new_into((m[0] * x + m[4] * y + m[8 ] * z + m[12] * w,
+                               m[1] * x + m[5] * y + m[9 ] * z + m[13] * w,
+                               m[2] * x + m[6] * y + m[10] * z + m[14] * w,
+                               m[3] * x + m[7] * y + m[11] * z + m[15] * w), out)
+
+    def _transform_vec4(self, vectors, out):
+        """Multiplies each vec4 in vectors with the mat4
+        and writes the result to out, or to vectors if out is None.
+        vectors and out are vec4_arrays or flat float64 buffers"""
+        if not self.num_rows() == 4:
+            raise TypeError("Can not matrix-multiply %s with vec4_array" % type(self).__name__)
+        src = vectors if type(vectors) is vec4_array else vec4_array.from_buffer(vectors)
+        dst = src if out is None else out if type(out) is vec4_array else vec4_array.from_buffer(out)
+        if not len(dst) == len(src):
+            raise ValueError("Expected output of length %d, got %d" % (len(src), len(dst)))
+        m = self.v
+        if self._structure() == IDENTITY:
+            if dst is not src:
+                dst._flat()[:] = src._flat()
+            return vectors if out is None else out
+        if _is_ndarray(src.data) and _is_ndarray(dst.data):
+            # the rows of the column-major storage are the columns of the matrix
+            numpy.matmul(src.data, numpy.array(m).reshape(4, 4), out=dst.data)
+        else:
+            x, y, z, w = src._components()
+            dst._set_components([[m[r] * vx + m[r+4] * vy + m[r+8] * vz + m[r+12] * vw
+                                  for vx, vy, vz, vw in zip(x, y, z, w)] for r in range(4)])
+        return vectors if out is None else out
+
+    def _transform_vec3(self, points, out, translate):
+        """Multiplies each vector in points with the upper-left 3x3 part of the matrix,
+        adds the translation of a mat4 if translate is True
+        and writes the result to out, or to points if out is None.
+        points and out are vec3_arrays or flat float64 buffers"""
+        src = points if type(points) is vec3_array else vec3_array.from_buffer(points)
+        dst = src if out is None else out if type(out) is vec3_array else vec3_array.from_buffer(out)
+        if not len(dst) == len(src):
+            raise ValueError("Expected output of length %d, got %d" % (len(src), len(dst)))
+        n = self.num_rows()
+        m = self.v
+        kind = self._structure()
+        if kind == IDENTITY or (kind == TRANSLATION and not translate):
+            if dst is not src:
+                dst._flat()[:] = src._flat()
+            return points if out is None else out
+        if kind == TRANSLATION:
+            if _is_ndarray(src.data) and _is_ndarray(dst.data):
+                numpy.add(src.data, (m[12], m[13], m[14]), out=dst.data)
+            else:
+                x, y, z = src._components()
+                tx, ty, tz = m[12], m[13], m[14]
+                dst._set_components(([vx + tx for vx in x], [vy + ty for vy in y], [vz + tz for vz in z]))
+            return points if out is None else out
+        a, b, c = m[0], m[1], m[2]
+        d, e, f = m[n], m[n+1], m[n+2]
+        g, h, i = m[2*n], m[2*n+1], m[2*n+2]
+        if _is_ndarray(src.data) and _is_ndarray(dst.data):
+            numpy.matmul(src.data, numpy.array(((a, b, c), (d, e, f), (g, h, i))), out=dst.data)
+            if translate:
+                dst.data += (m[12], m[13], m[14])
+        else:
+            tx, ty, tz = (m[12], m[13], m[14]) if translate else (0., 0., 0.)
+            x, y, z = src._components()
+            dst._set_components(([a * vx + d * vy + g * vz + tx for vx, vy, vz in zip(x, y, z)],
+                                 [b * vx + e * vy + h * vz + ty for vx, vy, vz in zip(x, y, z)],
+                                 [c * vx + f * vy + i * vz + tz for vx, vy, vz in zip(x, y, z)]))
+        return points if out is None else out
+
     def _multiply_inplace(self, m):
-        sv = list(self.v)
-        for row in range(self.num_rows()):
-            for col in range(self.num_rows()):
-                s = 0.
-                for i in range(self.num_rows()):
-                    s += sv[row + i * self.num_rows()] * m.v[i + col * self.num_rows()]
-                self.v[row + col * self.num_rows()] = s
+        """self = self * m, the derived classes implement unrolled versions"""
+        n = self.num_rows()
+        sv = self.v[:]
+        mv = m.v
+        _store(self.v, [sum(sv[row + i * n] * mv[i + col * n] for i in range(n))
+                       for col in range(n) for row in range(n)])
+        self._kind = _combine(self._structure(), m._structure())
+        return self
+
+    def _rotate_columns(self, i, j, degree):
+        """Multiplies with a rotation around the axis that is neither i nor j, INPLACE.
+        Only columns i and j change, so no temporary matrix is needed"""
+        degree *= const.DEG_TO_TWO_PI
+        sa = math.sin(degree)
+        ca = math.cos(degree)
+        n = self.num_rows()
+        v = self.v
+        ci, cj = v[i*n:(i+1)*n], v[j*n:(j+1)*n]
+        v[i*n:(i+1)*n] = array("d", [x * ca + y * sa for x, y in zip(ci, cj)])
+        v[j*n:(j+1)*n] = array("d", [y * ca - x * sa for x, y in zip(ci, cj)])
+        self._kind = _combine(self._structure(), ROTATION)
         return self
 
+    def _multiply_columns(self, r):
+        """Multiplies the first three columns with the column-major 3x3 matrix r, INPLACE"""
+        n = self.num_rows()
+        v = self.v
+        c0, c1, c2 = v[0:n], v[n:2*n], v[2*n:3*n]
+        v[0:3*n] = array("d", [x * r[3*j] + y * r[3*j+1] + z * r[3*j+2]
+                               for j in range(3) for x, y, z in zip(c0, c1, c2)])
+        return self
+
+    @staticmethod
+    def _determinant3(a0, a1, a2, a3, a4, a5, a6, a7, a8):
+        """Returns the determinant of the 3x3 matrix"""
+        return a0 * (a4 * a8 - a5 * a7) - a1 * (a3 * a8 - a5 * a6) + a2 * (a3 * a7 - a4 * a6)
+
+    @staticmethod
+    def _inverse3(a0, a1, a2, a3, a4, a5, a6, a7, a8):
+        """Returns the inverse of the 3x3 matrix as tuple in the same order.
+        Raises ValueError if the matrix is not invertible"""
+        c0 = a4 * a8 - a5 * a7
+        c1 = a5 * a6 - a3 * a8
+        c2 = a3 * a7 - a4 * a6
+        det = a0 * c0 + a1 * c1 + a2 * c2
+        if det == 0.:
+            raise ValueError("Matrix is not invertible")
+        det = 1. / det
+        return (c0 * det, (a2 * a7 - a1 * a8) * det, (a1 * a5 - a2 * a4) * det,
+                c1 * det, (a0 * a8 - a2 * a6) * det, (a2 * a3 - a0 * a5) * det,
+                c2 * det, (a1 * a6 - a0 * a7) * det, (a0 * a4 - a1 * a3) * det)
+
+    @staticmethod
+    def _rotation_axis(axis, degree):
+        """Returns the column-major 3x3 rotation matrix as tuple,
+        axis must be normalized"""
+        tools.check_float_sequence(axis, 3)
+        x, y, z = float(axis[0]), float(axis[1]), float(axis[2])
+        degree *= const.DEG_TO_TWO_PI
+        si = math.sin(degree)
+        co = math.cos(degree)
+        m = 1. - co
+        return (co + x * x * m, x * y * m + z * si, x * z * m - y * si,
+                x * y * m - z * si, co + y * y * m, y * z * m + x * si,
+                x * z * m + y * si, y * z * m - x * si, co + z * z * m)
+
     # ----- public API getter ------
 
     def get(self, row, column):
@@ -127,11 +479,46 @@ class mat_base(vec_base):
         """
         return sum(self.v[::self.num_rows()+1])
 
+    def structure(self):
+        """
+        Returns the known structure of the matrix, which is
+        "identity", "translation", "rotation", "affine" or "general".
+        The structure is tracked by the setters and INPLACE methods,
+        "general" means that nothing is known
+        :return: str
+        >>> mat4().structure()
+        'identity'
+        >>> mat4().translate((1,2,3)).rotate_x(90).structure()
+        'affine'
+        """
+        return _STRUCTURE_NAMES[self._structure()]
+
+    def is_identity(self):
+        """
+        Returns True if the matrix is the identity.
+        This is a flag test for matrices known to be the identity
+        and a comparison of the values otherwise
+        :return: bool
+        >>> mat4((1,0,0,0, 0,1,0,0, 0,0,1,0, 0,0,0,1)).is_identity()
+        True
+        """
+        kind = self._structure()
+        if kind == IDENTITY:
+            return True
+        if not self.v == _IDENTITY[len(self)]:
+            return False
+        if type(self.v) is array:
+            self._kind = IDENTITY
+        return True
+
     def has_translation(self):
         """
         Returns True if the matrix contains a translation, False otherwise
         :return: bool
         """
+        kind = self._structure()
+        if kind == IDENTITY or kind == ROTATION:
+            return False
         return len(self) == 16 and not (self.v[12] == 0. and self.v[13] == 0. and self.v[14] == 0.)
 
     def has_rotation(self):
@@ -139,6 +526,9 @@ class mat_base(vec_base):
         Returns True if the matrix contains a rotation or skew transform, False otherwise
         :return: bool
         """
+        kind = self._structure()
+        if kind == IDENTITY or kind == TRANSLATION:
+            return False
         num = min(3, self.num_rows())
         for r in range(num):
             for c in range(num):
@@ -146,8 +536,33 @@ class mat_base(vec_base):
                     return True
         return False
 
+    def is_affine(self):
+        """
+        Returns True if the last row of a mat4 is (0,0,0,1), which is the case
+        for all combinations of translation, rotation, scale and skew.
+        A mat3 is always affine
+        :return: bool
+        """
+        v = self.v
+        if (self._kind if type(v) is array else GENERAL) <= AFFINE:
+            return True
+        return len(self) == 9 or (v[3] == 0. and v[7] == 0. and v[11] == 0. and v[15] == 1.)
+
     # ---- public API setter -----
 
+    def inverse(self):
+        """
+        Inverts the matrix, INPLACE
+        Raises ValueError if the matrix is not invertible
+        :return: self
+        """
+        kind = self._structure()
+        if kind == IDENTITY:
+            return self
+        self.v[:] = self.inversed().v
+        self._kind = kind
+        return self
+
     def set_identity(self, value=1.):
         """
         Sets the identity matrix
@@ -159,7 +574,12 @@ class mat_base(vec_base):
         mat4(2,0,0,0, 0,2,0,0, 0,0,2,0, 0,0,0,2)
         """
         arg = tools.check_float_number(value)
-        self.v = [arg if i % (self.num_rows()+1) == 0 else 0. for i in range(len(self))]
+        if arg == 1.:
+            self.v[:] = _IDENTITY[len(self)]
+            self._kind = IDENTITY
+            return self
+        self.v[:] = array("d", [arg if i % (self.num_rows()+1) == 0 else 0. for i in range(len(self))])
+        self._kind = GENERAL
         return self
 
     def set(self, *arg):
@@ -183,6 +603,11 @@ class mat_base(vec_base):
         if not arg:
             self.set_identity(1.)
             return self
+        if len(arg) == 1 and type(arg[0]) is type(self):
+            self.v[:] = arg[0].v
+            self._kind = arg[0]._structure()
+            return self
+        self._kind = GENERAL
         return super(mat_base, self).set(*arg)
 
     def transpose(self):
@@ -192,7 +617,13 @@ class mat_base(vec_base):
         >>> mat4((1,2,3,4, 5,6,7,8, 9,10,11,12, 13,14,15,16)).transpose()
         mat4(1,5,9,13, 2,6,10,14, 3,7,11,15, 4,8,12,16)
         """
-        self.v = [self.v[row + i*self.num_rows()] for row in range(self.num_rows()) for i in range(self.num_rows())]
+        kind = self._structure()
+        if kind == IDENTITY:
+            return self
+        self.v[:] = array("d", [self.v[row + i*self.num_rows()] for row in range(self.num_rows())
+                                for i in range(self.num_rows())])
+        # the transpose of a rotation is it's inverse, a rotation as well
+        self._kind = ROTATION if kind == ROTATION else GENERAL
         return self
 
     def init_scale(self, arg):
@@ -209,12 +640,14 @@ class mat_base(vec_base):
             self.set(arg)
             if self.num_rows() > 3:
                 self.v[-1] = 1.
+            self._kind = AFFINE
             return self
         num = self.num_rows()-1 if self.num_rows() > 3 else self.num_rows()
         tools.check_float_sequence(arg, num)
         self.set_identity()
         for i in range(num):
             self.v[i * (self.num_rows()+1)] = float(arg[i])
+        self._kind = AFFINE
         return self
 
 
@@ -228,30 +661,101 @@ class mat_base(vec_base):
         >>> mat4().scale((2,3,4))
         mat4(2,0,0,0, 0,3,0,0, 0,0,4,0, 0,0,0,1)
         """
-        m = self.__class__().init_scale(arg)
-        self._multiply_inplace(m)
+        num = 3 if self.num_rows() > 3 else self.num_rows()
+        if tools.is_number(arg):
+            arg = (float(arg),) * num
+        tools.check_float_sequence(arg, num)
+        # only the scaled columns change
+        n = self.num_rows()
+        v = self.v
+        for i in range(num):
+            f = float(arg[i])
+            v[i*n:(i+1)*n] = array("d", [x * f for x in v[i*n:(i+1)*n]])
+        self._kind = _combine(self._structure(), AFFINE)
         return self
 
 
+    # --- changes of unknown structure ---
+
+    def __setitem__(self, key, value):
+        self._kind = GENERAL
+        self.v[key] = float(value)
+
+    def floor(self):
+        self._kind = GENERAL
+        return super(mat_base, self).floor()
+    floor.__doc__ = vec_base.floor.__doc__
+
+    def round(self, ndigits=None):
+        self._kind = GENERAL
+        return super(mat_base, self).round(ndigits)
+    round.__doc__ = vec_base.round.__doc__
+
+    def normalize(self):
+        self._kind = GENERAL
+        return super(mat_base, self).normalize()
+    normalize.__doc__ = vec_base.normalize.__doc__
+
+    def normalize_safe(self):
+        self._kind = GENERAL
+        return super(mat_base, self).normalize_safe()
+    normalize_safe.__doc__ = vec_base.normalize_safe.__doc__
+
+    def lerp(self, other, t):
+        self._kind = GENERAL
+        return super(mat_base, self).lerp(other, t)
+    lerp.__doc__ = vec_base.lerp.__doc__
+
+    def copy(self):
+        """
+        Returns a new instance of the matrix
+        """
+        r = self._new(array("d", self.v))
+        r._kind = self._structure()
+        return r
+
     # ------ value-copying methods -------
 
-    def transposed(self):
+    def transposed(self, out=None):
         """
         Returns a mat4 with columns and rows interchanged
-        :return: new matrix
+        :param out: optional matrix of the same type that receives the result
+        :return: new matrix or out
         >>> mat4((1,2,3,4, 5,6,7,8, 9,10,11,12, 13,14,15,16)).transposed()
         mat4(1,5,9,13, 2,6,10,14, 3,7,11,15, 4,8,12,16)
         """
-        return self.copy().transpose()
+        return self._copy_into(out).transpose()
 
-    def scaled(self, arg):
+    def scaled(self, arg, out=None):
         """
         Returns a scaled matrix
         :param arg3: single float or float sequence of length 3
-        :return: new matrix
+        :param out: optional matrix of the same type that receives the result
+        :return: new matrix or out
         >>> mat4().scaled(2)
         mat4(2,0,0,0, 0,2,0,0, 0,0,2,0, 0,0,0,1)
         >>> mat4().scaled((2,3,4))
         mat4(2,0,0,0, 0,3,0,0, 0,0,4,0, 0,0,0,1)
         """
-        return self.copy().scale(arg)
+        return self._copy_into(out).scale(arg)
+
+
+def _resetting(func):
+    """Returns the INPLACE operator func, that resets the structure flag"""
+    def op(self, arg):
+        self._kind = GENERAL
+        return func(self, arg)
+    op.__name__ = func.__name__
+    op.__qualname__ = func.__qualname__
+    return op
+
+
+# the identity values by matrix size
+_IDENTITY = {
+    9: array("d", (1., 0., 0., 0., 1., 0., 0., 0., 1.)),
+    16: array("d", (1., 0., 0., 0., 0., 1., 0., 0., 0., 0., 1., 0., 0., 0., 0., 1.)),
+}
+
+
+# imported last, quat builds mat3 and mat4 which derive from mat_base
+from .quat import quat
@@ -1,5 +1,20 @@
+import importlib
 import random
+import sys
+import timeit
+import tracemalloc
+from array import array
 from .vec3 import vec3
+from .mat4 import mat4
+from .quat import quat
+from .quat_array import quat_array
+from .tools import set_checks, checks_enabled
+from .vec3_array import vec3_array
+from .lazy import lazy, fuse
+from . import functions
+
+# the module, pector.array_base is shadowed by the class
+array_base_module = importlib.import_module(".array_base", __package__)
 
 
 def rnd_vec3(mi=-1., ma=1.):
@@ -26,6 +41,213 @@ def nbody_case(nbodies, nframes):
             imp[i] *= 0.99
 
 
+class list_layout:
+    """The storage layout before __slots__: an instance __dict__ and a list of float objects"""
+    def __init__(self, x, y, z):
+        self.v = [x, y, z]
+
+
+class array_layout:
+    """The current storage layout: __slots__ and an array('d')"""
+    __slots__ = ("v",)
+
+    def __init__(self, x, y, z):
+        self.v = array("d", (x, y, z))
+
+
+def instance_size(factory, count=10000):
+    """Returns the average number of bytes allocated per instance created by factory(i)"""
+    tracemalloc.start()
+    objs = [None] * count
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objs[i] = factory(i)
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return size / count
+
+
+def storage_case(number=100000):
+    x, y, z = 1., 2., 3.
+    fmt = "%16s | %10s | %s"
+    print(fmt % ("layout", "bytes", "usec per construction"))
+    for name, cls in (("list + __dict__", list_layout),
+                      ("slots + array", array_layout),
+                      ("vec3", vec3)):
+        print(fmt % (name,
+                     instance_size(lambda i: cls(i * 1., i + 1., i + 2.)),
+                     timeit.timeit(lambda: cls(x, y, z), number=number) / number * 1.e+6))
+
+
+def operator_case(number=100000):
+    a, b = vec3(1), vec3(2)
+    fmt = "%20s | %s"
+    print(fmt % ("expression", "usec per call"))
+    for stmt in ("vec3(1) + vec3(2)", "a + b", "a * 2.", "2. * a", "c = a; c += b"):
+        print(fmt % (stmt, timeit.timeit(stmt, globals={"vec3": vec3, "a": a, "b": b},
+                                         number=number) / number * 1.e+6))
+
+
+def transform_case(counts=(1000, 10000, 100000, 1000000, 10000000), fallback_max=1000000):
+    m = mat4().translate((1, 2, 3)).rotate_axis((0, 1, 0), 30).scale(2)
+    fmt = "%10s | %10s | %s"
+    print(fmt % ("points", "backend", "M points per second"))
+    has_numpy = array_base_module.numpy
+    try:
+        for backend in ("numpy", "array"):
+            if backend == "numpy" and not has_numpy:
+                continue
+            array_base_module.numpy = has_numpy if backend == "numpy" else None
+            for count in counts:
+                if backend == "array" and count > fallback_max:
+                    continue
+                points = vec3_array.from_buffer(array("d", range(count * 3)))
+                out = vec3_array(count)
+                number = max(1, 1000000 // count)
+                t = min(timeit.repeat(lambda: m.transform_points(points, out=out),
+                                      number=number, repeat=3)) / number
+                print(fmt % (count, backend, count / t * 1.e-6))
+    finally:
+        array_base_module.numpy = has_numpy
+    # one vector at a time for comparison
+    points = [vec3(i, i, i) for i in range(10000)]
+    t = min(timeit.repeat(lambda: [m * p for p in points], number=1, repeat=3))
+    print(fmt % (10000, "mat4*vec3", 10000 / t * 1.e-6))
+
+
+def checks_case(number=20000, repeat=7):
+    a = vec3(1, 2, 3)
+    m = mat4()
+    q = quat()
+    was_enabled = checks_enabled()
+    fmt = "%25s | %12s | %s"
+    print(fmt % ("expression", "checks usec", "no checks usec"))
+    # nbody_case only passes vec3 and floats, which skip the checks already
+    cases = [("nbody_case(32, 5)", timeit.Timer(lambda: nbody_case(nbodies=32, nframes=5)).timeit, 1)]
+    for stmt in ("a.dot((1,2,3))", "a.cross((0,0,1))", "a.reflect((0,1,0))",
+                 "a + (1,2,3)", "m.set_position((1,2,3))", "q * (0,0,0,1)"):
+        cases.append((stmt, timeit.Timer(stmt, globals={"a": a, "m": m, "q": q}).timeit, number))
+    try:
+        for name, func, num in cases:
+            # alternate between both modes to even out the noise of the machine
+            best = {True: None, False: None}
+            for i in range(repeat):
+                for enabled in (True, False):
+                    set_checks(enabled)
+                    random.seed(1)
+                    t = func(num) / num * 1.e+6
+                    best[enabled] = t if best[enabled] is None else min(best[enabled], t)
+            print(fmt % (name, round(best[True], 3), round(best[False], 3)))
+    finally:
+        set_checks(was_enabled)
+
+
+def lazy_case(number=100000, repeat=5):
+    ro, rd, l, d = vec3(1, 2, 3), vec3(0, 0, 1), vec3(.5, .5, .5), vec3(.1, .2, .3)
+
+    @fuse
+    def march(ro, rd, t):
+        return ro + rd * t
+
+    @fuse
+    def gravity(l, d):
+        return 0.02 * l * d
+
+    @fuse
+    def blend(a, b, c, t):
+        return a * (1. - t) + b * t + c * (t * t)
+
+    fmt = "%56s | %s"
+    print(fmt % ("expression", "usec per call"))
+    glob = {"ro": ro, "rd": rd, "l": l, "d": d, "lazy": lazy,
+            "march": march, "gravity": gravity, "blend": blend}
+    for stmt in ("ro + rd * 2.", "(ro + lazy(rd) * 2.).eval()", "march(ro, rd, 2.)",
+                 "0.02 * l * d", "(0.02 * lazy(l) * d).eval()", "gravity(l, d)",
+                 "ro * (1. - .3) + rd * .3 + l * (.3 * .3)",
+                 "(lazy(ro) * (1. - .3) + rd * .3 + l * (.3 * .3)).eval()", "blend(ro, rd, l, .3)"):
+        t = min(timeit.repeat(stmt, globals=glob, number=number, repeat=repeat))
+        print(fmt % (stmt, t / number * 1.e+6))
+
+
+def slerp_case(counts=(10, 100, 1000, 10000), repeat=5):
+    rnd = random.Random(1)
+
+    def rnd_quat():
+        return quat(rnd_vec3().normalize(), rnd.uniform(-180, 180))
+
+    fmt = "%10s | %10s | %14s | %s"
+    print(fmt % ("objects", "backend", "loop usec", "batched usec"))
+    was_numpy = array_base_module.numpy
+    try:
+        for backend in (("numpy", "array") if was_numpy is not None else ("array",)):
+            array_base_module.numpy = was_numpy if backend == "numpy" else None
+            for count in counts:
+                keys0 = [rnd_quat() for i in range(count)]
+                keys1 = [rnd_quat() for i in range(count)]
+                t = [rnd.random() for i in range(count)]
+                out = [quat() for i in range(count)]
+                a, b = quat_array(keys0), quat_array(keys1)
+
+                def loop():
+                    for q0, q1, ti, o in zip(keys0, keys1, t, out):
+                        q0.slerped(q1, ti, out=o)
+
+                number = max(1, 10000 // count)
+                loop_time = min(timeit.repeat(loop, number=number, repeat=repeat)) / number
+                batch_time = min(timeit.repeat(lambda: a.slerped(b, t), number=number, repeat=repeat)) / number
+                print(fmt % (count, backend, round(loop_time * 1.e+6, 2), round(batch_time * 1.e+6, 2)))
+    finally:
+        array_base_module.numpy = was_numpy
+
+
+def functions_case(counts=(1, 10, 100, 1000, 10000), repeat=5):
+    rnd = random.Random(1)
+    fmt = "%10s | %10s | %10s | %14s | %s"
+    print(fmt % ("function", "vectors", "backend", "loop usec", "batched usec"))
+    was_numpy = array_base_module.numpy
+    try:
+        for backend in (("numpy", "array") if was_numpy is not None else ("array",)):
+            array_base_module.numpy = was_numpy if backend == "numpy" else None
+            for name, func, args in (("dot", functions.dot, ((1, 2, 3),)),
+                                     ("normalize", functions.normalize, ()),
+                                     ("clamp", functions.clamp, (-.5, .5)),
+                                     ("mix", functions.mix, ((1, 2, 3), .3))):
+                for count in counts:
+                    vecs = [vec3(rnd.uniform(-1, 1), rnd.uniform(-1, 1), rnd.uniform(-1, 1)) for i in range(count)]
+                    a = vec3_array(vecs)
+
+                    def loop():
+                        for v in vecs:
+                            func(v, *args)
+
+                    number = max(1, 10000 // count)
+                    loop_time = min(timeit.repeat(loop, number=number, repeat=repeat)) / number
+                    batch_time = min(timeit.repeat(lambda: func(a, *args), number=number, repeat=repeat)) / number
+                    print(fmt % (name, count, backend, round(loop_time * 1.e+6, 2), round(batch_time * 1.e+6, 2)))
+    finally:
+        array_base_module.numpy = was_numpy
+
+
+def structure_case(number=20000, repeat=5):
+    """Compares the matrix operations with known structure to the same values without the flags"""
+    rnd = random.Random(1)
+    t = vec3(1, 2, 3)
+    points = vec3_array([rnd_vec3() for i in range(100)])
+    fmt = "%14s | %12s | %12s | %12s"
+    print(fmt % ("operation", "structure", "flag usec", "general usec"))
+    for m in (mat4(), mat4().translate(t), mat4().rotate_x(30).rotate_y(20), mat4().rotate_x(30).translate(t)):
+        g = mat4(m)
+        # same values, structure unknown
+        g[0] = g[0]
+        for name, func in (("m * m", lambda a: a * a),
+                           ("inversed", lambda a: a.inversed()),
+                           ("m * vec3", lambda a: a * t),
+                           ("100 points", lambda a: a.transform_points(points))):
+            times = [min(timeit.repeat(lambda: func(a), number=number, repeat=repeat)) / number for a in (m, g)]
+            print(fmt % (name, m.structure(), round(times[0] * 1.e+6, 3), round(times[1] * 1.e+6, 3)))
+
+
+
 # TODO: i get
 #   File "/usr/lib/python3.4/cProfile.py", line 22, in <module>
 #     run.__doc__ = _pyprofile.run.__doc__
@@ -52,6 +274,14 @@ if __name__ == "__main__":
 
 
     do_profile("nbody_case(nbodies=32, nframes=50)")
+    storage_case()
+    operator_case()
+    transform_case()
+    checks_case()
+    lazy_case()
+    slerp_case()
+    functions_case()
+    structure_case()
 
 
 """
@@ -95,4 +325,129 @@ if __name__ == "__main__":
    1.5e-05 |             0.078125 | <method 'random' of '_random.Random' objects>
    0.03102 |  0.07660621147463252 | <code object __len__ at 0x7ff78d9f3db0, file "/home/defgsus/prog/python/dev/pector/pector/vec3.py", line 48>
        0.0 |                  0.0 | <method 'disable' of '_lsprof.Profiler' objects>
-"""
\ No newline at end of file
+"""
+"""
+------ storage_case(number=100000) ------
+(python 3.11, vec3 with list storage and __dict__ measured 248 bytes and 3.07 usec per construction)
+          layout |      bytes | usec per construction
+ list + __dict__ |   231.9704 | 0.3231408500005273
+   slots + array |   144.0064 | 0.5415752800035989
+            vec3 |   144.0128 | 3.6447459300006813
+"""
+
+"""
+------ operator_case(number=100000) ------
+(before unrolling: vec3(1) + vec3(2) 9.3 usec, a + b 8.2 usec, a * 2. 5.5 usec)
+          expression | usec per call
+   vec3(1) + vec3(2) | 2.1550132000089
+               a + b | 0.7951804399983
+              a * 2. | 0.6940014499921
+              2. * a | 0.7013291200013
+        c = a; c += b | 0.5561950800022
+"""
+
+"""
+------ transform_case() ------
+(before: mat4 * vec3 10.0 usec per call, e.g. 0.1 M points per second)
+    points |    backend | M points per second
+      1000 |      numpy | 53.63151310389325
+     10000 |      numpy | 92.81106812720769
+    100000 |      numpy | 111.79212389258814
+   1000000 |      numpy | 48.131561654809474
+  10000000 |      numpy | 49.4797004160224
+      1000 |      array | 1.4031495321709404
+     10000 |      array | 1.4449493702812934
+    100000 |      array | 1.379030356014131
+   1000000 |      array | 1.4639672217851816
+     10000 |  mat4*vec3 | 0.6734963235031846
+"""
+
+"""
+------ checks_case() ------
+(before: a.reflect((0,1,0)) 19 usec, it now skips the vec3 constructor)
+               expression |  checks usec | no checks usec
+        nbody_case(32, 5) |     9133.692 | 9015.102
+           a.dot((1,2,3)) |        1.479 | 1.201
+         a.cross((0,0,1)) |        1.351 | 1.159
+       a.reflect((0,1,0)) |        1.012 | 0.843
+              a + (1,2,3) |        3.735 | 3.453
+  m.set_position((1,2,3)) |        0.872 | 0.48
+            q * (0,0,0,1) |        3.016 | 2.757
+"""
+
+"""
+------ lazy_case() ------
+(lazy() builds the expression in python per call and loses to the eager operators on short
+ expressions, fuse() traces once and evaluates in one unrolled pass)
+                                              expression | usec per call
+                                            ro + rd * 2. | 1.3484643499987214
+                             (ro + lazy(rd) * 2.).eval() | 4.2363402999990285
+                                       march(ro, rd, 2.) | 1.221037739996973
+                                            0.02 * l * d | 1.6199235800013412
+                             (0.02 * lazy(l) * d).eval() | 3.5523432899981344
+                                           gravity(l, d) | 1.0962719000008292
+                ro * (1. - .3) + rd * .3 + l * (.3 * .3) | 4.124509789999138
+ (lazy(ro) * (1. - .3) + rd * .3 + l * (.3 * .3)).eval() | 7.62349766999705
+                                    blend(ro, rd, l, .3) | 1.5650598499996704
+"""
+
+"""
+------ slerp_case() ------
+(loop is quat.slerped(out=) per object, batched is one quat_array.slerped with per-element t)
+   objects |    backend |      loop usec | batched usec
+        10 |      numpy |          30.75 | 46.24
+       100 |      numpy |         291.23 | 65.66
+      1000 |      numpy |        3059.19 | 240.89
+     10000 |      numpy |       36809.89 | 2868.13
+        10 |      array |          34.76 | 40.15
+       100 |      array |         326.05 | 270.13
+      1000 |      array |        3486.07 | 2846.34
+     10000 |      array |       38148.48 | 27406.69
+"""
+
+"""
+------ functions_case() ------
+(loop calls the function per vec3, batched once with the vec3_array;
+ functions.dot(vec3, vec3) took 3.2 usec before the type dispatch, now 1.0 usec)
+  function |    vectors |    backend |      loop usec | batched usec
+       dot |          1 |      numpy |           3.75 | 7.32
+       dot |        100 |      numpy |         399.79 | 12.13
+       dot |      10000 |      numpy |       38162.23 | 373.47
+ normalize |          1 |      numpy |           4.28 | 10.51
+ normalize |        100 |      numpy |         384.59 | 13.04
+ normalize |      10000 |      numpy |       37195.07 | 519.55
+     clamp |          1 |      numpy |           6.44 | 13.18
+     clamp |        100 |      numpy |         598.36 | 14.62
+     clamp |      10000 |      numpy |       64604.05 | 202.77
+       mix |          1 |      numpy |           7.74 | 17.07
+       mix |        100 |      numpy |         829.15 | 19.44
+       mix |      10000 |      numpy |       79326.32 | 338.62
+       dot |        100 |      array |         394.61 | 73.05
+       dot |      10000 |      array |       38865.64 | 5685.92
+ normalize |        100 |      array |         407.77 | 218.99
+ normalize |      10000 |      array |       36638.42 | 17567.44
+     clamp |        100 |      array |         658.27 | 71.26
+     clamp |      10000 |      array |       59154.19 | 6693.87
+       mix |        100 |      array |         761.05 | 70.65
+       mix |      10000 |      array |       80322.31 | 7126.89
+
+------ structure_case() ------
+(general is the same matrix with the structure flag reset, e.g. as before the flags)
+     operation |    structure |    flag usec | general usec
+         m * m |     identity |        2.415 |          5.4
+      inversed |     identity |        1.167 |        2.293
+      m * vec3 |     identity |        2.115 |        2.076
+    100 points |     identity |         1.36 |        8.222
+         m * m |  translation |        4.369 |        6.393
+      inversed |  translation |        2.601 |        3.816
+      m * vec3 |  translation |        2.317 |        3.323
+    100 points |  translation |        6.745 |       13.101
+         m * m |     rotation |        4.542 |        5.202
+      inversed |     rotation |        1.549 |        3.237
+      m * vec3 |     rotation |        2.232 |        1.895
+    100 points |     rotation |        8.391 |       12.645
+         m * m |       affine |        4.716 |        4.855
+      inversed |       affine |        2.802 |        3.334
+      m * vec3 |       affine |        2.852 |        2.962
+    100 points |       affine |       12.356 |       12.587
+"""
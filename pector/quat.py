@@ -1,6 +1,13 @@
 import math
+from array import array
 from . import tools, const
-from .vec_base import vec_base
+from .vec_base import vec_base, _store
+from .vec3 import vec3
+from .array_base import array_base
+from .vec3_array import vec3_array
+from .mat3 import mat3
+from .mat4 import mat4
+from .mat_base import ROTATION, AFFINE
 
 
 # some refs:
@@ -18,11 +25,24 @@ class quat(vec_base):
     containing float-convertible elements,
     typically of length 4 as well.
     """
+
+    __slots__ = ()
+
     def __init__(self, *arg):
-        self.v = [0., 0., 0., 1.]
+        self.v = array("d", (0., 0., 0., 1.))
         if arg:
             self.set(*arg)
 
+    @classmethod
+    def from_xyzw(cls, x, y, z, w):
+        """
+        Creates a quat from four numbers without the argument parsing of the constructor
+        :return: quat
+        >>> quat.from_xyzw(0, 0, 0, 1)
+        quat(0, 0, 0, 1)
+        """
+        return cls._new(array("d", (x, y, z, w)))
+
     def __str__(self):
         return "quat(%g, %g, %g, %g)" % (self.v[0], self.v[1], self.v[2], self.v[3])
 
@@ -68,12 +88,12 @@ class quat(vec_base):
         set((x,y,z),deg) -> self
         """
         if arg is None:
-            self.v = [0., 0., 0., 1.]
+            self.v[:] = array("d", (0., 0., 0., 1.))
             return self
         if len(arg) == 1:
             if tools.is_float_sequence(arg[0]):
                 tools.check_float_sequence(arg[0], 4)
-                self.v = [float(x) for x in arg[0]]
+                self.v[:] = array("d", [float(x) for x in arg[0]])
                 return self
         elif len(arg) == 2:
             if tools.is_float_sequence(arg[0]) and len(arg[0]) == 3 and tools.is_number(arg[1]):
@@ -84,75 +104,141 @@ class quat(vec_base):
                 return self
         elif len(arg) == 4:
             tools.check_float_sequence(arg, 4)
-            self.v = [float(x) for x in arg]
+            self.v[:] = array("d", [float(x) for x in arg])
             return self
         raise TypeError("Invalid arguments to quaternion, expected seq-4 or seq-3 + float, got %s" % type(arg))
 
     # ------- getter --------
 
-    def as_mat3(self):
-        from pector import mat3
+    def as_mat3(self, out=None):
         """
         Returns a 3x3 rotation matrix from the quaternion.
-        :return: mat3
-        """
-        x = self.x + self.x
-        y = self.y + self.y
-        z = self.z + self.z
-        wx = x * self.w
-        wy = y * self.w
-        wz = z * self.w
-        xx = x * self.x
-        xy = y * self.x
-        xz = z * self.x
-        yy = y * self.y
-        yz = z * self.y
-        zz = z * self.z
-        m = mat3( 1.0 - (yy + zz), xy + wz, xz - wy,
-                  xy - wz, 1.0 - (xx + zz), yz + wx,
-                  xz + wy, yz - wx, 1.0 - (xx + yy))
-        return m
-
-
-    def as_mat4(self):
-        from pector import mat4
+        :param out: optional mat3 that receives the result
+        :return: mat3 or out
+        """
+        qx, qy, qz, w = self.v
+        x = qx + qx
+        y = qy + qy
+        z = qz + qz
+        wx = x * w
+        wy = y * w
+        wz = z * w
+        xx = x * qx
+        xy = y * qx
+        xz = z * qx
+        yy = y * qy
+        yz = z * qy
+        zz = z * qz
+        # a unit quaternion gives a pure rotation, otherwise the rotation is scaled
+        kind = ROTATION if abs(qx * qx + qy * qy + qz * qz + w * w - 1.) < 1e-12 else AFFINE
+        return mat3._new_into((1.0 - (yy + zz), xy + wz, xz - wy,
+                               xy - wz, 1.0 - (xx + zz), yz + wx,
+                               xz + wy, yz - wx, 1.0 - (xx + yy)), out, kind)
+
+    def as_mat4(self, out=None):
         """
         Returns a 4x4 rotation matrix from the quaternion.
-        :return: mat4
+        :param out: optional mat4 that receives the result
+        :return: mat4 or out
+        """
+        qx, qy, qz, w = self.v
+        x = qx + qx
+        y = qy + qy
+        z = qz + qz
+        wx = x * w
+        wy = y * w
+        wz = z * w
+        xx = x * qx
+        xy = y * qx
+        xz = z * qx
+        yy = y * qy
+        yz = z * qy
+        zz = z * qz
+        kind = ROTATION if abs(qx * qx + qy * qy + qz * qz + w * w - 1.) < 1e-12 else AFFINE
+        return mat4._new_into((1.0 - (yy + zz), xy + wz, xz - wy, 0.,
+                               xy - wz, 1.0 - (xx + zz), yz + wx, 0.,
+                               xz + wy, yz - wx, 1.0 - (xx + yy), 0.,
+                               0., 0., 0., 1.), out, kind)
+
+    def rotate_vec3(self, v, out=None):
+        """
+        Returns the vector rotated by the quaternion, which must be normalized.
+        Uses v + w * t + cross(q, t) with t = 2 * cross(q, v)
+        instead of the full product q * v * inverse(q)
+        :param v: float sequence of length 3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
+        >>> quat().set_rotate_axis((0,0,1), 90).rotate_vec3((1,2,3)).rounded()
+        vec3(-2, 1, 3)
         """
-        m3 = self.as_mat3()
-        return mat4(m3[0], m3[1], m3[2], 0.,
-                    m3[3], m3[4], m3[5], 0.,
-                    m3[6], m3[7], m3[8], 0.,
-                    0.   , 0.   , 0.   , 1.)
+        if type(v) is vec3:
+            vx, vy, vz = v.v
+        else:
+            tools.check_float_sequence(v, 3)
+            vx, vy, vz = float(v[0]), float(v[1]), float(v[2])
+        x, y, z, w = self.v
+        tx = 2. * (y * vz - z * vy)
+        ty = 2. * (z * vx - x * vz)
+        tz = 2. * (x * vy - y * vx)
+        return vec3._new_into((vx + w * tx + y * tz - z * ty,
+                               vy + w * ty + z * tx - x * tz,
+                               vz + w * tz + x * ty - y * tx), out)
+
+    def rotate_vectors(self, vectors, out=None):
+        """
+        Rotates many vectors at once by the quaternion, which must be normalized
+        :param vectors: vec3_array or flat float64 buffer (x,y,z, x,y,z, ...),
+        e.g. array('d'), numpy.ndarray or bytearray
+        :param out: vec3_array or buffer of same length, if None vectors are rotated INPLACE
+        :return: out, or vectors if out is None
+        """
+        # one matrix setup, then the matrix path that uses numpy if available
+        return self.as_mat3().transform_vectors(vectors, out)
 
     # ------- arithmetic ops --------
 
     def __mul__(self, other):
-        if tools.is_number(other):
-            return self._binary_operator(float(other), lambda l, r: l * r)
-        tools.check_float_sequence(other)
-        q = quat()
+        t = type(other)
+        if t is float or t is int:
+            return self._binary_operator(other, lambda l, r: l * r)
+        if t is vec3:
+            return self.rotate_vec3(other)
+        if t is not quat:
+            if tools.is_number(other):
+                return self._binary_operator(float(other), lambda l, r: l * r)
+            if t is vec3_array:
+                return self.rotate_vectors(other, vec3_array(len(other)))
+            if isinstance(other, array_base):
+                return NotImplemented
+            tools.check_float_sequence(other)
+            if len(other) == 3:
+                return self.rotate_vec3(other)
         #q.x = self.w * other[0] - self.x * other[3] - self.y * other[2] - self.z * other[1]
         #q.y = self.w * other[1] + self.x * other[2] + self.y * other[3] - self.z * other[0]
         #q.z = self.w * other[2] - self.x * other[1] + self.y * other[0] + self.z * other[3]
         #q.w = self.w * other[3] + self.x * other[0] - self.y * other[1] + self.z * other[2]
-        q.x = self.x * float(other[3]) + self.w * float(other[0]) + self.y * float(other[2]) - self.z * float(other[1])
-        q.y = self.w * float(other[1]) - self.x * float(other[2]) + self.y * float(other[3]) + self.z * float(other[0])
-        q.z = self.w * float(other[2]) + self.x * float(other[1]) - self.y * float(other[0]) + self.z * float(other[3])
-        q.w = self.w * float(other[3]) - self.x * float(other[0]) - self.y * float(other[1]) - self.z * float(other[2])
-        return q
+        x, y, z, w = self.v
+        ox, oy, oz, ow = float(other[0]), float(other[1]), float(other[2]), float(other[3])
+        return quat._new(array("d", (x * ow + w * ox + y * oz - z * oy,
+                                     w * oy - x * oz + y * ow + z * ox,
+                                     w * oz + x * oy - y * ox + z * ow,
+                                     w * ow - x * ox - y * oy - z * oz)))
 
     def __rmul__(self, other):
+        t = type(other)
+        if t is float or t is int:
+            return self._binary_operator(other, lambda r, l: l * r)
         if tools.is_number(other):
             return self._binary_operator(float(other), lambda r, l: l * r)
+        if isinstance(other, array_base):
+            return NotImplemented
         tools.check_float_sequence(other)
         q = quat(other)
         return q.__mul__(self)
 
     def __imul__(self, other):
         q = self.__mul__(other)
-        self.v = q.v
+        self.v[:] = q.v
         return self
 
     # ------ inplace methods -------
@@ -184,13 +270,108 @@ class quat(vec_base):
         return self
 
     def rotate_axis(self, axis, degree):
-        self.v = (quat().set_rotate_axis(axis, degree) * self.v).v
+        self.v[:] = (quat().set_rotate_axis(axis, degree) * self.v).v
+        return self
+
+    def slerp(self, other, t):
+        """
+        Spherical linear interpolation to other along the shorter arc, INPLACE
+        Both quaternions must be normalized
+        :param other: float sequence of length 4
+        :param t: float, 0. - 1.
+        :return: self
+        >>> quat().slerp(quat((0,0,1), 90), .5).round(6)
+        quat(0, 0, 0.382683, 0.92388)
+        """
+        if type(other) is not quat:
+            tools.check_float_sequence(other, 4)
+        _store(self.v, quat._slerp(*self.v, float(other[0]), float(other[1]),
+                                  float(other[2]), float(other[3]), float(t)))
+        return self
+
+    def nlerp(self, other, t):
+        """
+        Normalized linear interpolation to other along the shorter arc, INPLACE
+        Cheaper than slerp but the angular velocity is not constant
+        :param other: float sequence of length 4
+        :param t: float, 0. - 1.
+        :return: self
+        >>> quat().nlerp(quat((0,0,1), 90), .5).round(6)
+        quat(0, 0, 0.382683, 0.92388)
+        """
+        if type(other) is not quat:
+            tools.check_float_sequence(other, 4)
+        _store(self.v, quat._nlerp(*self.v, float(other[0]), float(other[1]),
+                                  float(other[2]), float(other[3]), float(t)))
         return self
 
     # --- value-copying methods ---
 
-    def rotated_axis(self, axis, degree):
-        return quat().set_rotate_axis(axis, degree) * self.v
+    def rotated_axis(self, axis, degree, out=None):
+        """
+        Returns this quaternion rotated around an axis
+        :param axis: The axis of rotation, must be normalized
+        :param degree: The degrees of rotation [0.,360.]
+        :param out: optional quat that receives the result
+        :return: quat or out
+        """
+        r = quat().set_rotate_axis(axis, degree) * self.v
+        return r if out is None else r._copy_into(out)
+
+    def slerped(self, other, t, out=None):
+        """
+        Returns the spherical linear interpolation to other along the shorter arc
+        Both quaternions must be normalized
+        :param other: float sequence of length 4
+        :param t: float, 0. - 1.
+        :param out: optional quat that receives the result
+        :return: quat or out
+        """
+        if out is other:
+            other = tuple(other)
+        return self._copy_into(out).slerp(other, t)
+
+    def nlerped(self, other, t, out=None):
+        """
+        Returns the normalized linear interpolation to other along the shorter arc
+        :param other: float sequence of length 4
+        :param t: float, 0. - 1.
+        :param out: optional quat that receives the result
+        :return: quat or out
+        """
+        if out is other:
+            other = tuple(other)
+        return self._copy_into(out).nlerp(other, t)
+
+    # --- helper ---
+
+    @staticmethod
+    def _nlerp(x, y, z, w, ox, oy, oz, ow, t):
+        """Returns the normalized linear interpolation as tuple"""
+        if x * ox + y * oy + z * oz + w * ow < 0.:
+            ox, oy, oz, ow = -ox, -oy, -oz, -ow
+        x += t * (ox - x)
+        y += t * (oy - y)
+        z += t * (oz - z)
+        w += t * (ow - w)
+        l = math.sqrt(x * x + y * y + z * z + w * w)
+        return x / l, y / l, z / l, w / l
+
+    @staticmethod
+    def _slerp(x, y, z, w, ox, oy, oz, ow, t):
+        """Returns the spherical linear interpolation as tuple,
+        the normalized linear interpolation for nearly equal rotations"""
+        d = x * ox + y * oy + z * oz + w * ow
+        if d < 0.:
+            d = -d
+            ox, oy, oz, ow = -ox, -oy, -oz, -ow
+        if d > .9995:
+            return quat._nlerp(x, y, z, w, ox, oy, oz, ow, t)
+        theta = math.acos(d)
+        s = 1. / math.sin(theta)
+        s0 = math.sin((1. - t) * theta) * s
+        s1 = math.sin(t * theta) * s
+        return s0 * x + s1 * ox, s0 * y + s1 * oy, s0 * z + s1 * oz, s0 * w + s1 * ow
 
 
 
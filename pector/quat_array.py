@@ -0,0 +1,211 @@
+from array import array
+from itertools import repeat
+from . import tools
+from .array_base import array_base, _is_ndarray, numpy
+from .quat import quat
+from .vec3 import vec3
+from .vec3_array import vec3_array
+from .mat4_array import mat4_array
+
+
+class quat_array(array_base):
+    """
+    Contiguous array of quat.
+    It behaves like a list of quat, where the elements are views into the array.
+    Multiplication with a quat or quat_array is the quaternion product,
+    multiplication with a vec3 or vec3_array rotates the vectors,
+    multiplication with a number is component-wise
+    >>> quat_array(2)
+    quat_array([quat(0, 0, 0, 1), quat(0, 0, 0, 1)])
+    """
+
+    __slots__ = ()
+
+    element = quat
+
+    # ------- arithmetic ops --------
+
+    def __mul__(self, other):
+        if tools.is_number(other):
+            return super().__mul__(other)
+        if type(other) is vec3 or type(other) is vec3_array:
+            return self.rotate_vec3(other)
+        return self._new(self._multiply(self, other))
+
+    def __rmul__(self, other):
+        if tools.is_number(other):
+            return super().__rmul__(other)
+        return self._new(self._multiply(other, self))
+
+    def __imul__(self, other):
+        if tools.is_number(other):
+            return super().__imul__(other)
+        r = self._multiply(self, other)
+        if _is_ndarray(self.data):
+            self.data[...] = r
+        else:
+            self.data[:] = r
+        return self
+
+    # ----- getter -----
+
+    def as_mat4(self):
+        """
+        Returns the 4x4 rotation matrix of each quaternion
+        :return: mat4_array
+        >>> quat_array([quat().set_rotate_axis((0,0,1), 90)]).as_mat4().round()
+        mat4_array([mat4(0,1,0,0, -1,0,0,0, 0,0,1,0, 0,0,0,1)])
+        """
+        if _is_ndarray(self.data):
+            x, y, z, w = self.data.T * 2.
+            qx, qy, qz = self.data[:, 0], self.data[:, 1], self.data[:, 2]
+            xx, xy, xz = x * qx, y * qx, z * qx
+            yy, yz, zz = y * qy, z * qy, z * qz
+            wx, wy, wz = x * self.data[:, 3], y * self.data[:, 3], z * self.data[:, 3]
+            zero, one = numpy.zeros(len(self)), numpy.ones(len(self))
+            return mat4_array._new(numpy.stack((1. - (yy + zz), xy + wz, xz - wy, zero,
+                                                xy - wz, 1. - (xx + zz), yz + wx, zero,
+                                                xz + wy, yz - wx, 1. - (xx + yy), zero,
+                                                zero, zero, zero, one), axis=-1))
+        ret = array("d")
+        for q in self:
+            ret.extend(q.as_mat4().v)
+        return mat4_array._new(ret)
+
+    def rotate_vec3(self, vectors):
+        """
+        Returns the vectors rotated by the quaternions, which must be normalized
+        :param vectors: float sequence of length 3 or vec3_array of same length
+        :return: vec3_array
+        >>> quat_array([quat().set_rotate_axis((0,0,1), 90)]).rotate_vec3((1,2,3)).round()
+        vec3_array([vec3(-2, 1, 3)])
+        """
+        if type(vectors) is vec3_array:
+            self._check_length(vectors)
+        else:
+            tools.check_float_sequence(vectors, 3)
+        if _is_ndarray(self.data) and (type(vectors) is not vec3_array or _is_ndarray(vectors.data)):
+            v = vectors.data if type(vectors) is vec3_array else numpy.array([float(x) for x in vectors])
+            q = self.data[:, :3]
+            w = self.data[:, 3:4]
+            t = 2. * numpy.cross(q, v)
+            return vec3_array._new(v + w * t + numpy.cross(q, t))
+        if type(vectors) is vec3_array:
+            vx, vy, vz = vectors._components()
+        else:
+            vx, vy, vz = [repeat(float(x)) for x in vectors]
+        ret = array("d")
+        for x, y, z, w, ax, ay, az in zip(*self._components(), vx, vy, vz):
+            tx = 2. * (y * az - z * ay)
+            ty = 2. * (z * ax - x * az)
+            tz = 2. * (x * ay - y * ax)
+            ret.extend((ax + w * tx + y * tz - z * ty,
+                        ay + w * ty + z * tx - x * tz,
+                        az + w * tz + x * ty - y * tx))
+        return vec3_array._new(vec3_array._wrap(ret))
+
+    # ------ inplace methods -------
+
+    def slerp(self, other, t):
+        """
+        Spherical linear interpolation of each element to other along the shorter arc, INPLACE
+        All quaternions must be normalized
+        :param other: float sequence of length 4 or quat_array of same length
+        :param t: float, 0. - 1., or float sequence with one value per element
+        :return: self
+        >>> quat_array([quat(), quat((1,0,0), 90)]).slerp(quat((0,0,1), 90), (.5, 0.)).round(6)
+        quat_array([quat(0, 0, 0.382683, 0.92388), quat(0.707107, 0, 0, 0.707107)])
+        """
+        return self._interpolate(other, t, True)
+
+    def nlerp(self, other, t):
+        """
+        Normalized linear interpolation of each element to other along the shorter arc, INPLACE
+        Cheaper than slerp but the angular velocity is not constant
+        :param other: float sequence of length 4 or quat_array of same length
+        :param t: float, 0. - 1., or float sequence with one value per element
+        :return: self
+        """
+        return self._interpolate(other, t, False)
+
+    # --- value-copying methods ---
+
+    def slerped(self, other, t):
+        """
+        Returns the spherical linear interpolation of each element to other
+        :param other: float sequence of length 4 or quat_array of same length
+        :param t: float, 0. - 1., or float sequence with one value per element
+        :return: quat_array
+        """
+        return self.copy().slerp(other, t)
+
+    def nlerped(self, other, t):
+        """
+        Returns the normalized linear interpolation of each element to other
+        :param other: float sequence of length 4 or quat_array of same length
+        :param t: float, 0. - 1., or float sequence with one value per element
+        :return: quat_array
+        """
+        return self.copy().nlerp(other, t)
+
+    # --- helper ---
+
+    def _interpolate(self, other, t, spherical):
+        """slerp or nlerp of all elements, INPLACE"""
+        if not tools.is_number(t):
+            tools.check_float_sequence(t, len(self))
+        if _is_ndarray(self.data):
+            q = self.data
+            o = numpy.broadcast_to(self._numpy_operand(other), q.shape)
+            t = numpy.asarray(t, dtype=numpy.float64)
+            if t.ndim:
+                t = t[:, None]
+            d = numpy.einsum("ij,ij->i", q, o)
+            # shorter arc
+            o = numpy.where((d < 0.)[:, None], -o, o)
+            d = numpy.abs(d)[:, None]
+            if spherical:
+                theta = numpy.arccos(numpy.minimum(d, 1.))
+                s = numpy.sin(theta)
+                linear = d > .9995
+                s = numpy.where(linear, 1., s)
+                s0 = numpy.where(linear, 1. - t, numpy.sin((1. - t) * theta) / s)
+                s1 = numpy.where(linear, t, numpy.sin(t * theta) / s)
+                r = s0 * q + s1 * o
+            else:
+                r = q + t * (o - q)
+            r /= numpy.sqrt(numpy.einsum("ij,ij->i", r, r))[:, None]
+            q[...] = r
+            return self
+        func = quat._slerp if spherical else quat._nlerp
+        ret = array("d")
+        for x, y, z, w, ox, oy, oz, ow, ti in zip(*self._components(), *self._operand_components(other),
+                                                  repeat(float(t)) if tools.is_number(t) else t):
+            ret.extend(func(x, y, z, w, ox, oy, oz, ow, float(ti)))
+        self.data[:] = ret
+        return self
+
+    def _multiply(self, l, r):
+        """Returns the storage of the quaternion product l * r,
+        where one of them is self and the other a quat or quat_array"""
+        if _is_ndarray(self.data):
+            l, r = self._numpy_operand(l), self._numpy_operand(r)
+            x, y, z, w = l[..., 0], l[..., 1], l[..., 2], l[..., 3]
+            ox, oy, oz, ow = r[..., 0], r[..., 1], r[..., 2], r[..., 3]
+            return numpy.stack((x * ow + w * ox + y * oz - z * oy,
+                                w * oy - x * oz + y * ow + z * ox,
+                                w * oz + x * oy - y * ox + z * ow,
+                                w * ow - x * ox - y * oy - z * oz), axis=-1)
+        ret = array("d")
+        for x, y, z, w, ox, oy, oz, ow in zip(*self._operand_components(l),
+                                              *self._operand_components(r)):
+            ret.extend((x * ow + w * ox + y * oz - z * oy,
+                        w * oy - x * oz + y * ow + z * ox,
+                        w * oz + x * oy - y * ox + z * ow,
+                        w * ow - x * ox - y * oy - z * oz))
+        return ret
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,6 +1,14 @@
+import os
+
 
 def is_number(arg):
     """Return True when arg is convertible to float, False otherwise"""
+    # common types without the cost of a raised exception
+    t = type(arg)
+    if t is float or t is int:
+        return True
+    if t is tuple or t is list:
+        return False
     try:
         float(arg)
         return True
@@ -26,7 +34,7 @@ def check_float_number(arg):
         raise TypeError("Expected float, got %s" % type(arg))
 
 
-def check_float_sequence(arg, expect_len=None):
+def _check_float_sequence(arg, expect_len=None):
     # see if sequence
     try:
         l = len(arg)
@@ -41,3 +49,28 @@ def check_float_sequence(arg, expect_len=None):
             float(i)
     except:
         raise TypeError("Expected sequence of floats, got %s - %s" % (type(arg), str(arg)))
+
+
+def _no_check_float_sequence(arg, expect_len=None):
+    pass
+
+
+def set_checks(enabled):
+    """
+    Enables or disables the validation of arguments in all pector functions.
+    Without checks, wrong arguments lead to undefined results or arbitrary exceptions.
+    The initial state is disabled when python runs with -O
+    or when the environment variable PECTOR_CHECKS is set to 0, enabled otherwise
+    :param enabled: bool
+    :return: None
+    """
+    global check_float_sequence
+    check_float_sequence = _check_float_sequence if enabled else _no_check_float_sequence
+
+
+def checks_enabled():
+    """Returns True if argument validation is enabled"""
+    return check_float_sequence is _check_float_sequence
+
+
+set_checks(__debug__ and not os.environ.get("PECTOR_CHECKS", "1") == "0")
@@ -0,0 +1,205 @@
+"""
+Keyframe animation tracks
+"""
+import math
+from array import array
+from bisect import bisect_right
+from . import tools
+from .vec_base import vec_base
+from .array_base import array_base
+from .quat import quat
+
+
+class track:
+    """
+    Keyframe animation track of numbers, pector vectors or quaternions.
+    The polynomial coefficients of each segment are computed once in the constructor,
+    so sampling only finds the segment and evaluates a cubic per component.
+    The last segment is remembered, sampling with monotonic time does not search.
+    Before the first and after the last key the track holds the key value.
+    Interpolation modes:
+        "linear":      straight lines between the keys
+        "catmull_rom": smooth curve through all keys
+        "bezier":      cubic bezier segments with two control points each
+        "slerp":       spherical linear interpolation of quaternions
+    >>> t = track((0., 1., 3.), (vec3(0), vec3(1,2,3), vec3(3)))
+    >>> t.sample(.5)
+    vec3(0.5, 1, 1.5)
+    >>> t.sample(2.)
+    vec3(2, 2.5, 3)
+    """
+
+    __slots__ = ("times", "mode", "cls", "size", "_inv_durations", "_coeffs", "_cursor")
+
+    MODES = ("linear", "catmull_rom", "bezier", "slerp")
+
+    def __init__(self, times, values, mode="linear", controls=None):
+        """
+        :param times: increasing float sequence, one time per key
+        :param values: the key values, numbers or pector vectors of one type
+        :param mode: one of track.MODES, "slerp" requires quat values
+        :param controls: for "bezier" the two control points of each segment,
+        e.g. (out0, in1, out1, in2, ...), other modes ignore it
+        """
+        if mode not in self.MODES:
+            raise ValueError("Unknown interpolation mode '%s', expected one of %s" % (mode, self.MODES))
+        if not len(times) == len(values) or not len(times):
+            raise ValueError("Expected the same non-zero number of times and values, got %d and %d" % (
+                                len(times), len(values)))
+        self.times = array("d", [float(x) for x in times])
+        for i in range(1, len(self.times)):
+            if not self.times[i] > self.times[i-1]:
+                raise ValueError("Expected increasing times, got %g after %g" % (self.times[i], self.times[i-1]))
+        self.mode = mode
+        if tools.is_number(values[0]):
+            self.cls = None
+            keys = [(float(x),) for x in values]
+        else:
+            self.cls = type(values[0])
+            if not issubclass(self.cls, vec_base):
+                raise TypeError("Expected numbers or pector vectors as values, got %s" % self.cls.__name__)
+            keys = [tuple(self.cls(x).v) for x in values]
+        if mode == "slerp" and not self.cls is quat:
+            raise TypeError("slerp requires quat values")
+        self.size = len(keys[0])
+        self._inv_durations = array("d", [1. / (self.times[i+1] - self.times[i])
+                                          for i in range(len(self.times) - 1)])
+        if mode == "slerp":
+            self._coeffs = [self._slerp_coeffs(keys[i], keys[i+1]) for i in range(len(keys) - 1)]
+        elif mode == "catmull_rom":
+            self._coeffs = [self._catmull_rom_coeffs(keys[max(0, i-1)], keys[i], keys[i+1],
+                                                     keys[min(len(keys) - 1, i+2)])
+                            for i in range(len(keys) - 1)]
+        elif mode == "bezier":
+            if controls is None or not len(controls) == 2 * (len(keys) - 1):
+                raise ValueError("Expected two bezier controls per segment, e.g. %d" % (2 * (len(keys) - 1)))
+            controls = [tuple(float(x) for x in c) if self.cls else (float(c),) for c in controls]
+            for c in controls:
+                if not len(c) == self.size:
+                    raise TypeError("Expected controls of length %d, got %d" % (self.size, len(c)))
+            self._coeffs = [self._bezier_coeffs(keys[i], controls[2*i], controls[2*i+1], keys[i+1])
+                            for i in range(len(keys) - 1)]
+        else:
+            self._coeffs = [tuple((a, b - a, 0., 0.) for a, b in zip(keys[i], keys[i+1]))
+                            for i in range(len(keys) - 1)]
+        # the values outside of the time range
+        self._coeffs.insert(0, tuple((a, 0., 0., 0.) for a in keys[0]))
+        self._coeffs.append(tuple((a, 0., 0., 0.) for a in keys[-1]))
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def __str__(self):
+        return "track(%s, %d keys, %g - %g)" % (self.mode, len(self.times), self.times[0], self.times[-1])
+
+    def __repr__(self):
+        return self.__str__()
+
+    # --- coefficients ---
+
+    @staticmethod
+    def _catmull_rom_coeffs(p0, p1, p2, p3):
+        """Returns the cubic coefficients for each component of the segment p1 to p2"""
+        return tuple((b, .5 * (c - a), a - 2.5 * b + 2. * c - .5 * d, .5 * (d - a) + 1.5 * (b - c))
+                     for a, b, c, d in zip(p0, p1, p2, p3))
+
+    @staticmethod
+    def _bezier_coeffs(p0, c0, c1, p1):
+        """Returns the cubic coefficients for each component of the segment p0 to p1"""
+        return tuple((a, 3. * (b - a), 3. * (a - 2. * b + c), d - a + 3. * (b - c))
+                     for a, b, c, d in zip(p0, c0, c1, p1))
+
+    @staticmethod
+    def _slerp_coeffs(q0, q1):
+        """Returns (q0, q1 on the shorter arc, angle, 1 / sin(angle)), angle is 0 for nlerp"""
+        d = sum(a * b for a, b in zip(q0, q1))
+        if d < 0.:
+            d = -d
+            q1 = tuple(-x for x in q1)
+        if d > .9995:
+            return q0, q1, 0., 0.
+        theta = math.acos(d)
+        return q0, q1, theta, 1. / math.sin(theta)
+
+    # --- sampling ---
+
+    def _segment(self, t):
+        """Returns the index into self._coeffs and the local time 0. - 1."""
+        times = self.times
+        c = self._cursor
+        # the cached segment and the next one cover monotonic time
+        if 0 < c < len(times) and times[c-1] <= t < times[c]:
+            return c, (t - times[c-1]) * self._inv_durations[c-1]
+        if (c == len(times) and t >= times[-1]) or (c == 0 and t < times[0]):
+            return c, 0.
+        if 0 < c + 1 < len(times) and times[c] <= t < times[c+1]:
+            self._cursor = c + 1
+            return c + 1, (t - times[c]) * self._inv_durations[c]
+        c = bisect_right(times, t)
+        self._cursor = c
+        if c == 0 or c == len(times):
+            return c, 0.
+        return c, (t - times[c-1]) * self._inv_durations[c-1]
+
+    def _values(self, t):
+        """Returns the sampled components as tuple"""
+        seg, u = self._segment(float(t))
+        coeffs = self._coeffs[seg]
+        if self.mode == "slerp" and 0 < seg < len(self.times):
+            (x, y, z, w), (ox, oy, oz, ow), theta, s = coeffs
+            if theta == 0.:
+                return quat._nlerp(x, y, z, w, ox, oy, oz, ow, u)
+            s0 = math.sin((1. - u) * theta) * s
+            s1 = math.sin(u * theta) * s
+            return s0 * x + s1 * ox, s0 * y + s1 * oy, s0 * z + s1 * oz, s0 * w + s1 * ow
+        return tuple(a + u * (b + u * (c + u * d)) for a, b, c, d in coeffs)
+
+    def sample(self, t, out=None):
+        """
+        Returns the value of the track at time t
+        :param t: float, the time
+        :param out: optional vector of the value type that receives the result
+        :return: float, new vector or out
+        >>> track((0., 1.), (quat(), quat((0,0,1), 90)), "slerp").sample(.5).round(6)
+        quat(0, 0, 0.382683, 0.92388)
+        """
+        r = self._values(t)
+        if self.cls is None:
+            return r[0]
+        return self.cls._new_into(r, out)
+
+
+def sample_tracks(tracks, t, out=None):
+    """
+    Samples all tracks at time t into one flat float buffer,
+    the values of each track are written one after another
+    :param tracks: sequence of track
+    :param t: float, the time
+    :param out: optional writable float64 buffer, e.g. array('d'), numpy.ndarray or a pector array,
+    of length sum(track.size)
+    :return: out, or a new array('d')
+    >>> sample_tracks([track((0., 2.), (0., 1.)), track((0., 2.), (vec3(0), vec3(2)))], 1.)
+    array('d', [0.5, 1.0, 1.0, 1.0])
+    """
+    size = sum(tr.size for tr in tracks)
+    if out is None:
+        out = array("d", bytes(8 * size))
+    flat = out._flat() if isinstance(out, array_base) else memoryview(out)
+    if not flat.format == "d":
+        flat = flat.cast("B").cast("d")
+    if not len(flat) == size:
+        raise ValueError("Expected output of length %d, got %d" % (size, len(flat)))
+    pos = 0
+    for tr in tracks:
+        flat[pos:pos + tr.size] = array("d", tr._values(t))
+        pos += tr.size
+    return out
+
+
+if __name__ == "__main__":
+    import doctest
+    import importlib
+    from pector import vec3
+    # the module as imported by pector, the quat and vec3 of the examples are those of the package
+    doctest.testmod(importlib.import_module("pector.track"), extraglobs={"vec3": vec3})
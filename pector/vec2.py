@@ -1,7 +1,8 @@
 import math
+from array import array
 
 from . import tools, const
-from .vec_base import vec_base
+from .vec_base import vec_base, _store
 
 
 class vec2(vec_base):
@@ -13,6 +14,18 @@ class vec2(vec_base):
     typically of length 2 as well.
     """
 
+    __slots__ = ()
+
+    @classmethod
+    def from_xy(cls, x, y):
+        """
+        Creates a vec2 from two numbers without the argument parsing of the constructor
+        :return: vec2
+        >>> vec2.from_xy(1, 2)
+        vec2(1, 2)
+        """
+        return cls._new(array("d", (x, y)))
+
     def __str__(self):
         return "vec2(%g, %g)" % (self.v[0], self.v[1])
 
@@ -49,7 +62,10 @@ class vec2(vec_base):
         vec2(2, 1)
         """
         tools.check_float_sequence(norm, 2)
-        self.set(self - vec3(norm) * self.dot(norm) * 2.)
+        nx, ny = float(norm[0]), float(norm[1])
+        x, y = self.v
+        d = (x * nx + y * ny) * 2.
+        _store(self.v, (x - nx * d, y - ny * d))
         return self
 
     def rotate_z(self, degree):
@@ -58,7 +74,7 @@ class vec2(vec_base):
         :param degree: the degrees [0., 360.]
         :return: self
         >>> vec2((1,2)).rotate_z(90).round()
-        vec3(-2, 1)
+        vec2(-2, 1)
         """
         degree *= const.DEG_TO_TWO_PI
         sa = math.sin(degree)
@@ -71,26 +87,32 @@ class vec2(vec_base):
 
     # --- value-copying methods ---
 
-    def reflected(self, norm):
+    def reflected(self, norm, out=None):
         """
         Returns the this vector reflected on a plane with given normal
         :param norm: float sequence of length 2
-        :return: self
+        :param out: optional vec2 that receives the result
+        :return: new vec2 or out
         Example: suppose ray coming from top-left, going down on a flat plane
-        >>> vec3(2,-1).reflected((0,1)).rounded()
-        vec3(2, 1)
+        >>> vec2(2,-1).reflected((0,1)).rounded()
+        vec2(2, 1)
         """
-        return self.copy().reflect(norm)
+        tools.check_float_sequence(norm, 2)
+        nx, ny = float(norm[0]), float(norm[1])
+        x, y = self.v
+        d = (x * nx + y * ny) * 2.
+        return self._new_into((x - nx * d, y - ny * d), out)
 
-    def rotated_z(self, degree):
+    def rotated_z(self, degree, out=None):
         """
         Returns this vector rotated around the z-axis
         :param degree: the degrees [0., 360.]
-        :return: vec2
+        :param out: optional vec2 that receives the result
+        :return: vec2 or out
         >>> vec2((1,2)).rotated_z(90).rounded()
-        vec3(-2, 1)
+        vec2(-2, 1)
         """
-        return self.copy().rotate_z(degree)
+        return self._copy_into(out).rotate_z(degree)
 
 
 
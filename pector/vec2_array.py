@@ -0,0 +1,84 @@
+import math
+import operator
+from array import array
+from itertools import repeat
+from . import const
+from .array_base import array_base, _is_ndarray, numpy
+from .vec2 import vec2
+
+
+class vec2_array(array_base):
+    """
+    Contiguous array of vec2.
+    It behaves like a list of vec2, where the elements are views into the array
+    >>> vec2_array([(1,2), (3,4)]) * 2
+    vec2_array([vec2(2, 4), vec2(6, 8)])
+    """
+
+    __slots__ = ()
+
+    element = vec2
+
+    # ------ inplace methods -------
+
+    def reflect(self, norm):
+        """
+        Reflects each element on a line with given normal, INPLACE
+        :param norm: float sequence of length 2 or vec2_array of same length
+        :return: self
+        >>> vec2_array([(2,-1)]).reflect((0,1))
+        vec2_array([vec2(2, 1)])
+        """
+        d = self.dot(norm)
+        if _is_ndarray(self.data):
+            self.data -= (d * 2.)[:, None] * self._numpy_operand(norm)
+            return self
+        d = array("d", map(operator.mul, d, repeat(2.)))
+        mul, sub = operator.mul, operator.sub
+        self._set_components([map(sub, c, map(mul, d, n))
+                              for c, n in zip(self._components(), self._operand_components(norm))])
+        return self
+
+    def rotate_z(self, degree):
+        """
+        Rotates each element around the z-axis, INPLACE
+        :param degree: the degrees [0., 360.]
+        :return: self
+        >>> vec2_array([(1,2)]).rotate_z(90).round()
+        vec2_array([vec2(-2, 1)])
+        """
+        degree *= const.DEG_TO_TWO_PI
+        sa = math.sin(degree)
+        ca = math.cos(degree)
+        if _is_ndarray(self.data):
+            x = self.data[:, 0].copy()
+            self.data[:, 0] = x * ca - self.data[:, 1] * sa
+            self.data[:, 1] = x * sa + self.data[:, 1] * ca
+            return self
+        x, y = self._components()
+        self._set_components(([a * ca - b * sa for a, b in zip(x, y)],
+                              [a * sa + b * ca for a, b in zip(x, y)]))
+        return self
+
+    # --- value-copying methods ---
+
+    def reflected(self, norm):
+        """
+        Returns each element reflected on a line with given normal
+        :param norm: float sequence of length 2 or vec2_array of same length
+        :return: vec2_array
+        """
+        return self.copy().reflect(norm)
+
+    def rotated_z(self, degree):
+        """
+        Returns each element rotated around the z-axis
+        :param degree: the degrees [0., 360.]
+        :return: vec2_array
+        """
+        return self.copy().rotate_z(degree)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,7 +1,8 @@
 import math
+from array import array
 
 from . import tools, const
-from .vec_base import vec_base
+from .vec_base import vec_base, _store
 
 
 class vec3(vec_base):
@@ -13,6 +14,18 @@ class vec3(vec_base):
     typically of length 3 as well.
     """
 
+    __slots__ = ()
+
+    @classmethod
+    def from_xyz(cls, x, y, z):
+        """
+        Creates a vec3 from three numbers without the argument parsing of the constructor
+        :return: vec3
+        >>> vec3.from_xyz(1, 2, 3)
+        vec3(1, 2, 3)
+        """
+        return cls._new(array("d", (x, y, z)))
+
     def __str__(self):
         return "vec3(%g, %g, %g)" % (self.v[0], self.v[1], self.v[2])
 
@@ -107,7 +120,33 @@ class vec3(vec_base):
         vec3(2, 1, 0)
         """
         tools.check_float_sequence(norm, 3)
-        self.set(self - vec3(norm) * self.dot(norm) * 2.)
+        nx, ny, nz = float(norm[0]), float(norm[1]), float(norm[2])
+        x, y, z = self.v
+        d = (x * nx + y * ny + z * nz) * 2.
+        _store(self.v, (x - nx * d, y - ny * d, z - nz * d))
+        return self
+
+    def length(self):
+        """
+        Returns cartesian length of vector, unrolled
+        :return: float
+        >>> vec3((5,0,0)).length()
+        5.0
+        """
+        x, y, z = self.v
+        return math.sqrt(x * x + y * y + z * z)
+
+    def normalize(self):
+        """
+        Normalizes the vector, e.g. makes it length 1, INPLACE, unrolled
+        :return: self
+        >>> vec3((1,1,0)).normalize()
+        vec3(0.707107, 0.707107, 0)
+        """
+        v = self.v
+        x, y, z = v
+        l = math.sqrt(x * x + y * y + z * z)
+        v[0], v[1], v[2] = x / l, y / l, z / l
         return self
 
     def rotate_x(self, degree):
@@ -190,12 +229,13 @@ class vec3(vec_base):
 
     # --- value-copying methods ---
 
-    def crossed(self, arg3):
+    def crossed(self, arg3, out=None):
         """
         Returns the cross-product of this vector and arg3
         The cross product is always perpendicular to the plane described by the two vectors
         :param arg3: float sequence of length 3
-        :return: self
+        :param out: optional vec3 that receives the result
+        :return: new vec3 or out
         >>> vec3((1,0,0)).crossed((0,1,0))
         vec3(0, 0, 1)
         >>> vec3((1,0,0)).crossed((0,0,1))
@@ -203,59 +243,75 @@ class vec3(vec_base):
         >>> vec3((0,1,0)).crossed((0,0,1))
         vec3(1, 0, 0)
         """
-        return self.copy().cross(arg3)
+        if type(arg3) is not vec3:
+            tools.check_float_sequence(arg3)
+        x, y, z = self.v
+        return self._new_into((y * arg3[2] - z * arg3[1],
+                               z * arg3[0] - x * arg3[2],
+                               x * arg3[1] - y * arg3[0]), out)
 
-    def reflected(self, norm):
+    def reflected(self, norm, out=None):
         """
         Returns the this vector reflected on a plane with given normal
         :param norm: float sequence of length 3
-        :return: self
+        :param out: optional vec3 that receives the result
+        :return: new vec3 or out
         Example: suppose ray coming from top-left, going down on a flat plane
         >>> vec3((2,-1,0)).reflected((0,1,0)).rounded()
         vec3(2, 1, 0)
         """
-        return self.copy().reflect(norm)
+        tools.check_float_sequence(norm, 3)
+        nx, ny, nz = float(norm[0]), float(norm[1]), float(norm[2])
+        x, y, z = self.v
+        d = (x * nx + y * ny + z * nz) * 2.
+        return self._new_into((x - nx * d, y - ny * d, z - nz * d), out)
 
-    def rotated_x(self, degree):
+    def rotated_x(self, degree, out=None):
         """
         Returns this vector rotated around the x-axis
         :param degree: the degrees [0., 360.]
-        :return: vec3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
         >>> vec3((1,2,3)).rotated_x(90).rounded()
         vec3(1, -3, 2)
         """
-        return self.copy().rotate_x(degree)
+        return self._copy_into(out).rotate_x(degree)
 
-    def rotated_y(self, degree):
+    def rotated_y(self, degree, out=None):
         """
         Returns this vector rotated around the y-axis
         :param degree: the degrees [0., 360.]
-        :return: vec3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
         >>> vec3((1,2,3)).rotated_y(90).rounded()
         vec3(3, 2, -1)
         """
-        return self.copy().rotate_y(degree)
+        return self._copy_into(out).rotate_y(degree)
 
-    def rotated_z(self, degree):
+    def rotated_z(self, degree, out=None):
         """
         Returns this vector rotated around the z-axis
         :param degree: the degrees [0., 360.]
-        :return: vec3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
         >>> vec3((1,2,3)).rotated_z(90).rounded()
         vec3(-2, 1, 3)
         """
-        return self.copy().rotate_z(degree)
+        return self._copy_into(out).rotate_z(degree)
 
-    def rotated_axis(self, axis, degree):
+    def rotated_axis(self, axis, degree, out=None):
         """
         Returns this vector rotated around an arbitrary axis
         :param axis: float sequence of length 3
         :param degree: the degrees [0., 360.]
-        :return: vec3
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
         >>> vec3(1,2,3).rotated_axis((1,0,0), 90) == vec3(1,2,3).rotated_x(90)
         True
         """
-        return self.copy().rotate_axis(axis, degree)
+        if out is axis:
+            axis = tuple(axis)
+        return self._copy_into(out).rotate_axis(axis, degree)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import operator
+from array import array
+from itertools import repeat
+from .array_base import array_base, _is_ndarray, numpy
+from .vec3 import vec3
+
+
+class vec3_array(array_base):
+    """
+    Contiguous array of vec3.
+    It behaves like a list of vec3, where the elements are views into the array
+    >>> a = vec3_array([(1,2,3), (4,5,6)])
+    >>> a[1].x = 7
+    >>> a + 1
+    vec3_array([vec3(2, 3, 4), vec3(8, 6, 7)])
+    """
+
+    __slots__ = ()
+
+    element = vec3
+
+    # ------ inplace methods -------
+
+    def cross(self, arg3):
+        """
+        Makes each element the cross-product of the element and arg3, INPLACE
+        :param arg3: float sequence of length 3 or vec3_array of same length
+        :return: self
+        >>> vec3_array([(1,0,0), (0,1,0)]).cross((0,0,1))
+        vec3_array([vec3(0, -1, 0), vec3(1, 0, 0)])
+        """
+        if _is_ndarray(self.data):
+            self.data[...] = numpy.cross(self.data, self._numpy_operand(arg3))
+            return self
+        x, y, z = self._components()
+        ox, oy, oz = self._operand_components(arg3)
+        mul, sub = operator.mul, operator.sub
+        self._set_components((map(sub, map(mul, y, oz), map(mul, z, oy)),
+                              map(sub, map(mul, z, ox), map(mul, x, oz)),
+                              map(sub, map(mul, x, oy), map(mul, y, ox))))
+        return self
+
+    def reflect(self, norm):
+        """
+        Reflects each element on a plane with given normal, INPLACE
+        :param norm: float sequence of length 3 or vec3_array of same length
+        :return: self
+        >>> vec3_array([(2,-1,0)]).reflect((0,1,0))
+        vec3_array([vec3(2, 1, 0)])
+        """
+        d = self.dot(norm)
+        if _is_ndarray(self.data):
+            self.data -= (d * 2.)[:, None] * self._numpy_operand(norm)
+            return self
+        d = array("d", map(operator.mul, d, repeat(2.)))
+        mul, sub = operator.mul, operator.sub
+        self._set_components([map(sub, c, map(mul, d, n))
+                              for c, n in zip(self._components(), self._operand_components(norm))])
+        return self
+
+    def rotate_axis(self, axis, degree):
+        """
+        Rotates each element around an arbitrary axis, INPLACE
+        :param axis: float sequence of length 3
+        :param degree: the degrees [0., 360.]
+        :return: self
+        >>> vec3_array([(1,2,3)]).rotate_axis((1,0,0), 90)[0] == vec3((1,2,3)).rotate_x(90)
+        True
+        """
+        from .mat3 import mat3
+        mat3().set_rotate_axis(vec3(axis).normalize(), degree).transform_vectors(self)
+        return self
+
+    # --- value-copying methods ---
+
+    def crossed(self, arg3):
+        """
+        Returns the cross-product of each element and arg3
+        :param arg3: float sequence of length 3 or vec3_array of same length
+        :return: vec3_array
+        """
+        return self.copy().cross(arg3)
+
+    def reflected(self, norm):
+        """
+        Returns each element reflected on a plane with given normal
+        :param norm: float sequence of length 3 or vec3_array of same length
+        :return: vec3_array
+        """
+        return self.copy().reflect(norm)
+
+    def rotated_axis(self, axis, degree):
+        """
+        Returns each element rotated around an arbitrary axis
+        :param axis: float sequence of length 3
+        :param degree: the degrees [0., 360.]
+        :return: vec3_array
+        """
+        return self.copy().rotate_axis(axis, degree)
+
+
+if __name__ == "__main__":
+    import doctest
+    import importlib
+    # the module as imported by pector, the matrices check for that vec3_array class
+    doctest.testmod(importlib.import_module("pector.vec3_array"))
@@ -0,0 +1,126 @@
+from array import array
+
+from .vec_base import vec_base, _store
+from .vec3 import vec3
+
+
+class vec4(vec_base):
+    """
+    Class vec4 implementation.
+    It behaves like a list of floats of length 4
+    Arguments to member functions can be any list-like objects,
+    containing float-convertible elements,
+    typically of length 4 as well.
+    Used as homogeneous coordinates, w is 1 for points and 0 for directions
+    >>> vec4(vec3(1,2,3), 1)
+    vec4(1, 2, 3, 1)
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_xyzw(cls, x, y, z, w):
+        """
+        Creates a vec4 from four numbers without the argument parsing of the constructor
+        :return: vec4
+        >>> vec4.from_xyzw(1, 2, 3, 4)
+        vec4(1, 2, 3, 4)
+        """
+        return cls._new(array("d", (x, y, z, w)))
+
+    def __str__(self):
+        return "vec4(%g, %g, %g, %g)" % (self.v[0], self.v[1], self.v[2], self.v[3])
+
+    # ---- x,y,z,w properties ----
+
+    @property
+    def x(self):
+        return self.v[0]
+    @x.setter
+    def x(self, arg):
+        self.v[0] = float(arg)
+
+    @property
+    def y(self):
+        return self.v[1]
+    @y.setter
+    def y(self, arg):
+        self.v[1] = float(arg)
+
+    @property
+    def z(self):
+        return self.v[2]
+    @z.setter
+    def z(self, arg):
+        self.v[2] = float(arg)
+
+    @property
+    def w(self):
+        return self.v[3]
+    @w.setter
+    def w(self, arg):
+        self.v[3] = float(arg)
+
+    # --- list-like ---
+
+    def __len__(self):
+        return 4
+
+    # ------- getter -------
+
+    def xyz(self, out=None):
+        """
+        Returns the first three components, without the divide by w
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
+        >>> vec4(1,2,3,4).xyz()
+        vec3(1, 2, 3)
+        """
+        v = self.v
+        return vec3._new_into((v[0], v[1], v[2]), out)
+
+    def projected(self, out=None):
+        """
+        Returns the point after the perspective divide, e.g. x/w, y/w, z/w
+        Raises ZeroDivisionError if w is 0
+        :param out: optional vec3 that receives the result
+        :return: vec3 or out
+        >>> vec4(2,4,6,2).projected()
+        vec3(1, 2, 3)
+        """
+        x, y, z, w = self.v
+        w = 1. / w
+        return vec3._new_into((x * w, y * w, z * w), out)
+
+    # ------ inplace methods -------
+
+    def homogenize(self):
+        """
+        Divides all components by w, INPLACE
+        Raises ZeroDivisionError if w is 0
+        :return: self
+        >>> vec4(2,4,6,2).homogenize()
+        vec4(1, 2, 3, 1)
+        """
+        x, y, z, w = self.v
+        w = 1. / w
+        _store(self.v, (x * w, y * w, z * w, 1.))
+        return self
+
+    # --- value-copying methods ---
+
+    def homogenized(self, out=None):
+        """
+        Returns the vector with all components divided by w
+        Raises ZeroDivisionError if w is 0
+        :param out: optional vec4 that receives the result
+        :return: vec4 or out
+        >>> vec4(2,4,6,2).homogenized()
+        vec4(1, 2, 3, 1)
+        """
+        return self._copy_into(out).homogenize()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,87 @@
+import operator
+from array import array
+from .array_base import array_base, _is_ndarray, numpy
+from .vec4 import vec4
+from .vec3_array import vec3_array
+
+
+class vec4_array(array_base):
+    """
+    Contiguous array of vec4, e.g. homogeneous coordinates in clip space.
+    It behaves like a list of vec4, where the elements are views into the array
+    >>> vec4_array([(2,4,6,2), (1,2,3,0)]) * 2
+    vec4_array([vec4(4, 8, 12, 4), vec4(2, 4, 6, 0)])
+    """
+
+    __slots__ = ()
+
+    element = vec4
+
+    # ------- getter -------
+
+    def xyz(self):
+        """
+        Returns the first three components of each element, without the divide by w
+        :return: vec3_array
+        >>> vec4_array([(1,2,3,4)]).xyz()
+        vec3_array([vec3(1, 2, 3)])
+        """
+        if _is_ndarray(self.data):
+            return vec3_array._new(self.data[:, :3].copy())
+        x, y, z, w = self._components()
+        return vec3_array._from_components((x, y, z), len(self))
+
+    def projected(self):
+        """
+        Returns each element after the perspective divide, e.g. x/w, y/w, z/w
+        Raises ZeroDivisionError if a w is 0
+        :return: vec3_array
+        >>> vec4_array([(2,4,6,2), (1,2,3,1)]).projected()
+        vec3_array([vec3(1, 2, 3), vec3(1, 2, 3)])
+        """
+        if _is_ndarray(self.data):
+            w = self.data[:, 3:4]
+            if not w.all():
+                raise ZeroDivisionError("float division by zero")
+            return vec3_array._new(self.data[:, :3] / w)
+        x, y, z, w = self._components()
+        w = array("d", map(operator.truediv, [1.] * len(w), w))
+        mul = operator.mul
+        return vec3_array._from_components((map(mul, x, w), map(mul, y, w), map(mul, z, w)), len(self))
+
+    # ------ inplace methods -------
+
+    def homogenize(self):
+        """
+        Divides all components of each element by its w, INPLACE
+        Raises ZeroDivisionError if a w is 0
+        :return: self
+        >>> vec4_array([(2,4,6,2)]).homogenize()
+        vec4_array([vec4(1, 2, 3, 1)])
+        """
+        if _is_ndarray(self.data):
+            w = self.data[:, 3:4].copy()
+            if not w.all():
+                raise ZeroDivisionError("float division by zero")
+            self.data /= w
+            return self
+        x, y, z, w = self._components()
+        w = array("d", map(operator.truediv, [1.] * len(w), w))
+        mul = operator.mul
+        self._set_components((map(mul, x, w), map(mul, y, w), map(mul, z, w), [1.] * len(w)))
+        return self
+
+    # --- value-copying methods ---
+
+    def homogenized(self):
+        """
+        Returns each element with all components divided by its w
+        Raises ZeroDivisionError if a w is 0
+        :return: vec4_array
+        """
+        return self.copy().homogenize()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -1,10 +1,36 @@
 import math
+import sys
+from array import array
 from . import tools, const
+from .array_base import array_base
 
 """
 Abstract base class for vectors and matrices
 """
 
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _store(o, v):
+    """
+    Writes the values v into the array o of the same length.
+    The common lengths are unrolled, so no temporary array is created
+    """
+    n = len(o)
+    if n == 3:
+        o[0], o[1], o[2] = v
+    elif n == 4:
+        o[0], o[1], o[2], o[3] = v
+    elif n == 16:
+        (o[0], o[1], o[2], o[3], o[4], o[5], o[6], o[7],
+         o[8], o[9], o[10], o[11], o[12], o[13], o[14], o[15]) = v
+    elif n == 9:
+        o[0], o[1], o[2], o[3], o[4], o[5], o[6], o[7], o[8] = v
+    elif n == 2:
+        o[0], o[1] = v
+    else:
+        o[:] = v if type(v) is array else array("d", v)
+
 
 class vec_base:
     """
@@ -13,13 +39,69 @@ class vec_base:
     Arguments to member functions can be any list-like objects,
     containing float-convertible elements,
     typically of same size as self.
+    The values are stored in a fixed-size array('d') in self.v,
+    which is allocated once and then only written INPLACE.
     """
 
+    __slots__ = ("v",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # each concrete class returns a constant from __len__
+        # and gets arithmetic operators unrolled for that size
+        if "__len__" in cls.__dict__:
+            _create_operators(cls, cls.__len__(None))
+
     def __init__(self, *arg):
-        if not arg:
-            self.v = [0. for i in range(len(self))]
-            return
-        self.set(*arg)
+        if len(arg) == 1:
+            t = type(arg[0])
+            if t is float or t is int:
+                self.v = array("d", arg * len(self))
+                return
+        self.v = array("d", (0.,)) * len(self)
+        if arg:
+            self.set(*arg)
+
+    @classmethod
+    def _new(cls, v):
+        """
+        Creates an instance that uses v as storage, bypassing __init__ and set().
+        No checks and no copying, v must be an array('d') of the correct length
+        :return: new instance
+        """
+        self = object.__new__(cls)
+        self.v = v
+        return self
+
+    @classmethod
+    def _new_into(cls, v, out):
+        """
+        Returns a new instance with the values v, or out with the values v, for the out= parameters.
+        The values are written into out directly, without a temporary array
+        :param v: tuple or other sequence of the values, of the correct length
+        :return: new instance or out
+        """
+        if out is None:
+            self = object.__new__(cls)
+            self.v = array("d", v)
+            return self
+        if not isinstance(out, cls):
+            raise TypeError("Expected %s as output, got %s" % (cls.__name__, type(out).__name__))
+        _store(out.v, v)
+        return out
+
+    def _copy_into(self, out):
+        """
+        Returns a copy of self, or out with the values of self, for the out= parameters.
+        :return: new instance or out
+        """
+        if out is None:
+            return self._new(array("d", self.v))
+        if out is not self:
+            if not isinstance(out, self.__class__):
+                raise TypeError("Expected %s as output, got %s" % (self.__class__.__name__, type(out).__name__))
+            out.v[:] = self.v
+        return out
 
     def __str__(self):
         return "vec_base(len=%d)" % len(self)
@@ -44,6 +126,66 @@ class vec_base:
     def __contains__(self, item):
         return item in self.v
 
+    # --- buffer protocol ---
+
+    def __buffer__(self, flags):
+        """Python 3.12+ buffer protocol, e.g. memoryview(v) or numpy.asarray(v) without copying"""
+        return memoryview(self.v)
+
+    def as_buffer(self, format="d"):
+        """
+        Returns the values as flat buffer without building intermediate lists.
+        For float64 the memoryview shares the memory with this instance,
+        for float32 the values are copied once
+        :param format: "d" for float64 or "f" for float32
+        :return: memoryview
+        >>> vec3(1,2,3).as_buffer().tolist()
+        [1.0, 2.0, 3.0]
+        >>> vec3(1,2,3).as_buffer("f").nbytes
+        12
+        """
+        if format == "d":
+            return memoryview(self.v)
+        if format == "f":
+            return memoryview(array("f", self.v))
+        raise ValueError("Expected format 'd' or 'f', got '%s'" % format)
+
+    # --- serialization ---
+
+    def to_bytes(self):
+        """
+        Returns the values as packed little-endian float64
+        :return: bytes of length 8 * len(self)
+        >>> len(vec3(1,2,3).to_bytes())
+        24
+        """
+        if _BIG_ENDIAN:
+            v = array("d", self.v)
+            v.byteswap()
+            return v.tobytes()
+        return bytes(self.v)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates an instance from packed little-endian float64, e.g. the result of to_bytes()
+        :param data: bytes-like object of length 8 * len(cls)
+        :return: new instance
+        >>> vec3.from_bytes(vec3(1,2,3).to_bytes())
+        vec3(1, 2, 3)
+        """
+        v = array("d")
+        v.frombytes(data)
+        if not len(v) == cls.__len__(None):
+            raise ValueError("Expected %d bytes for %s, got %d" % (8 * cls.__len__(None), cls.__name__, len(data)))
+        if _BIG_ENDIAN:
+            v.byteswap()
+        return cls._new(v)
+
+    def __reduce__(self):
+        """Pickles the packed values, also for views into pector arrays"""
+        return self.from_bytes, (self.to_bytes(),)
+
     # --- boolean equality ---
 
     def __eq__(self, other):
@@ -58,7 +200,10 @@ class vec_base:
         >>> vec3(1,1,1) == 1
         True
         """
-        if tools.is_number(other):
+        t = type(other)
+        if t is self.__class__:
+            return self.v == other.v
+        if t is float or t is int or tools.is_number(other):
             for i in range(len(self)):
                 if not self.v[i] == other:
                     return False
@@ -74,18 +219,21 @@ class vec_base:
     ## --- classic math ops ---
 
     def __abs__(self):
-        return self.__class__([abs(x) for x in self.v])
+        return self._new(array("d", [abs(x) for x in self.v]))
 
     def __neg__(self):
-        return self.__class__([-x for x in self.v])
+        return self._new(array("d", [-x for x in self.v]))
 
     def __round__(self, n=None):
         if n is None:
-            return self.__class__([float(round(x)) for x in self.v])
+            return self._new(array("d", [round(x) for x in self.v]))
         else:
-            return self.__class__([float(round(x, n)) for x in self.v])
+            return self._new(array("d", [round(x, n) for x in self.v]))
 
     # ------- arithmetic ops --------
+    # These are the generic implementations.
+    # Concrete classes get unrolled versions from _create_operators()
+    # which fall back to these for anything but numbers and same-class arguments
 
     def __add__(self, arg):
         return self._binary_operator(arg, lambda l, r: l + r)
@@ -138,14 +286,42 @@ class vec_base:
 
     # --- op helper ---
 
+    # Both helpers first dispatch on the exact type of arg.
+    # float, int and instances of the same class need no validation,
+    # only foreign types take the duck-typed path with is_number and check_float_sequence.
+
     def _binary_operator(self, arg, op):
+        t = type(arg)
+        if t is float or t is int:
+            return self._new(array("d", [op(x, arg) for x in self.v]))
+        if t is self.__class__:
+            return self._new(array("d", [op(x, y) for x, y in zip(self.v, arg.v)]))
+        if t is lazy:
+            # let the expression include this vector
+            return NotImplemented
         if tools.is_number(arg):
             fother = float(arg)
-            return self.__class__([op(x, fother) for x in self.v])
+            return self._new(array("d", [op(x, fother) for x in self.v]))
+        if isinstance(arg, array_base):
+            # let the array apply the operator to each element
+            return NotImplemented
         tools.check_float_sequence(arg, len(self))
-        return self.__class__([op(x, float(arg[i])) for i, x in enumerate(self.v)])
+        return self._new(array("d", [op(x, float(arg[i])) for i, x in enumerate(self.v)]))
 
     def _binary_operator_inplace(self, arg, op):
+        v = self.v
+        t = type(arg)
+        if t is float or t is int:
+            for i in range(len(v)):
+                v[i] = op(v[i], arg)
+            return self
+        if t is self.__class__:
+            o = arg.v
+            for i in range(len(v)):
+                v[i] = op(v[i], o[i])
+            return self
+        if t is lazy:
+            arg = arg.eval()
         if tools.is_number(arg):
             fother = float(arg)
             for i in range(len(self)):
@@ -167,48 +343,51 @@ class vec_base:
         """
         if len(arg) == 1:
             if tools.is_number(arg[0]):
-                arg = float(arg[0])
-                self.v = [arg for i in range(len(self))]
+                self.v[:] = array("d", (float(arg[0]),)) * len(self)
                 return self
 
             if tools.is_float_sequence(arg[0]):
                 o = arg[0]
                 # mat4 -> mat3
                 if len(o) == 16 and len(self) == 9:
-                    self.v = [o[0], o[1], o[2],  o[4], o[5], o[6],  o[8], o[9], o[10]]
+                    self.v[:] = array("d", [float(o[i]) for i in (0, 1, 2,  4, 5, 6,  8, 9, 10)])
                     return self
                 # mat3 -> mat4
                 if len(o) == 9 and len(self) == 16:
-                    self.v = [o[0], o[1], o[2], 0., o[3], o[4], o[5], 0., 
-                              o[6], o[7], o[8], 0., 0.,0.,0.,1.]
+                    self.v[:] = array("d", [float(o[0]), float(o[1]), float(o[2]), 0.,
+                                            float(o[3]), float(o[4]), float(o[5]), 0.,
+                                            float(o[6]), float(o[7]), float(o[8]), 0.,
+                                            0., 0., 0., 1.])
                     return self
 
-        self.v = [0. for i in range(len(self))]
+        v = array("d", (0.,)) * len(self)
         num_copied = 0
         i = 0
         while num_copied < len(self) and i < len(arg):
             a = arg[i]
             if tools.is_number(a):
-                self.v[num_copied] = float(a)
+                v[num_copied] = float(a)
                 num_copied += 1
                 i += 1
             elif tools.is_float_sequence(a):
                 for j in a:
                     if num_copied >= len(self):
                         raise ValueError("Too much data to initialize %s" % self.__class__.__name__)
-                    self.v[num_copied] = float(j)
+                    v[num_copied] = float(j)
                     num_copied += 1
                 i += 1
             else:
                 raise TypeError("Invalid argument %s to %s" % (type(a), self.__class__.__name__))
         if i < len(arg):
             raise ValueError("Too much data to initialize %s " % self.__class__.__name__)
+        self.v[:] = v
+        return self
 
     def copy(self):
         """
         Returns a new instance of the vector
         """
-        return self.__class__(self.v)
+        return self._new(array("d", self.v))
 
     # ----- getter -----
 
@@ -266,6 +445,8 @@ class vec_base:
         >>> vec3((1,2,3)).dot((4,5,6)) # (1*4)+(2*5)+(3*6)
         32.0
         """
+        if type(arg) is self.__class__:
+            return sum([x * y for x, y in zip(self.v, arg.v)])
         tools.check_float_sequence(arg, len(self))
         return sum([x * float(arg[i]) for i, x in enumerate(self.v)])
 
@@ -285,7 +466,7 @@ class vec_base:
         >>> mat4((-.1,-.2,-.3,-.4, -.5,-.6,-.7,-.8, -.9,-1.,-1.1,-1.2, -1.3,-1.4,-1.5,-1.6)).floor()
         mat4(-1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-2,-2, -2,-2,-2,-2)
         """
-        self.v = [math.floor(x) for x in self.v]
+        _store(self.v, [math.floor(x) for x in self.v])
         return self
 
     def round(self, ndigits=None):
@@ -305,9 +486,9 @@ class vec_base:
         mat4(0,0,0,0, 0,-1,-1,-1, -1,-1,-1,-1, -1,-1,-2,-2)
         """
         if ndigits:
-            self.v = [round(x,ndigits) for x in self.v]
+            _store(self.v, [round(x,ndigits) for x in self.v])
         else:
-            self.v = [round(x) for x in self.v]
+            _store(self.v, [round(x) for x in self.v])
         return self
 
     def normalize(self):
@@ -320,7 +501,7 @@ class vec_base:
         True
         """
         l = self.length()
-        self.v = [x / l for x in self.v]
+        _store(self.v, [x / l for x in self.v])
         return self
 
     def normalize_safe(self):
@@ -335,7 +516,7 @@ class vec_base:
         """
         l = self.length()
         if not l == 0.:
-            self.v = [x / l for x in self.v]
+            _store(self.v, [x / l for x in self.v])
         return self
 
     def lerp(self, other, t):
@@ -352,22 +533,24 @@ class vec_base:
 
     # --- value-copying methods ---
 
-    def floored(self):
+    def floored(self, out=None):
         """
         Returns a vector with the floor() function applied to all elements
-        :return: new vector
+        :param out: optional vector of the same type that receives the result
+        :return: new vector or out
         >>> vec3((0.1, 1.5, 2.9)).floored()
         vec3(0, 1, 2)
         >>> vec3((-1.1, -1.9, -0.9)).floored()
         vec3(-2, -2, -1)
         """
-        return self.copy().floor()
+        return self._copy_into(out).floor()
 
-    def rounded(self, ndigits=None):
+    def rounded(self, ndigits=None, out=None):
         """
         Returns a vector with round() applied to all elements
         :param ndigits: None, or the number of digits
-        :return: new vector
+        :param out: optional vector of the same type that receives the result
+        :return: new vector or out
         >>> vec3((0.1, 1.5, 2.9)).rounded()
         vec3(0, 2, 3)
         >>> vec3((-1.1, -1.9, -0.9)).rounded()
@@ -375,28 +558,114 @@ class vec_base:
         >>> vec3((0.123, 0.4999, 0.5102)).rounded(2)
         vec3(0.12, 0.5, 0.51)
         """
-        return self.copy().round(ndigits)
+        return self._copy_into(out).round(ndigits)
 
-    def normalized(self):
+    def normalized(self, out=None):
         """
         Returns normalized vector, e.g. makes it length 1.
-        :return: new vector
+        :param out: optional vector of the same type that receives the result
+        :return: new vector or out
         >>> vec3((1,1,0)).normalized()
         vec3(0.707107, 0.707107, 0)
         >>> vec3((1,2,3)).normalized().length() == 1
         True
         """
-        return self.copy().normalize()
+        return self._copy_into(out).normalize()
 
-    def normalized_safe(self):
+    def normalized_safe(self, out=None):
         """
         Returns normalized vector, e.g. makes it length 1.
         Does nothing if length is 0.
-        :return: new vector
+        :param out: optional vector of the same type that receives the result
+        :return: new vector or out
         >>> vec3((1,1,0)).normalized_safe()
         vec3(0.707107, 0.707107, 0)
         >>> vec3(0).normalized_safe()
         vec3(0, 0, 0)
         """
-        return self.copy().normalize_safe()
+        return self._copy_into(out).normalize_safe()
+
+
+# --- unrolled operators ---
+
+_OPERATORS = (
+    ("add", "+"),
+    ("sub", "-"),
+    ("mul", "*"),
+    ("truediv", "/"),
+    ("mod", "%"),
+)
+
+_OPERATOR_CODE = """
+def __%(name)s__(self, arg):
+    v = self.v
+    c = self.__class__
+    t = type(arg)
+    # the object creation is c._new(), inlined
+    if t is float or t is int:
+        r = new(c)
+        r.v = array("d", (%(scalar)s))
+        return r
+    if t is c:
+        o = arg.v
+        r = new(c)
+        r.v = array("d", (%(vector)s))
+        return r
+    return vec_base.__%(name)s__(self, arg)
+
+def __r%(name)s__(self, arg):
+    t = type(arg)
+    if t is float or t is int:
+        v = self.v
+        r = new(self.__class__)
+        r.v = array("d", (%(rscalar)s))
+        return r
+    return vec_base.__r%(name)s__(self, arg)
+
+def __i%(name)s__(self, arg):
+    t = type(arg)
+    if t is float or t is int:
+        v = self.v
+%(iscalar)s
+        return self
+    if t is self.__class__:
+        v = self.v
+        o = arg.v
+%(ivector)s
+        return self
+    return vec_base.__i%(name)s__(self, arg)
+"""
 
+
+def _create_operators(cls, size):
+    """
+    Adds the arithmetic operators with the loop over the components unrolled to cls.
+    Operators that cls or one of it's bases (other than vec_base) define explicitly are kept.
+    :param cls: a vec_base derived class
+    :param size: the number of components
+    """
+    explicit = set()
+    for base in cls.__mro__[:cls.__mro__.index(vec_base)]:
+        explicit |= set(base.__dict__)
+
+    for name, op in _OPERATORS:
+        code = _OPERATOR_CODE % {
+            "name": name,
+            "scalar": ", ".join("v[%d] %s arg" % (i, op) for i in range(size)),
+            "vector": ", ".join("v[%d] %s o[%d]" % (i, op, i) for i in range(size)),
+            "rscalar": ", ".join("arg %s v[%d]" % (op, i) for i in range(size)),
+            "iscalar": "\n".join("        v[%d] %s= arg" % (i, op) for i in range(size)),
+            "ivector": "\n".join("        v[%d] %s= o[%d]" % (i, op, i) for i in range(size)),
+        }
+        namespace = {"vec_base": vec_base, "array": array, "new": object.__new__}
+        exec(compile(code, "<%s.__%s__>" % (cls.__name__, name), "exec"), namespace)
+        for func_name in ("__%s__", "__r%s__", "__i%s__"):
+            func_name %= name
+            if func_name not in explicit:
+                func = namespace[func_name]
+                func.__qualname__ = "%s.%s" % (cls.__name__, func_name)
+                setattr(cls, func_name, func)
+
+
+# imported last, lazy derives its leaves from vec_base
+from .lazy import lazy
@@ -1,6 +1,7 @@
+import time
+import timeit
 from csg import *
 import csg.glsl
-import csg_shader_window
 
 def print_slice(csg, center=(0., 0.), size=(20,20), scale=.1):
     chars = [' ', '.', ':', '+', '*', '#']
@@ -8,11 +9,12 @@ def print_slice(csg, center=(0., 0.), size=(20,20), scale=.1):
     scaley = scale * size[1] * 2.
     scalex = scale * size[0]
     scale = scale * max(size[0], size[1])
+    points = [((i / size[0] - .5) * scalex + center[0], (.5 - j / size[1]) * scaley + center[1], 0.)
+              for j in range(size[1]) for i in range(size[0])]
+    dist = csg.get_distance_batch(points)
     for j in range(size[1]):
-        y = (.5 - j / size[1]) * scaley + center[1]
         for i in range(size[0]):
-            x = (i / size[0] - .5) * scalex + center[0]
-            d = csg.get_distance((x,y,0.)) - crange*.5
+            d = dist[j * size[0] + i] - crange*.5
             idx = max(0,min(len(chars)-1, int(len(chars)*(1. - d / crange))))
             print(chars[idx], end="")
         print("")
@@ -139,11 +141,20 @@ def csg_3():
         #])
     ])
 
+def rotate_x_arrays(x, y, z):
+    """The vectorized pos.rotate_x(pos.x) for DeformFunction.numpy_func"""
+    import numpy
+    from pector.const import DEG_TO_TWO_PI
+    a = x * DEG_TO_TWO_PI
+    sa, ca = numpy.sin(a), numpy.cos(a)
+    return x, y * ca - z * sa, y * sa + z * ca
+
 def csg_4():
     cones = Intersection([
         Tube(radius=5),
         Repeat(repeat=vec3(0,2,2),
                object=DeformFunction(py_func=lambda pos: pos.rotate_x(pos.x),
+                                     numpy_func=rotate_x_arrays,
                                      glsl_func="""
                                      float a = pos.x;
                                      mat2 r = mat2(cos(a), sin(a), -sin(a), cos(a));
@@ -234,7 +245,110 @@ def csg_7():
     o = Fan(o, axis=0, angle=(0, 60))
     return o
 
-c = csg_5()
-#print( csg.glsl.render_glsl(c) )
-#render(c)
-csg_shader_window.render_csg(c)
+def benchmark(scenes=(csg_0, csg_1, csg_2, csg_3, csg_4, csg_5, csg_5a, csg_6, csg_7), count=2000, repeat=3):
+    """Prints the time per distance evaluation of the tree walk and of the compiled python function"""
+    rnd = random.Random(1)
+    points = [vec3(rnd.uniform(-10, 10), rnd.uniform(-10, 10), rnd.uniform(-10, 10)) for i in range(count)]
+    coords = [tuple(p) for p in points]
+    fmt = "%8s | %10s | %10s | %13s | %s"
+    print(fmt % ("scene", "compile ms", "tree usec", "compiled usec", "speedup"))
+    for scene in scenes:
+        c = scene()
+        start = time.perf_counter()
+        de = c.get_distance_function()
+        compile_time = time.perf_counter() - start
+        tree_time = min(timeit.repeat(lambda: [c.get_distance(p) for p in points],
+                                      number=1, repeat=repeat)) / count
+        compiled_time = min(timeit.repeat(lambda: [de(x, y, z) for x, y, z in coords],
+                                          number=1, repeat=repeat)) / count
+        print(fmt % (scene.__name__, round(compile_time * 1.e+3, 2), round(tree_time * 1.e+6, 2),
+                     round(compiled_time * 1.e+6, 2), round(tree_time / compiled_time, 1)))
+
+
+def benchmark_batch(scenes=(csg_0, csg_1, csg_3, csg_4, csg_7), counts=(10**4, 10**5, 10**6, 10**7)):
+    """Prints the points per second of get_distance_batch() and of the compiled python function"""
+    import numpy
+    fmt = "%8s | %10s | %16s | %s"
+    print(fmt % ("scene", "points", "batch points/s", "compiled points/s"))
+    for scene in scenes:
+        c = scene()
+        de = c.get_distance_function()
+        for count in counts:
+            points = numpy.random.RandomState(1).uniform(-10, 10, (count, 3))
+            start = time.perf_counter()
+            c.get_distance_batch(points)
+            batch_time = time.perf_counter() - start
+            compiled = ""
+            if count <= 10**4:
+                start = time.perf_counter()
+                for x, y, z in points.tolist():
+                    de(x, y, z)
+                compiled = int(count / (time.perf_counter() - start))
+            print(fmt % (scene.__name__, count, int(count / batch_time), compiled))
+
+
+def benchmark_render(scene=csg_3, size=(160, 120), workers=(0, 1, 2, 4, 8), tile_size=32):
+    """Prints the pixels per second of the headless renderer for a number of worker processes"""
+    from csg import render
+    c = scene()
+    cam = mat4().rotate_y(20).translate((0, 0, 12))
+    fmt = "%8s | %8s | %10s | %s"
+    print(fmt % ("scene", "workers", "seconds", "pixels/s"))
+    for count in workers:
+        start = time.perf_counter()
+        render.render_image(c, cam, size[0], size[1], workers=count, tile_size=tile_size)
+        seconds = time.perf_counter() - start
+        print(fmt % (scene.__name__, count, round(seconds, 3), int(size[0] * size[1] / seconds)))
+
+
+def benchmark_trace(scenes=(csg_0, csg_3, csg_4), size=(80, 60)):
+    """Prints the distance evaluations per ray and the time of the camera rays for some trace configs"""
+    from csg import trace
+    cam = mat4().rotate_y(20).translate((0, 0, 12))
+    configs = (("default", trace.TraceConfig()),
+               ("max_distance", trace.TraceConfig(max_distance=100.)),
+               ("pixel cone", trace.TraceConfig.for_camera(size[1], max_distance=100.)),
+               ("relaxation", trace.TraceConfig(max_distance=100., relaxation=1.6)),
+               ("fudge", trace.TraceConfig(max_distance=100., fudge=.8)))
+    fmt = "%8s | %12s | %10s | %6s | %9s | %s"
+    print(fmt % ("scene", "config", "seconds", "hits", "evals/ray", "fallbacks"))
+    for scene in scenes:
+        c = scene()
+        origin, directions = trace.camera_rays(cam, size[0], size[1])
+        for name, config in configs:
+            stats = trace.TraceStats()
+            start = time.perf_counter()
+            t, steps, hit = trace.trace_rays(c, origin, directions, config, stats)
+            seconds = time.perf_counter() - start
+            print(fmt % (scene.__name__, name, round(seconds, 3), int(hit.sum()),
+                         round(stats.total_evaluations() / len(stats), 1), sum(stats.fallbacks)))
+
+
+def render_file(scene, filename, size=(320, 240)):
+    """Renders the scene headless to an image file and the depth buffer to filename.depth.png"""
+    from csg import render
+    cam = mat4().rotate_y(20).translate((0, 0, 12))
+    color, depth = render.render_image(scene(), cam, size[0], size[1])
+    render.write_image(filename, color)
+    render.write_depth(filename + ".depth.png", depth)
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["benchmark"]:
+        benchmark()
+    elif sys.argv[1:2] == ["benchmark_batch"]:
+        benchmark_batch()
+    elif sys.argv[1:2] == ["benchmark_render"]:
+        benchmark_render()
+    elif sys.argv[1:2] == ["benchmark_trace"]:
+        benchmark_trace()
+    elif sys.argv[1:2] == ["image"]:
+        # python run_csg.py image csg_3 out.png [width height]
+        render_file(globals()[sys.argv[2]], sys.argv[3], tuple(int(x) for x in sys.argv[4:6]) or (320, 240))
+    else:
+        import csg_shader_window
+        c = csg_5()
+        #print( csg.glsl.render_glsl(c) )
+        #render(c)
+        csg_shader_window.render_csg(c)
@@ -1,8 +1,15 @@
+import importlib
+import io
 import math
+import os
+import pickle
 import random
+import tempfile
+import tracemalloc
 from unittest import TestCase
 
-from pector import vec2, vec3, mat3, mat4, quat
+from pector import vec2, vec3, vec4, mat3, mat4, quat, vec2_array, vec3_array, vec4_array, quat_array, mat4_array
+from pector import set_checks, checks_enabled, lazy, fuse, functions, track, sample_tracks, binary
 
 
 class TestVec2(TestCase):
@@ -197,6 +204,43 @@ class TestVec3(TestCase):
         self.assertEqual(str(vec3([1])), "vec3(1, 0, 0)")
         self.assertEqual(str(vec3([1,2])), "vec3(1, 2, 0)")
 
+    def test_from_xyz(self):
+        self.assertEqual(vec3(1,2,3), vec3.from_xyz(1,2,3))
+        self.assertIs(vec3, type(vec3.from_xyz(1,2,3)))
+        with self.assertRaises(TypeError):
+            vec3.from_xyz(1,2,"3")
+        a = vec3(1,2,3)
+        b = a.copy()
+        b.x = 5
+        self.assertEqual(vec3(1,2,3), a)
+
+    def test_buffer(self):
+        import struct
+        a = vec3(1,2,3)
+        b = a.as_buffer()
+        self.assertEqual((1,2,3), struct.unpack("3d", b))
+        b[1] = 5
+        self.assertEqual(vec3(1,5,3), a)
+        b = a.as_buffer("f")
+        self.assertEqual(12, b.nbytes)
+        self.assertEqual((1,5,3), struct.unpack("3f", b))
+        with self.assertRaises(ValueError):
+            a.as_buffer("i")
+
+    def test_checks(self):
+        was_enabled = checks_enabled()
+        try:
+            set_checks(True)
+            with self.assertRaises(TypeError):
+                vec3(1).dot((1,2))
+            set_checks(False)
+            self.assertFalse(checks_enabled())
+            # without checks, wrong arguments give arbitrary results or errors
+            vec3(1).dot((1,2,3,4))
+            self.assertEqual(vec3(0,1,0), vec3(0,-1,0).reflect((0,1,0)))
+        finally:
+            set_checks(was_enabled)
+
     def test_equal(self):
         self.assertTrue(  vec3(1) == vec3(1) )
         self.assertFalse( vec3(1) == vec3(2) )
@@ -237,6 +281,16 @@ class TestVec3(TestCase):
     def test_iter(self):
         self.assertEqual([1,2,3], [x for x in vec3(1,2,3)])
 
+    def test_storage(self):
+        a = vec3(1,2,3)
+        self.assertFalse(hasattr(a, "__dict__"))
+        v = a.v
+        a += 1
+        a.normalize()
+        a.set(4,5,6)
+        self.assertIs(v, a.v)
+        self.assertEqual([4,5,6], list(v))
+
     def test_abs(self):
         self.assertEqual(vec3(1,2,3), abs(vec3(-1,-2,-3)))
         self.assertEqual(vec3(1,2,3), abs(vec3( 1,-2, 3)))
@@ -365,6 +419,23 @@ class TestVec3(TestCase):
         self.assertEqual(vec3(3,2,-1),
                 vec3(1,2,3).rotated_axis((1,0,0), 90).rotated_axis((0,1,0), 90).rotated_axis((0,0,1), 90).rounded())
 
+    def test_unrolled_operators(self):
+        class sub_vec3(vec3):
+            pass
+        a = sub_vec3(1,2,3)
+        self.assertIs(sub_vec3, type(a + 1))
+        self.assertIs(sub_vec3, type(a + a))
+        self.assertIs(sub_vec3, type(2 - a))
+        self.assertEqual(vec3(1,0,-1), 2 - a)
+        self.assertEqual(vec3(2,1,2/3), 2 / a)
+        self.assertEqual(vec3(0,0,2), 2 % a)
+        b = a
+        b *= a
+        self.assertIs(a, b)
+        self.assertEqual(vec3(1,4,9), a)
+        with self.assertRaises(ZeroDivisionError):
+            vec3(1) / 0
+
     """
     def test_op_speed(self):
         for i in range(100000):
@@ -374,6 +445,76 @@ class TestVec3(TestCase):
 
 
 
+class TestVec4(TestCase):
+
+    def test_construct(self):
+        self.assertEqual([0, 0, 0, 0], list(vec4()))
+        self.assertEqual([1, 2, 3, 4], list(vec4(1, 2, 3, 4)))
+        self.assertEqual([1, 2, 3, 1], list(vec4(vec3(1, 2, 3), 1)))
+        self.assertEqual(vec4(1, 2, 3, 4), vec4.from_xyzw(1, 2, 3, 4))
+        a = vec4(1, 2, 3, 4)
+        a.w = 5
+        self.assertEqual((1, 2, 3, 5), (a.x, a.y, a.z, a.w))
+        self.assertEqual("vec4(1, 2, 3, 5)", str(a))
+        with self.assertRaises(TypeError):
+            vec4(1, 2, 3, 4) + (1, 2, 3)
+
+    def test_arithmetic(self):
+        a, b = vec4(1, 2, 3, 4), vec4(5, 6, 7, 8)
+        self.assertEqual(vec4(6, 8, 10, 12), a + b)
+        self.assertEqual(vec4(2, 4, 6, 8), a * 2)
+        self.assertEqual(vec4(4, 3, 2, 1), 5 - a)
+        self.assertEqual(70, a.dot(b))
+        a += 1
+        self.assertEqual(vec4(2, 3, 4, 5), a)
+
+    def test_homogeneous(self):
+        a = vec4(2, 4, 6, 2)
+        self.assertEqual(vec3(1, 2, 3), a.projected())
+        self.assertEqual(vec3(2, 4, 6), a.xyz())
+        self.assertEqual(vec4(1, 2, 3, 1), a.homogenized())
+        self.assertEqual(vec4(2, 4, 6, 2), a)
+        o = vec3()
+        self.assertIs(o, a.projected(out=o))
+        self.assertIs(a, a.homogenize())
+        self.assertEqual(vec4(1, 2, 3, 1), a)
+        with self.assertRaises(ZeroDivisionError):
+            vec4(1, 2, 3, 0).projected()
+
+    def test_mat4(self):
+        m = mat4().translate((1, 2, 3)).rotate_x(30).scale(2)
+        p = vec3(1, 2, 3)
+        self.assertIs(vec4, type(m * vec4(p, 1)))
+        self.assertEqual((m * p).rounded(6), (m * vec4(p, 1)).xyz().rounded(6))
+        self.assertEqual(m.transform_directions(vec3_array([p]))[0].rounded(6), (m * vec4(p, 0)).xyz().rounded(6))
+        self.assertEqual(m * vec4(p, 1), m * (1, 2, 3, 1))
+        with self.assertRaises(TypeError):
+            mat3() * vec4()
+        # perspective divide
+        proj = mat4((1,0,0,0, 0,1,0,0, 0,0,1,1, 0,0,0,0))
+        self.assertEqual(vec3(1, 2, 1), proj.project_point((2, 4, 2)))
+        self.assertEqual((proj * vec4(p, 1)).projected(), proj.project_point(p))
+        with self.assertRaises(ZeroDivisionError):
+            proj.project_point((1, 1, 0))
+
+
+    def test_serialization(self):
+        for v in (vec3(1,2,3), vec4(1,2,3,4), quat((1,0,0), 20), mat3().rotate_z(10), mat4().translate((1,2,3))):
+            b = v.to_bytes()
+            self.assertEqual(8 * len(v), len(b))
+            self.assertEqual(v, type(v).from_bytes(b))
+            self.assertEqual(v, pickle.loads(pickle.dumps(v)))
+            self.assertIs(type(v), type(pickle.loads(pickle.dumps(v))))
+        # the structure flags survive pickling
+        for m in (mat4(), mat4().translate((1,2,3)), mat4().rotate_x(30), mat4().translate((1,2,3)).scale(2),
+                  mat4((1,0,0,0, 0,1,0,0, 0,0,1,1, 0,0,0,0)), mat3().rotate_z(10)):
+            self.assertEqual(m.structure(), pickle.loads(pickle.dumps(m)).structure())
+        self.assertEqual("general", pickle.loads(pickle.dumps(mat4_array([mat4().translate((1,2,3))])[0])).structure())
+        self.assertEqual(b"\0\0\0\0\0\0\xf0\x3f", vec3(1,2,3).to_bytes()[:8])
+        with self.assertRaises(ValueError):
+            vec3.from_bytes(vec4(1).to_bytes())
+
+
 class TestMat3(TestCase):
     def setUp(self):
         pass
@@ -390,6 +531,58 @@ class TestMat3(TestCase):
         self.assertEqual("mat3(1,2,3, 4,5,6, 7,8,9)",
                          str(mat3(vec3(1, 2, 3), 4, (5, 6), 7, (8,), 9)))
 
+    def test_inverse(self):
+        r = random.Random(11)
+        for i in range(20):
+            m = mat3([r.gauss(0, 1) for i in range(9)])
+            self.assertEqual(mat3().round(8), (m * m.inversed()).round(8))
+            self.assertAlmostEqual(1. / m.determinant(), m.inversed().determinant())
+        m = mat3().rotate_axis(vec3(1, 2, 3).normalize(), 40)
+        self.assertEqual(m.inversed_simple().round(8), m.inversed().round(8))
+        self.assertEqual(8, mat3(2).determinant())
+        with self.assertRaises(ValueError):
+            mat3(0).inverse()
+
+    def test_multiply_kernels(self):
+        from pector import mat_base
+        r = random.Random(7)
+        for i in range(20):
+            a = mat3([r.gauss(0, 1) for i in range(9)])
+            b = mat3([r.gauss(0, 1) for i in range(9)])
+            self.assertEqual(mat_base._multiply_inplace(a.copy(), b).round(8), (a * b).round(8))
+            self.assertEqual((a * mat3().set_rotate_x(33)).round(8), a.rotated_x(33).round(8))
+            self.assertEqual((a * mat3().set_rotate_y(33)).round(8), a.rotated_y(33).round(8))
+            self.assertEqual((a * mat3().set_rotate_z(33)).round(8), a.rotated_z(33).round(8))
+            self.assertEqual((a * mat3().init_scale((1,2,3))).round(8), a.scaled((1,2,3)).round(8))
+
+    def test_structure(self):
+        from pector import mat_base
+        self.assertEqual("identity", mat3().structure())
+        self.assertEqual("rotation", mat3().rotate_x(30).rotate_axis(vec3(1,2,3).normalized(), 20).structure())
+        self.assertEqual("affine", mat3().rotate_axis((1,2,3), 20).structure())
+        self.assertEqual("affine", mat3().rotate_z(30).scale(2).structure())
+        self.assertEqual("rotation", quat((1,0,0), 30).as_mat3().structure())
+        r = random.Random(13)
+        for i in range(10):
+            a = mat3().rotate_x(r.uniform(-90, 90)).rotate_y(r.uniform(-90, 90))
+            g = mat3(a)
+            g[0] = g[0]
+            self.assertEqual("general", g.structure())
+            self.assertEqual(g.inversed().round(8), a.inversed().round(8))
+            self.assertEqual("rotation", a.inversed().structure())
+            b = mat3([r.gauss(0, 1) for i in range(9)])
+            self.assertEqual(mat_base._multiply_inplace(g.copy(), b).round(8), (a * b).round(8))
+            self.assertEqual(b, mat3() * b)
+            self.assertEqual(b, b * mat3())
+        a = mat3().rotate_x(30)
+        a += 1
+        self.assertEqual("general", a.structure())
+        a = mat3()
+        a[1] = 2.
+        self.assertFalse(a.is_identity())
+        self.assertEqual("general", a.structure())
+        self.assertTrue(mat3((1,0,0, 0,1,0, 0,0,1)).is_identity())
+
     def test_equal(self):
         self.assertEqual(mat3(1), (1,0,0, 0,1,0, 0,0,1))
 
@@ -552,9 +745,73 @@ class TestMat4(TestCase):
     def test_equal(self):
         self.assertEqual(mat4(1), (1,0,0,0, 0,1,0,0, 0,0,1,0, 0,0,0,1))
 
+    def test_from_column_major(self):
+        self.assertEqual(mat4(range(16)), mat4.from_column_major(range(16)))
+        self.assertEqual(mat4(range(16)).transposed(), mat4.from_row_major(range(16)))
+        with self.assertRaises(ValueError):
+            mat4.from_column_major(range(9))
+
     def test_trace(self):
         self.assertEqual(34, mat4(1,2,3,4, 5,6,7,8, 9,10,11,12, 13,14,15,16).trace())
 
+    def test_buffer(self):
+        m = mat4(range(16))
+        self.assertEqual(list(range(16)), m.as_buffer().tolist())
+        self.assertEqual(list(range(16)), m.as_buffer("f").tolist())
+        flat = [x for row in m.as_list_list(row_major=True) for x in row]
+        self.assertEqual(flat, m.as_buffer(row_major=True).tolist())
+        self.assertEqual(flat, m.as_buffer("f", row_major=True).tolist())
+        m.as_buffer()[12] = 23
+        self.assertEqual(23, m.get(0, 3))
+
+    def test_inverse(self):
+        r = random.Random(11)
+        for i in range(20):
+            general = mat4([r.gauss(0, 1) for i in range(16)])
+            affine = (mat4().translate((r.gauss(0, 1), r.gauss(0, 1), r.gauss(0, 1)))
+                      .rotate_axis(vec3(r.gauss(0, 1), r.gauss(0, 1), r.gauss(0, 1)).normalize(), 40)
+                      .scale((r.uniform(.5, 2), r.uniform(.5, 2), r.uniform(.5, 2))))
+            translation = mat4().translate((r.gauss(0, 1), r.gauss(0, 1), r.gauss(0, 1)))
+            for m in (general, affine, translation):
+                self.assertEqual(mat4().round(8), (m * m.inversed()).round(8))
+                self.assertEqual(mat4().round(8), (m.inversed() * m).round(8))
+                self.assertAlmostEqual(1. / m.determinant(), m.inversed().determinant())
+            # rigid transforms agree with the simple inverse
+            rigid = mat4().translate(affine.position()).rotate_axis((0, 0, 1), 33)
+            self.assertEqual(rigid.inversed_simple().round(8), rigid.inversed().round(8))
+        self.assertEqual(24, mat4().init_scale((2, 3, 4)).determinant())
+        self.assertEqual(0, mat4(0).determinant())
+        m = mat4().scale(2)
+        self.assertIs(m, m.inverse())
+        self.assertEqual(mat4().scale(.5), m)
+        with self.assertRaises(ValueError):
+            mat4(0).inversed()
+        with self.assertRaises(ValueError):
+            mat4().scale((1, 0, 1)).inversed()
+
+    def test_multiply_kernels(self):
+        from pector import mat_base
+        r = random.Random(7)
+        for i in range(20):
+            general = mat4([r.gauss(0, 1) for i in range(16)])
+            affine = mat4([r.gauss(0, 1) for i in range(16)])
+            affine.v[3] = affine.v[7] = affine.v[11] = 0.
+            affine.v[15] = 1.
+            for a, b in ((general, general), (general, affine), (affine, general), (affine, affine)):
+                # compare with the generic loop
+                expect = mat_base._multiply_inplace(a.copy(), b)
+                self.assertEqual(expect.rounded(8), (a * b).round(8))
+        # the structural shortcuts equal the multiplication with the full matrix
+        m = mat4([r.gauss(0, 1) for i in range(16)])
+        self.assertEqual((m * mat4().set_translate((1,2,3))).round(8), m.translated((1,2,3)).round(8))
+        self.assertEqual((m * mat4().set_rotate_x(33)).round(8), m.rotated_x(33).round(8))
+        self.assertEqual((m * mat4().set_rotate_y(33)).round(8), m.rotated_y(33).round(8))
+        self.assertEqual((m * mat4().set_rotate_z(33)).round(8), m.rotated_z(33).round(8))
+        self.assertEqual((m * mat4().set_rotate_axis(vec3(1,2,3).normalize(), 33)).round(8),
+                         m.rotated_axis(vec3(1,2,3).normalize(), 33).round(8))
+        self.assertEqual((m * mat4().init_scale((1,2,3))).round(8), m.scaled((1,2,3)).round(8))
+        self.assertEqual((m * mat4().init_scale(2)).round(8), m.scaled(2).round(8))
+
     def test_floor(self):
         self.assertEqual(mat4(1), mat4(1.4).floor())
         self.assertEqual(mat4(1), mat4(1.5).floor())
@@ -706,6 +963,50 @@ class TestMat4(TestCase):
         a = mat4().rotate_x(90).translate((1,2,3))
         self.assertEqual(a.position(), a * (0,0,0))
 
+    def test_structure(self):
+        from pector import mat_base
+        self.assertEqual("identity", mat4().structure())
+        self.assertEqual("identity", mat4().translate((1,2,3)).translate((-1,-2,-3)).set_position((0,0,0)).structure())
+        self.assertEqual("translation", mat4().translate((1,2,3)).structure())
+        self.assertEqual("translation", mat4().set_translate((1,2,3)).structure())
+        self.assertEqual("rotation", mat4().rotate_x(30).rotate_y(20).structure())
+        self.assertEqual("affine", mat4().rotate_x(30).translate((1,2,3)).structure())
+        self.assertEqual("affine", mat4().scale(2).structure())
+        self.assertEqual("general", mat4(2).structure())
+        self.assertEqual("rotation", quat((1,0,0), 30).as_mat4().structure())
+        self.assertEqual("translation", (mat4().translate((1,0,0)) * mat4().translate((0,1,0))).structure())
+        self.assertEqual((1,1,0), (mat4().translate((1,0,0)) * mat4().translate((0,1,0))).position())
+        r = random.Random(17)
+        for i in range(10):
+            t = vec3([r.gauss(0, 1) for i in range(3)])
+            for a in (mat4().translate(t),
+                      mat4().rotate_x(r.uniform(-90, 90)).rotate_z(r.uniform(-90, 90)),
+                      mat4().rotate_x(r.uniform(-90, 90)).translate(t).scale((1,2,3))):
+                # the same values without the structure flags
+                g = mat4(a)
+                g[0] = g[0]
+                self.assertEqual("general", g.structure())
+                self.assertEqual(a.structure(), a.inversed().structure())
+                self.assertEqual(g.inversed().round(8), a.inversed().round(8))
+                self.assertEqual((g * t).round(8), (a * t).round(8))
+                p = vec3_array([t, t * 2])
+                self.assertEqual(g.transform_points(p).round(8), a.transform_points(p).round(8))
+                self.assertEqual(g.transform_directions(p).round(8), a.transform_directions(p).round(8))
+                b = mat4([r.gauss(0, 1) for i in range(16)])
+                self.assertEqual(mat_base._multiply_inplace(g.copy(), b).round(8), (a * b).round(8))
+                self.assertEqual(mat_base._multiply_inplace(g.copy(), a).round(8), (a * a).round(8))
+                self.assertEqual(b, mat4() * b)
+                self.assertEqual(b, b * mat4())
+        a = mat4().translate((1,2,3))
+        a.round()
+        self.assertEqual("general", a.structure())
+        self.assertEqual("general", mat4_array([mat4()])[0].structure())
+        a = mat4()
+        a[12] = 1.
+        self.assertFalse(a.is_identity())
+        self.assertEqual(mat4().translate((1,0,0)), a.inversed().inversed())
+        self.assertEqual((0,0,0), a.inversed() * (1,0,0))
+
 
 
 
@@ -717,6 +1018,50 @@ class TestQuat(TestCase):
         self.r = random.Random(23)
         pass
 
+    def test_slerp(self):
+        z0, z90 = quat(), quat((0,0,1), 90)
+        for t in (0., .25, .5, 1.):
+            self.assertEqual(quat((0,0,1), 90 * t).round(9), z0.slerped(z90, t).round(9))
+        # nlerp matches slerp in the middle and at the ends
+        for t in (0., .5, 1.):
+            self.assertEqual(quat((0,0,1), 90 * t).round(9), z0.nlerped(z90, t).round(9))
+        # constant angular velocity
+        a, b = quat((1,0,0), 20), quat(vec3(1,2,3).normalize(), 150)
+        angles = [a.dot(a.slerped(b, t)) for t in (.1, .2, .3)]
+        steps = [a.slerped(b, t).dot(a.slerped(b, t + .1)) for t in (.1, .2, .3)]
+        self.assertAlmostEqual(angles[0], steps[0])
+        self.assertAlmostEqual(steps[0], steps[2])
+        # shorter arc
+        q = quat((0,0,1), 10).slerped(quat((0,0,1), 350), .5)
+        self.assertAlmostEqual(1., abs(q.w))
+        q = quat((0,0,1), 10).nlerped(-quat((0,0,1), 30), .5)
+        self.assertEqual(quat((0,0,1), 20).round(9), q.round(9))
+        # nearly equal rotations
+        self.assertEqual(quat((0,0,1), 10).round(9), quat((0,0,1), 10).slerped(quat((0,0,1), 10), .3).round(9))
+        o = quat()
+        self.assertIs(o, z0.slerped(z90, .5, out=o))
+        self.assertIs(z90, z0.slerped(z90, .5, out=z90))
+        self.assertEqual(quat((0,0,1), 45).round(9), z90.round(9))
+        self.assertIs(z0, z0.slerp((0,0,0,1), .5))
+        with self.assertRaises(TypeError):
+            z0.slerp((0,0,1), .5)
+
+    def test_rotate_vec3(self):
+        for i in range(20):
+            axis = vec3(self.r.gauss(0,1), self.r.gauss(0,1), self.r.gauss(0,1)).normalize()
+            degree = self.r.uniform(-180, 180)
+            q = quat(axis, degree)
+            v = vec3(self.r.gauss(0,1), self.r.gauss(0,1), self.r.gauss(0,1))
+            expect = (mat3().rotate_axis(axis, degree) * v).round(6)
+            self.assertEqual(expect, q.rotate_vec3(v).round(6))
+            self.assertEqual(expect, (q * v).round(6))
+            self.assertEqual(expect, (q * tuple(v)).round(6))
+            self.assertEqual(expect, (q.as_mat3() * v).round(6))
+            self.assertEqual(mat4(q.as_mat3()), q.as_mat4())
+        o = vec3()
+        self.assertIs(o, quat((0,0,1), 90).rotate_vec3((1,2,3), out=o))
+        self.assertEqual(vec3(-2, 1, 3), o.round())
+
     def test_assignment(self):
         self.assertEqual("quat(0, 0, 0, 1)", str(quat()), )
         self.assertEqual("quat(1, 2, 3, 4)", str(quat(1,2,3,4)) )
@@ -731,6 +1076,9 @@ class TestQuat(TestCase):
         with self.assertRaises(TypeError):
             quat({"x":23})
 
+    def test_from_xyzw(self):
+        self.assertEqual(quat(1,2,3,4), quat.from_xyzw(1,2,3,4))
+
     def test_equal(self):
         self.assertTrue(  quat() == (0,0,0,1) )
         self.assertFalse( quat() == (0,0,0) )
@@ -868,3 +1216,776 @@ class TestQuat(TestCase):
         goal = vec3(1,0,0)
         v = cur.get_rotation_to(goal).as_mat3() * cur
         self.assertEqual(goal.rounded(3), v.rounded(3))
+
+
+class TestVec3Array(TestCase):
+    # set to False in derived class to test the array('d') fallback
+    use_numpy = True
+
+    def setUp(self):
+        self.module = importlib.import_module("pector.array_base")
+        self.numpy = self.module.numpy
+        if not self.use_numpy:
+            self.module.numpy = None
+
+    def tearDown(self):
+        self.module.numpy = self.numpy
+
+    def test_assignment(self):
+        self.assertEqual(3, len(vec3_array(3)))
+        self.assertEqual([[0,0,0], [0,0,0]], vec3_array(2).tolist())
+        self.assertEqual([[1,2,3], [4,5,6]], vec3_array([(1,2,3), vec3(4,5,6)]).tolist())
+        self.assertEqual(0, len(vec3_array([])))
+        self.assertEqual([[0,0,0,1]], quat_array(1).tolist())
+        with self.assertRaises(TypeError):
+            vec3_array([(1,2)])
+        with self.assertRaises(TypeError):
+            vec3_array([(1,2,"bla")])
+
+    def test_empty(self):
+        for a in (vec3_array(0), vec3_array([]), vec3_array.from_bytes(b""), vec3_array(3)[3:]):
+            self.assertEqual(0, len(a))
+            self.assertEqual([], list(a))
+            self.assertEqual([], a.tolist())
+            self.assertEqual(b"", a.to_bytes())
+            self.assertEqual(repr(vec3_array([])), repr(a))
+            self.assertEqual(str(vec3_array([])), str(a))
+            self.assertEqual([], list(a.chunks(2)))
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "empty.pctr")
+            binary.write_file(filename, vec3_array(0))
+            self.assertEqual([], list(binary.read_file(filename)))
+            self.assertEqual([], list(binary.open_file(filename)))
+            self.assertEqual([], list(binary.iter_file(filename)))
+
+    def test_views(self):
+        a = vec3_array([(1,2,3), (4,5,6), (7,8,9)])
+        self.assertIs(vec3, type(a[0]))
+        self.assertEqual(vec3(7,8,9), a[-1])
+        a[1].x = 10
+        a[1] += (1,1,1)
+        self.assertEqual(vec3(11,6,7), a[1])
+        a[0] = (0,0,0)
+        self.assertEqual(vec3(0), a[0])
+        s = a[1:]
+        self.assertEqual(2, len(s))
+        s[0].y = 20
+        self.assertEqual(vec3(11,20,7), a[1])
+        a[1:] = [(1,1,1), (2,2,2)]
+        self.assertEqual([vec3(0), vec3(1), vec3(2)], list(a))
+        with self.assertRaises(IndexError):
+            a[3]
+        with self.assertRaises(IndexError):
+            a[::2]
+
+    def test_as_buffer(self):
+        a = vec3_array([(1,2,3), (4,5,6)])
+        b = a.as_buffer()
+        self.assertEqual([1,2,3,4,5,6], b.tolist())
+        b[4] = 10
+        self.assertEqual(vec3(4,10,6), a[1])
+        self.assertEqual("f", a.as_buffer("f").format)
+        self.assertEqual([1,2,3,4,10,6], a.as_buffer("f").tolist())
+        self.assertEqual(a, vec3_array.from_buffer(bytearray(a.as_buffer())))
+        m = mat4_array([mat4(range(16)), mat4(range(16, 32))])
+        self.assertEqual(m[0].as_buffer(row_major=True).tolist() + m[1].as_buffer(row_major=True).tolist(),
+                         m.as_buffer("f", row_major=True).tolist())
+
+    def test_from_buffer(self):
+        from array import array
+        buf = array("d", range(6))
+        a = vec3_array.from_buffer(buf)
+        self.assertEqual(vec3(3,4,5), a[1])
+        a[1].z = 10
+        self.assertEqual(10, buf[5])
+        with self.assertRaises(ValueError):
+            vec3_array.from_buffer(array("d", range(5)))
+
+    def test_arithmetic(self):
+        a = vec3_array([(1,2,3), (4,5,6)])
+        b = vec3_array([(1,1,1), (2,2,2)])
+        self.assertIs(vec3_array, type(a + b))
+        self.assertEqual(vec3_array([(2,3,4), (6,7,8)]), a + b)
+        self.assertEqual(vec3_array([(2,3,4), (5,6,7)]), a + 1)
+        self.assertEqual(vec3_array([(0,1,2), (3,4,5)]), a - (1,1,1))
+        self.assertEqual(vec3_array([(0,-1,-2), (-3,-4,-5)]), 1 - a)
+        self.assertEqual(vec3_array([(2,4,6), (8,10,12)]), 2 * a)
+        self.assertEqual(vec3_array([(1,2,3), (2,2.5,3)]), a / b)
+        self.assertEqual(vec3_array([(1,0,1), (0,1,0)]), a % 2)
+        self.assertEqual(vec3_array([(-1,-2,-3), (-4,-5,-6)]), -a)
+        # each operation matches the element-wise vec3 version
+        self.assertEqual([x * vec3(1,2,3) for x in a], a * vec3(1,2,3))
+        c = a
+        c += b
+        self.assertIs(a, c)
+        self.assertEqual(vec3_array([(2,3,4), (6,7,8)]), a)
+        with self.assertRaises(TypeError):
+            a + vec3_array(3)
+        with self.assertRaises(TypeError):
+            a + (1,2)
+
+    def test_functions(self):
+        a = vec3_array([(1,0,0), (0,3,4)])
+        self.assertEqual([1, 25], list(a.length_squared()))
+        self.assertEqual([1, 5], list(a.length()))
+        self.assertEqual([1, 4], list(a.dot((1,0,1))))
+        self.assertEqual([1, 0], list(a.dot(vec3_array([(1,1,1), (0,0,0)]))))
+        self.assertEqual(vec3_array([(1,0,0), (0,.6,.8)]), a.normalized())
+        self.assertEqual(vec3_array([(1,0,0), (0,0,0)]), vec3_array([(2,0,0), (0,0,0)]).normalize_safe())
+        self.assertEqual(vec3_array([(0,-1,0), (3,0,0)]), a.crossed((0,0,1)))
+        self.assertEqual(vec3_array([(0,0,1), (0,0,0)]), a.crossed(vec3_array([(0,1,0), (0,3,4)])))
+        self.assertEqual(vec3_array([(-1,0,0), (0,3,4)]), a.reflected((1,0,0)))
+        r = random.Random(23)
+        vecs = [vec3(r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)) for i in range(20)]
+        a = vec3_array(vecs)
+        axis = vec3(1,2,3)
+        for v, av in zip(vecs, a.rotated_axis(axis, 33)):
+            self.assertEqual(v.rotated_axis(axis, 33).round(6), av.round(6))
+        for v, av in zip(vecs, a.reflected(axis.normalized())):
+            self.assertEqual(v.reflected(axis.normalized()).round(6), av.round(6))
+        for v, av in zip(vecs, a.crossed(axis)):
+            self.assertEqual(v.crossed(axis).round(6), av.round(6))
+
+    def test_vec2_array(self):
+        a = vec2_array([(1,2), (3,4)])
+        self.assertEqual(vec2(3,4), a[1])
+        self.assertEqual(vec2_array([(2,3), (4,5)]), a + 1)
+        self.assertEqual(vec2_array([(-2,1), (-4,3)]), a.rotated_z(90).round())
+        self.assertEqual(vec2_array([(1,-2), (3,-4)]), a.reflected((0,1)))
+
+    def test_quat_array(self):
+        r = random.Random(42)
+        quats = [quat((r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)), r.uniform(-180,180))
+                 for i in range(10)]
+        a = quat_array(quats)
+        q = quat((1,2,3), 45)
+        for x, ax in zip(quats, a * q):
+            self.assertEqual((x * q).round(6), ax.round(6))
+        for x, ax in zip(quats, q * a):
+            self.assertEqual((q * x).round(6), ax.round(6))
+        for x, ax in zip(quats, a * a):
+            self.assertEqual((x * x).round(6), ax.round(6))
+        self.assertEqual(quat_array([(0,0,0,2)]), quat_array(1) * 2)
+        b = a.copy()
+        b *= q
+        self.assertEqual(a * q, b)
+
+    def test_quat_array_slerp(self):
+        r = random.Random(44)
+        def rnd_quat():
+            return quat(vec3(r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)).normalize(), r.uniform(-180,180))
+        quats, others = [rnd_quat() for i in range(20)], [rnd_quat() for i in range(20)]
+        ts = [r.random() for i in range(20)]
+        a, b = quat_array(quats), quat_array(others)
+        for x, y, t, ax in zip(quats, others, ts, a.slerped(b, ts)):
+            self.assertEqual(x.slerped(y, t).round(6), ax.round(6))
+        for x, ax in zip(quats, a.slerped(others[0], .3)):
+            self.assertEqual(x.slerped(others[0], .3).round(6), ax.round(6))
+        for x, y, ax in zip(quats, others, a.nlerped(b, .7)):
+            self.assertEqual(x.nlerped(y, .7).round(6), ax.round(6))
+        self.assertEqual(a.round(6), a.slerped(a, .5).round(6))
+        c = a.copy()
+        self.assertIs(c, c.slerp(b, 1.))
+        self.assertEqual(b.round(6), quat_array([q if q.dot(o) >= 0 else -q for q, o in zip(c, b)]).round(6))
+        with self.assertRaises(TypeError):
+            a.slerp(b, ts[:3])
+        with self.assertRaises(TypeError):
+            a.slerp(b[:3], .5)
+
+    def test_quat_array_rotate(self):
+        r = random.Random(43)
+        quats = [quat(vec3(r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)).normalize(), r.uniform(-180,180))
+                 for i in range(10)]
+        vecs = vec3_array([(r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)) for i in range(10)])
+        a = quat_array(quats)
+        rotated = a * vecs
+        self.assertIs(vec3_array, type(rotated))
+        for q, v, rv in zip(quats, vecs, rotated):
+            self.assertEqual((q.as_mat3() * v).round(6), rv.round(6))
+        for q, rv in zip(quats, a * vec3(1, 2, 3)):
+            self.assertEqual((q.as_mat3() * vec3(1, 2, 3)).round(6), rv.round(6))
+        for q, m in zip(quats, a.as_mat4()):
+            self.assertEqual(q.as_mat4().round(6), m.round(6))
+        with self.assertRaises(TypeError):
+            a.rotate_vec3(vecs[:3])
+        q = quats[0]
+        for v, rv in zip(vecs, q * vecs):
+            self.assertEqual((q * v).round(6), rv.round(6))
+        out = vec3_array(10)
+        self.assertIs(out, q.rotate_vectors(vecs, out))
+        self.assertEqual((q * vecs).round(6), out.round(6))
+
+    def test_transform(self):
+        from array import array
+        r = random.Random(5)
+        vecs = [vec3(r.gauss(0,1), r.gauss(0,1), r.gauss(0,1)) for i in range(20)]
+        m = mat4().translate((1,2,3)).rotate_axis(vec3(1,2,3).normalize(), 40).scale((1,2,3))
+        expect = vec3_array([m * v for v in vecs]).round(6)
+        a = vec3_array(vecs)
+        self.assertEqual(expect, (m * a).round(6))
+        out = vec3_array(20)
+        self.assertIs(out, m.transform_points(a, out=out))
+        self.assertEqual(expect, out.round(6))
+        self.assertIs(a, m.transform_points(a))
+        self.assertEqual(expect, a.round(6))
+        buf = array("d", (x for v in vecs for x in v))
+        m.transform_points(buf)
+        self.assertEqual(expect, vec3_array.from_buffer(buf).round(6))
+        with self.assertRaises(ValueError):
+            m.transform_points(vec3_array(2), out=vec3_array(3))
+
+        expect = vec3_array([m.position_cleared() * v for v in vecs]).round(6)
+        a = vec3_array(vecs)
+        self.assertEqual(expect, m.transform_directions(a).round(6))
+        buf = bytearray(array("d", (x for v in vecs for x in v)))
+        out = bytearray(len(buf))
+        m.transform_directions(buf, out=out)
+        self.assertEqual(expect, vec3_array.from_buffer(out).round(6))
+
+        m3 = mat3().rotate_axis(vec3(3,2,1).normalize(), 20)
+        a = vec3_array(vecs)
+        expect = vec3_array([m3 * v for v in vecs]).round(6)
+        self.assertEqual(expect, (m3 * a).round(6))
+        self.assertEqual(expect, m3.transform_vectors(a).round(6))
+
+    def test_vec4_array(self):
+        a = vec4_array([(2, 4, 6, 2), (1, 2, 3, 1), (1, 0, 0, 0)])
+        self.assertIs(vec4, type(a[0]))
+        self.assertEqual([(2, 4, 6), (1, 2, 3), (1, 0, 0)], [tuple(v) for v in a.xyz()])
+        self.assertEqual([vec3(1, 2, 3), vec3(1, 2, 3)], list(a[:2].projected()))
+        with self.assertRaises(ZeroDivisionError):
+            a.projected()
+        b = a[:2].homogenized()
+        self.assertEqual([vec4(1, 2, 3, 1), vec4(1, 2, 3, 1)], list(b))
+        self.assertEqual(vec4(2, 4, 6, 2), a[0])
+        m = mat4().translate((1, 2, 3)).rotate_x(30).scale(2)
+        r = m * a
+        self.assertIs(vec4_array, type(r))
+        for v, rv in zip(a, r):
+            self.assertEqual((m * v).rounded(6), rv.rounded(6))
+        self.assertIs(a, m.transform_homogeneous(a))
+        self.assertEqual(r.tolist(), a.tolist())
+        with self.assertRaises(TypeError):
+            mat3() * a
+        proj = mat4((1,0,0,0, 0,1,0,0, 0,0,1,1, 0,0,0,0))
+        p = vec3_array([(2, 4, 2), (3, 3, 3), (-1, 2, 4)])
+        o = vec3_array(3)
+        self.assertIs(o, proj.project_points(p, o))
+        for v, ov in zip(p, o):
+            self.assertEqual(proj.project_point(v), ov)
+        self.assertIs(p, proj.project_points(p))
+        self.assertEqual(o.tolist(), p.tolist())
+        with self.assertRaises(ZeroDivisionError):
+            proj.project_points(vec3_array([(1, 1, 0)]))
+
+    def test_mat4_array(self):
+        r = random.Random(13)
+        mats = [mat4([r.gauss(0, 1) for i in range(16)]) for i in range(10)]
+        a = mat4_array(mats)
+        self.assertIs(mat4, type(a[0]))
+        for m, am in zip(mats, a.inversed()):
+            self.assertEqual(m.inversed().round(6), am.round(6))
+        for m, d in zip(mats, a.determinant()):
+            self.assertAlmostEqual(m.determinant(), d)
+        t = mat4().translate((1, 2, 3)).rotate_x(20)
+        for m, am in zip(mats, a * t):
+            self.assertEqual((m * t).round(6), am.round(6))
+        for m, am in zip(mats, t * a):
+            self.assertEqual((t * m).round(6), am.round(6))
+        for m, am in zip(mats, a * a):
+            self.assertEqual((m * m).round(6), am.round(6))
+        b = a.copy()
+        self.assertIs(b, b.inverse())
+        b *= a
+        for m in b:
+            self.assertEqual(mat4().round(6), m.round(6))
+        with self.assertRaises(ValueError):
+            mat4_array([mat4(), mat4(0)]).inverse()
+        with self.assertRaises(TypeError):
+            a * vec3(1)
+
+
+    def test_free_functions(self):
+        a = vec3_array([(1,0,0), (0,3,4), (-2,.5,7)])
+        b = vec3_array([(0,1,0), (1,1,1), (3,-1,2)])
+        vecs, others = list(map(vec3, a)), list(map(vec3, b))
+        self.assertEqual([functions.dot(x, y) for x, y in zip(vecs, others)], list(functions.dot(a, b)))
+        self.assertEqual(list(a.dot((1,2,3))), list(functions.dot((1,2,3), a)))
+        self.assertEqual([functions.length(x) for x in vecs], list(functions.length(a)))
+        self.assertEqual([functions.distance(x, (1,2,3)) for x in vecs], list(functions.distance((1,2,3), a)))
+        self.assertEqual(vec3_array([x.crossed(y) for x, y in zip(vecs, others)]), functions.cross(a, b))
+        self.assertEqual(vec3_array([vec3(1,2,3).crossed(x) for x in vecs]), functions.cross((1,2,3), a))
+        self.assertEqual(vec3_array([x.normalized() for x in vecs]), functions.normalize(a))
+        n = vec3(1,2,3).normalize()
+        self.assertEqual(vec3_array([functions.reflect(x, n) for x in vecs]).round(9),
+                         functions.reflect(a, n).round(9))
+        self.assertEqual(vec3_array([functions.reflect(n, x.normalized()) for x in vecs]).round(9),
+                         functions.reflect(n, a.normalized()).round(9))
+        for func, args in ((functions.mix, (a, b, .25)), (functions.mix, (a, (1,2,3), b)),
+                           (functions.clamp, (a, 0, 1)), (functions.clamp, (a, (0,1,2), b)),
+                           (functions.smoothstep, (-1, 2, a)), (functions.smoothstep, (a, a + 1, (0,.5,1))),
+                           (functions.min, (a, b)), (functions.max, (a, 1)), (functions.max, ((0,1,2), a))):
+            per_element = vec3_array([func(*[x[i] if isinstance(x, vec3_array) else x for x in args])
+                                      for i in range(len(a))])
+            self.assertEqual(per_element, func(*args))
+            o = vec3_array(3)
+            self.assertIs(o, func(*args, out=o))
+            self.assertEqual(per_element, o)
+        with self.assertRaises(TypeError):
+            functions.min(a, b, out=vec3_array(2))
+        with self.assertRaises(TypeError):
+            functions.min(a, b, out=vec2_array(3))
+
+
+    def test_serialization(self):
+        a = vec3_array([(1,2,3), (4,5,6), (7,8,9)])
+        self.assertEqual(72, len(a.to_bytes()))
+        self.assertEqual(a, vec3_array.from_bytes(a.to_bytes()))
+        self.assertEqual(vec3_array([(4,5,6)]), vec3_array.from_bytes(a[1:2].to_bytes()))
+        with self.assertRaises(ValueError):
+            vec3_array.from_bytes(bytes(16))
+        for obj in (a, a[1:], quat_array([quat((0,0,1), 30)]), mat4_array([mat4().rotate_x(10)])):
+            r = pickle.loads(pickle.dumps(obj))
+            self.assertEqual(type(obj), type(r))
+            self.assertEqual(obj, r)
+        # the unpickled array owns its storage
+        r = pickle.loads(pickle.dumps(a[1]))
+        r.x = 10
+        self.assertEqual(4, a[1].x)
+
+    def test_binary_file(self):
+        a = vec3_array([(i, i * 2, -i) for i in range(10)])
+        f = io.BytesIO()
+        self.assertEqual(10, binary.write_file(f, a))
+        self.assertEqual(32 + 10 * 24, len(f.getvalue()))
+        f.seek(0)
+        self.assertEqual(a, binary.read_file(f))
+        f.seek(0)
+        chunks = list(binary.iter_file(f, 4))
+        self.assertEqual([4, 4, 2], [len(c) for c in chunks])
+        self.assertEqual(a.tolist(), [e for c in chunks for e in c.tolist()])
+        qs = [quat((1,2,3), 10 * i) for i in range(3)]
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "quats.pctr")
+            binary.write_file(filename, qs)
+            r = binary.read_file(filename)
+            self.assertIs(quat_array, type(r))
+            self.assertEqual(quat_array(qs), r)
+            self.assertEqual(quat_array(qs), list(binary.iter_file(filename))[0])
+        f = io.BytesIO()
+        binary.write_file(f, [mat4().translate((1,2,3))])
+        f.seek(0)
+        self.assertEqual(mat4_array([mat4().translate((1,2,3))]), binary.read_file(f))
+        with self.assertRaises(TypeError):
+            binary.write_file(io.BytesIO(), [mat3()])
+        with self.assertRaises(ValueError):
+            binary.write_file(io.BytesIO(), [])
+        with self.assertRaises(ValueError):
+            binary.read_file(io.BytesIO(b"nothing"))
+        with self.assertRaises(ValueError):
+            binary.read_file(io.BytesIO(b"XXXX" + bytes(100)))
+        f = io.BytesIO()
+        binary.write_file(f, a)
+        with self.assertRaises(ValueError):
+            binary.read_file(io.BytesIO(f.getvalue()[:-8]))
+
+
+    def test_chunks(self):
+        a = vec3_array([(i, 0, 0) for i in range(10)])
+        chunks = list(a.chunks(4))
+        self.assertEqual([4, 4, 2], [len(c) for c in chunks])
+        chunks[1].normalize()
+        self.assertEqual(vec3(1, 0, 0), a[5])
+        with self.assertRaises(ValueError):
+            list(a.chunks(0))
+
+    def test_memory_mapped(self):
+        count = 20000
+        with tempfile.TemporaryDirectory() as path:
+            src_name, dst_name = os.path.join(path, "src.pctr"), os.path.join(path, "dst.pctr")
+            binary.write_file(src_name, vec3_array([(i, 1, -1) for i in range(count)]))
+            src = binary.open_file(src_name)
+            self.assertEqual(count, len(src))
+            self.assertEqual(vec3(7, 1, -1), src[7])
+            self.assertEqual(vec3_array([(3, 1, -1), (4, 1, -1)]), src[3:5])
+            with self.assertRaises((TypeError, ValueError)):
+                src[0] = (1, 2, 3)
+            dst = binary.create_file(dst_name, vec3_array, count)
+            self.assertEqual(vec3(0), dst[count - 1])
+            m = mat4().translate((0, 1, 0))
+            tracemalloc.start()
+            for s, d in zip(src.chunks(1000), dst.chunks(1000)):
+                m.transform_points(s, out=d)
+                d.normalize()
+                self.assertLessEqual(max(d.distance((0, 0, 0))), 1.000001)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            # the temporaries are bounded by the chunk size, not by the 480kb of the file
+            self.assertLess(peak, 24 * count // 2)
+            binary.flush(dst)
+            binary.flush(dst[10:20])
+            self.assertEqual(vec3(2, 2, -1).normalize().round(9), dst[2].round(9))
+            del src, dst, s, d
+            r = binary.read_file(dst_name)
+            self.assertEqual(vec3(7, 2, -1).normalize().round(9), r[7].round(9))
+            rw = binary.open_file(dst_name, "r+")
+            rw[0:2] *= 0
+            del rw
+            self.assertEqual(vec3_array([(0, 0, 0)] * 2), binary.read_file(dst_name)[:2])
+            with self.assertRaises(TypeError):
+                binary.flush(vec3_array(2))
+            with self.assertRaises(ValueError):
+                binary.open_file(dst_name, "w")
+
+
+class TestVec3ArrayFallback(TestVec3Array):
+    use_numpy = False
+
+
+class TestLazy(TestCase):
+
+    def test_eval(self):
+        a, b = vec3(1, 2, 3), vec3(4, 5, 6)
+        e = a + lazy(b) * 2. - (1, 1, 1)
+        self.assertIs(lazy, type(e))
+        self.assertIs(vec3, type(e.eval()))
+        self.assertEqual(vec3(8, 11, 14), e.eval())
+        self.assertEqual(a + b * 2. - (1, 1, 1), e.eval())
+        self.assertEqual(vec3(8, 11, 14), e)
+        self.assertEqual([8, 11, 14], list(e))
+        self.assertEqual(11, e[1])
+        self.assertEqual(vec3(-1, -2, -3), (-lazy(a)).eval())
+        self.assertEqual(vec3(1, 0, 1), (lazy(a) % 2).eval())
+        self.assertEqual(vec3(2, 1, 2. / 3.), (2. / lazy(a)).eval())
+        self.assertEqual(vec2(3, 4), (lazy(vec2(1, 2)) + 2).eval())
+        self.assertEqual(6., (lazy(2.) * 3).eval())
+        self.assertEqual((2., 4.), (lazy((1, 2)) * 2).eval())
+        # operands are referenced, not copied
+        b.x = 0
+        self.assertEqual(vec3(0, 11, 14), e.eval())
+        # evaluate into existing vector
+        c = vec3()
+        self.assertIs(c, e.eval(out=c))
+        self.assertEqual(vec3(0, 11, 14), c)
+        c = vec3(1)
+        c += lazy(a) * 2
+        self.assertEqual(vec3(3, 5, 7), c)
+        with self.assertRaises(TypeError):
+            lazy(a) + (1, 2)
+        # the compiled functions are cached by shape, a repeated leaf must not
+        # change the function of the same shape with different leaves
+        x = lazy(a)
+        self.assertEqual(vec3(2, 4, 6), (x + x).eval())
+        self.assertEqual(vec3(1, 7, 9), (lazy(a) + b).eval())
+        self.assertEqual(vec3(3, 6, 9), (x * 2 + x).eval())
+        self.assertEqual(vec3(1, 12, 15), (lazy(b) * 2 + a).eval())
+
+    def test_fuse(self):
+        @fuse
+        def march(ro, rd, t):
+            return ro + rd * t
+
+        @fuse
+        def blend(a, b, t):
+            return 0.5 * (a * (1. - t) + b * t) - (1, 2, 3)
+
+        a, b = vec3(1, 2, 3), vec3(4, 5, 6)
+        self.assertEqual(vec3(9, 12, 15), march(a, b, 2.))
+        self.assertEqual(vec3(5, 7, 9), march(a, b, 1))
+        self.assertEqual(vec3(2, 3, 4), march(a, (1, 1, 1), 1.))
+        self.assertEqual(vec2(3, 4), march(vec2(1, 2), vec2(1), 2.))
+        self.assertIs(vec3, type(march(a, b, 2.)))
+        self.assertEqual(0.5 * (a * .75 + b * .25) - (1, 2, 3), blend(a, b, .25))
+        with self.assertRaises(TypeError):
+            march(a, (1, 1), 1.)
+
+        @fuse
+        def normalized(v):
+            return v.normalized()
+        # not traceable, calls the function
+        self.assertEqual(vec3(0, 0, 1), normalized(vec3(0, 0, 2)))
+
+        @fuse
+        def twice(a, b):
+            return a * b + a
+        self.assertEqual(vec3(5, 12, 21), twice(a, b))
+        self.assertEqual(vec3(8, 15, 24), twice(b, a))
+
+        # branches on the values are not traced
+        @fuse
+        def scaled_if(a, t):
+            return a * t if t else a
+
+        @fuse
+        def scaled_unless_zero(a, t):
+            if t == 0:
+                return a
+            return a * t
+        for func in (scaled_if, scaled_unless_zero):
+            self.assertEqual(vec3(1, 2, 3), func(a, 0.))
+            self.assertEqual(vec3(2, 4, 6), func(a, 2.))
+            self.assertEqual(vec3(1, 2, 3), func(a, 0.))
+        with self.assertRaises(TypeError):
+            bool(lazy(a))
+
+        # vectors of the enclosing scope are not inlined
+        offset = vec3(1)
+
+        @fuse
+        def shifted(p):
+            return p + offset * 2. + (1, 1, 1)
+        self.assertEqual(vec3(3), shifted(vec3(0)))
+        offset.x = 100
+        self.assertEqual(vec3(201, 3, 3), shifted(vec3(0)))
+
+
+class TestOutput(TestCase):
+
+    def test_methods(self):
+        a, b = vec3(1, 2, 3), vec3(0, 1, 0)
+        o = vec3()
+        for expected, func in ((a.crossed(b), lambda: a.crossed(b, out=o)),
+                               (a.normalized(), lambda: a.normalized(out=o)),
+                               (a.normalized_safe(), lambda: a.normalized_safe(out=o)),
+                               (a.rounded(), lambda: a.rounded(out=o)),
+                               (a.floored(), lambda: a.floored(out=o)),
+                               (a.reflected(b), lambda: a.reflected(b, out=o)),
+                               (a.rotated_x(30), lambda: a.rotated_x(30, out=o)),
+                               (a.rotated_axis(b, 30), lambda: a.rotated_axis(b, 30, out=o))):
+            o.set(7)
+            self.assertIs(o, func())
+            self.assertEqual(expected, o)
+        # out may be an argument
+        c = vec3(b)
+        self.assertEqual(a.reflected(b), a.reflected(c, out=c))
+        c = vec3(b)
+        self.assertEqual(a.rotated_axis(b, 30), a.rotated_axis(c, 30, out=c))
+        c = vec3(a)
+        self.assertEqual(a.crossed(b), c.crossed(b, out=c))
+        self.assertEqual(vec2(2, 1), vec2(2, -1).reflected((0, 1), out=vec2()))
+        m, m3, q = mat4().translate((1, 2, 3)).rotate_y(30), mat3().rotate_x(20), quat().set_rotate_axis(b, 30)
+        o = mat4()
+        for expected, func in ((m.inversed(), lambda: m.inversed(out=o)),
+                               (m.inversed_simple(), lambda: m.inversed_simple(out=o)),
+                               (m.transposed(), lambda: m.transposed(out=o)),
+                               (m.translated((1, 2, 3)), lambda: m.translated((1, 2, 3), out=o)),
+                               (m.rotated_axis(b, 30), lambda: m.rotated_axis(b, 30, out=o)),
+                               (m.scaled(2), lambda: m.scaled(2, out=o)),
+                               (q.as_mat4(), lambda: q.as_mat4(out=o))):
+            o.set_identity(7)
+            self.assertIs(o, func())
+            self.assertEqual(expected, o)
+        o = mat3()
+        self.assertIs(o, m3.inversed(out=o))
+        self.assertEqual(m3.inversed(), o)
+        self.assertIs(o, m3.inversed_simple(out=o))
+        self.assertEqual(m3.transposed(), o)
+        self.assertIs(o, q.as_mat3(out=o))
+        self.assertEqual(q.as_mat3(), o)
+        o = quat()
+        self.assertIs(o, q.rotated_axis((1, 0, 0), 20, out=o))
+        self.assertEqual(q.rotated_axis((1, 0, 0), 20), o)
+        with self.assertRaises(TypeError):
+            a.crossed(b, out=vec2())
+        with self.assertRaises(TypeError):
+            m.inversed(out=mat3())
+
+    def test_functions(self):
+        a, b = vec3(1, 2, 3), vec3(4, 5, 6)
+        o = vec3()
+        for expected, func in ((a + b, functions.add), (a - b, functions.sub), (a * b, functions.mul),
+                               (a / b, functions.div), (a % b, functions.mod)):
+            self.assertEqual(expected, func(a, b))
+            self.assertIs(o, func(a, b, out=o))
+            self.assertEqual(expected, o)
+            self.assertEqual(func(a, 2), func(a, 2, out=vec3()))
+            self.assertEqual(func(2, a), func(2, a, out=vec3()))
+            self.assertEqual(func(a, (1, 2, 3)), func(a, (1, 2, 3), out=vec3()))
+        self.assertEqual(-a, functions.neg(a, out=o))
+        # out may be an operand
+        c = vec3(b)
+        self.assertEqual(a - b, functions.sub(a, c, out=c))
+        m, n, q = mat4().translate((1, 2, 3)).rotate_y(30), mat4().rotate_x(20), quat().set_rotate_axis((0, 1, 0), 30)
+        self.assertEqual(m * a, functions.mul(m, a, out=o))
+        self.assertEqual(m * n, functions.mul(m, n, out=mat4()))
+        c = mat4(n)
+        self.assertEqual(m * n, functions.mul(m, c, out=c))
+        c = mat4(m)
+        self.assertEqual(m * n, functions.mul(c, n, out=c))
+        self.assertEqual(m * q, functions.mul(m, q, out=mat4()))
+        self.assertEqual(q * q, functions.mul(q, q, out=quat()))
+        self.assertEqual(m * 2, functions.mul(m, 2, out=mat4()))
+        with self.assertRaises(TypeError):
+            functions.add(a, b, out=vec2())
+        with self.assertRaises(TypeError):
+            functions.add(a, (1, 2), out=vec3())
+
+    def test_allocation(self):
+        a, b = vec3(1, 2, 3), vec3(4, 5, 6)
+        m, q = mat4().translate((1, 2, 3)).rotate_x(30), quat().set_rotate_axis((0, 1, 0), 30)
+        v, n, mo, m3o = vec3(), vec3(), mat4(), mat3()
+
+        def frame_out():
+            a.crossed(b, out=v)
+            v.normalized(out=n)
+            n.reflected(a, out=v)
+            functions.add(a, b, out=v)
+            functions.mul(m, a, out=v)
+            functions.mul(m, m, out=mo)
+            m.inversed(out=mo)
+            m.translated((1, 2, 3), out=mo)
+            q.as_mat3(out=m3o)
+            return q.as_mat4(out=mo)
+
+        def frame():
+            return m.inversed() * a.crossed(b).normalized().reflected(a)
+
+        def peak(func, count=100):
+            """Returns the peak of the traced memory over count calls, relative to the start"""
+            func()
+            tracemalloc.start()
+            try:
+                start = tracemalloc.get_traced_memory()[0]
+                for i in range(count):
+                    func()
+                return tracemalloc.get_traced_memory()[1] - start
+            finally:
+                tracemalloc.stop()
+
+        def noop():
+            return mo
+
+        # a temporary vec3 or array("d") is more than 64 bytes,
+        # the out= versions may only create small iterators and floats
+        base = peak(noop)
+        self.assertLess(64, peak(frame) - base)
+        self.assertGreater(64, peak(frame_out) - base)
+        self.assertGreater(64, peak(frame_out, 1) - base)
+        self.assertIs(mo, frame_out())
+
+
+class TestTrack(TestCase):
+
+    def test_linear(self):
+        t = track((0., 1., 3.), (vec3(0), vec3(1, 2, 3), vec3(3)))
+        self.assertEqual(vec3(0), t.sample(-1.))
+        self.assertEqual(vec3(0), t.sample(0.))
+        self.assertEqual(vec3(.5, 1, 1.5), t.sample(.5))
+        self.assertEqual(vec3(1, 2, 3), t.sample(1.))
+        self.assertEqual(vec3(2, 2.5, 3), t.sample(2.))
+        self.assertEqual(vec3(3), t.sample(3.))
+        self.assertEqual(vec3(3), t.sample(10.))
+        # random access after monotonic sampling
+        self.assertEqual(vec3(.5, 1, 1.5), t.sample(.5))
+        o = vec3()
+        self.assertIs(o, t.sample(2., out=o))
+        self.assertEqual(.25, track((0., 2.), (0., 1.)).sample(.5))
+        self.assertEqual(5., track((1.,), (5.,)).sample(0.))
+
+    def test_catmull_rom(self):
+        keys = [vec3(0), vec3(1, 2, 0), vec3(3, 1, 1), vec3(4, 4, 4)]
+        t = track((0., 1., 2., 4.), keys, "catmull_rom")
+        # passes through the keys
+        for time, key in zip((0., 1., 2., 4.), keys):
+            self.assertEqual(key, t.sample(time))
+        # uniform catmull-rom in the middle of the segment
+        p0, p1, p2, p3 = keys
+        self.assertEqual(((-p0 + p1 * 9. + p2 * 9. - p3) / 16.).round(9), t.sample(1.5).round(9))
+        # continuous at the keys
+        self.assertEqual(t.sample(2. - 1e-9).round(6), t.sample(2. + 1e-9).round(6))
+
+    def test_bezier(self):
+        t = track((0., 1.), (0., 1.), "bezier", controls=(0., 1.))
+        self.assertEqual([0., .15625, .5, .84375, 1.], [t.sample(x) for x in (0., .25, .5, .75, 1.)])
+        t = track((0., 2.), (vec2(0), vec2(3, 0)), "bezier", controls=((1, 1), (2, 1)))
+        self.assertEqual(vec2(1.5, .75), t.sample(1.))
+        with self.assertRaises(ValueError):
+            track((0., 1.), (0., 1.), "bezier")
+
+    def test_slerp(self):
+        qs = [quat(), quat((0,0,1), 90), quat((1,0,0), 90)]
+        t = track((0., 1., 2.), qs, "slerp")
+        self.assertEqual(quat((0,0,1), 45).round(9), t.sample(.5).round(9))
+        self.assertEqual(qs[1].slerped(qs[2], .3).round(9), t.sample(1.3).round(9))
+        self.assertEqual(qs[2], t.sample(5.))
+        with self.assertRaises(TypeError):
+            track((0., 1.), (vec3(0), vec3(1)), "slerp")
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            track((0., 1.), (0.,))
+        with self.assertRaises(ValueError):
+            track((1., 0.), (0., 1.))
+        with self.assertRaises(ValueError):
+            track((0., 1.), (0., 1.), "cubic")
+
+    def test_sample_tracks(self):
+        tracks = [track((0., 2.), (0., 1.)),
+                  track((0., 2.), (vec3(0), vec3(2))),
+                  track((0., 2.), (quat(), quat((0,0,1), 90)), "slerp")]
+        r = sample_tracks(tracks, 1.)
+        self.assertEqual(8, len(r))
+        self.assertEqual([.5, 1., 1., 1.], list(r[:4]))
+        self.assertEqual(list(tracks[2].sample(1.)), list(r[4:]))
+        out = vec4_array(2)
+        self.assertIs(out, sample_tracks(tracks, 1., out))
+        self.assertEqual(r.tolist(), [x for v in out.tolist() for x in v])
+        with self.assertRaises(ValueError):
+            sample_tracks(tracks, 1., vec3_array(1))
+
+
+class TestFunctions(TestCase):
+
+    def test_geometric(self):
+        self.assertEqual(32., functions.dot(vec3(1,2,3), vec3(4,5,6)))
+        self.assertEqual(6., functions.dot(2, 3))
+        self.assertEqual(vec3(-2, 4, -2), functions.cross([1,2,3], [3,4,5]))
+        o = vec3()
+        self.assertIs(o, functions.cross(vec3(1,0,0), (0,1,0), out=o))
+        self.assertEqual(vec3(0,0,1), o)
+        self.assertEqual(5., functions.length(vec2(3,4)))
+        self.assertEqual(2., functions.length(-2))
+        self.assertEqual(5., functions.distance(vec3(1,0,0), (4,4,0)))
+        self.assertEqual(3., functions.distance(-1, 2))
+        self.assertEqual(vec3(1,2,3).normalized(), functions.normalize(vec3(1,2,3)))
+        self.assertEqual(vec4(0,0,.6,.8), functions.normalize((0,0,3,4)))
+        self.assertEqual(1., functions.normalize(3))
+        self.assertEqual(vec3(2,-1,0).reflected((0,1,0)), functions.reflect(vec3(2,-1,0), (0,1,0)))
+        self.assertEqual(vec2(1,1), functions.reflect((1,-1), vec2(0,1)))
+        self.assertEqual(-2., functions.reflect(2., 1.))
+        with self.assertRaises(ZeroDivisionError):
+            functions.normalize(vec3(0))
+        with self.assertRaises(TypeError):
+            functions.cross((1,2), (3,4,5))
+        with self.assertRaises(TypeError):
+            functions.length((1,2,"x"))
+        # a number and a vector are not broadcast by the geometric functions
+        for func, args in ((functions.dot, (vec3(1,2,3), 2)), (functions.dot, (2, (1,2))),
+                           (functions.distance, (vec3(1), 2.)), (functions.distance, (2, (1,2,3))),
+                           (functions.reflect, (2., vec3(0,1,0))), (functions.reflect, ((1,2), 1))):
+            with self.assertRaisesRegex(TypeError, "expects two numbers or two vectors"):
+                func(*args)
+
+    def test_componentwise(self):
+        self.assertEqual(vec3(1,2,4), functions.mix(vec3(0), (2,4,8), .5))
+        self.assertEqual(vec2(0,4), functions.mix((0,0), (2,4), (0,1)))
+        self.assertEqual(1.5, functions.mix(1, 2, .5))
+        self.assertEqual(vec3(0,.5,1), functions.clamp(vec3(-1,.5,2), 0, 1))
+        self.assertEqual(vec3(0,1,1), functions.clamp((-1,.5,2), (0,1,0), 1))
+        self.assertEqual(1., functions.clamp(1.5, 0, 1))
+        self.assertEqual(vec3(0,.15625,.5), functions.smoothstep(0, 2, vec3(-1,.5,1)))
+        self.assertEqual(1., functions.smoothstep(0, 1, 3))
+        self.assertEqual(vec3(1,2,3), functions.min(vec3(1,5,3), (4,2,6)))
+        self.assertEqual(vec4(2,5,3,2), functions.max(vec4(1,5,3,0), 2))
+        self.assertEqual(2., functions.max(1, 2))
+        o = vec3()
+        self.assertIs(o, functions.min(vec3(1,5,3), 2, out=o))
+        self.assertEqual(vec3(1,2,2), o)
+        self.assertEqual(quat(0,0,0,1), functions.max(quat(0,0,0,1), 0))
+        with self.assertRaises(TypeError):
+            functions.min(vec3(1), (1,2))
+        with self.assertRaises(TypeError):
+            functions.min((1,2,3,4,5), 1)
+        with self.assertRaises(TypeError):
+            functions.min(vec3(1), 2, out=vec2())
+